@@ -1,20 +1,41 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Request, Depends
+from fastapi import FastAPI, APIRouter, HTTPException, Request, Depends, Query, Response, WebSocket
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from fastapi.responses import StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument
+from pymongo.errors import PyMongoError, DuplicateKeyError
 import os
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field, ConfigDict, EmailStr
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Callable, Awaitable, Tuple
 import uuid
 from datetime import datetime, timezone, timedelta
 import httpx
+import httpcore
+import hashlib
+import socket
+import heapq
+import math
+from contextvars import ContextVar
 import asyncio
 import random
+import time
+import json
+import struct
+import gzip
+import sys
+import threading
+from collections import deque, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from email.utils import formatdate, parsedate_to_datetime
 import jwt
 import bcrypt
+import numpy as np
+from websockets.asyncio.client import connect as ws_connect
 from emergentintegrations.payments.stripe.checkout import StripeCheckout, CheckoutSessionResponse, CheckoutStatusResponse, CheckoutSessionRequest
 
 ROOT_DIR = Path(__file__).parent
@@ -30,6 +51,12 @@ STRIPE_API_KEY = os.environ.get('STRIPE_API_KEY')
 if not STRIPE_API_KEY:
     logger.warning("STRIPE_API_KEY not set - payments will not work")
 
+# Alternative Stripe API host, e.g. the checkout emulator in upstream_standin.py
+STRIPE_API_BASE = os.environ.get('STRIPE_API_BASE')
+if STRIPE_API_BASE:
+    import stripe
+    stripe.api_base = STRIPE_API_BASE
+
 # Blockchain.info API (FREE - for real Bitcoin data)
 BLOCKCHAIN_INFO_API = "https://blockchain.info"
 BLOCKCHAIN_WS_URL = "wss://ws.blockchain.info/inv"
@@ -59,8 +86,15 @@ app = FastAPI(title="CryptoTrack API")
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
 
-# CoinGecko API base URL (free public API)
-COINGECKO_API = "https://api.coingecko.com/api/v3"
+# CoinGecko API base URL (free public API; point at upstream_standin.py to run offline)
+COINGECKO_API = os.environ.get('COINGECKO_API_URL', 'https://api.coingecko.com/api/v3')
+
+# Largest number of ids accepted by /crypto/prices (coins/markets pages up to 250)
+MAX_BATCH_PRICE_IDS = 100
+
+# Size of the shared top-N market table; top-coins limits up to this are slices of it
+MARKET_SNAPSHOT_SIZE = int(os.environ.get('MARKET_SNAPSHOT_SIZE', '250'))
+MARKET_SNAPSHOT_KEY = "snapshot:markets"
 
 # Configure logging
 logging.basicConfig(
@@ -69,22 +103,662 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# ============ MARKET DATA CACHE ============
+
+# Fresh TTLs used by the /crypto/* endpoints, per key namespace
+CACHE_TTLS: Dict[str, int] = {
+    "price": 60,         # 1 minute
+    "historical": 600,   # 10 minutes
+    "top_coins": 120,    # 2 minutes
+    "trending": 600,     # 10 minutes
+    "global": 300,       # 5 minutes
+    "snapshot": 120,     # 2 minutes
+    "dashboard": 60,     # shortest section TTL (price)
+}
+
+# How long past its fresh TTL an entry may still be served while it is
+# refreshed in the background (stale-while-revalidate), per key namespace
+CACHE_STALE_TTLS: Dict[str, int] = {
+    "price": int(os.environ.get('CACHE_STALE_TTL_PRICE', '600')),
+    "historical": int(os.environ.get('CACHE_STALE_TTL_HISTORICAL', '3600')),
+    "top_coins": int(os.environ.get('CACHE_STALE_TTL_TOP_COINS', '900')),
+    "trending": int(os.environ.get('CACHE_STALE_TTL_TRENDING', '3600')),
+    "global": int(os.environ.get('CACHE_STALE_TTL_GLOBAL', '1800')),
+    "snapshot": int(os.environ.get('CACHE_STALE_TTL_SNAPSHOT', '900')),
+    "dashboard": int(os.environ.get('CACHE_STALE_TTL_DASHBOARD', '600')),
+}
+
+# Cache bounds - keys come from user input, so every namespace is capped
+CACHE_MAX_ENTRIES = int(os.environ.get('CACHE_MAX_ENTRIES', '2000'))
+CACHE_MAX_BYTES = int(os.environ.get('CACHE_MAX_BYTES', str(64 * 1024 * 1024)))
+CACHE_NAMESPACE_QUOTAS: Dict[str, int] = {
+    "price": int(os.environ.get('CACHE_QUOTA_PRICE', '500')),
+    "historical": int(os.environ.get('CACHE_QUOTA_HISTORICAL', '200')),
+    "top_coins": int(os.environ.get('CACHE_QUOTA_TOP_COINS', '20')),
+    "trending": 1,
+    "global": 1,
+    "snapshot": 1,
+    "dashboard": int(os.environ.get('CACHE_QUOTA_DASHBOARD', '20')),
+}
+CACHE_DEFAULT_MAX_AGE = 3600
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+def encode_json(value: Any) -> bytes:
+    """Encode a payload to response bytes; orjson when installed, else the stdlib"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(value, default=str, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(value, default=str, ensure_ascii=False, separators=(",", ":")).encode()
+
+def content_digest(data: bytes) -> str:
+    """Strong validator for an encoded payload"""
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+def cache_namespace(key: str) -> str:
+    """Namespace of a cache key, e.g. 'price' for 'price:bitcoin'"""
+    return key.split(":", 1)[0]
+
+class CacheEntry:
+    __slots__ = ("key", "namespace", "value", "stored_at", "expires_at", "size", "etag", "body", "views",
+                 "compressed")
+
+    def __init__(self, key: str, namespace: str, value: Any, stored_at: float, expires_at: float,
+                 size: int, etag: str, body: Optional[bytes]):
+        self.key = key
+        self.namespace = namespace
+        self.value = value
+        self.stored_at = stored_at
+        self.expires_at = expires_at
+        self.size = size
+        self.etag = etag
+        self.body = body
+        self.views: Dict[str, bytes] = {}
+        # (view, content-coding) -> compressed bytes, or None when compressing did not pay off
+        self.compressed: Dict[Tuple[Optional[str], str], Optional[bytes]] = {}
+
+    def encoded(self, payload: Any, view: Optional[str] = None) -> bytes:
+        """Response bytes for the value or one of its views, encoded at most once per entry"""
+        if view is None and self.body is not None:
+            return self.body
+        body = self.views.get(view)
+        if body is None:
+            body = self.views[view] = encode_json(payload)
+        return body
+
+class MarketCache:
+    """Bounded LRU cache with hard expiry, a byte budget and per-namespace quotas.
+
+    Every operation is O(1): entries live in one global LRU order plus one LRU
+    order per namespace, expiry is checked lazily on access, and each write
+    also drops a couple of expired entries from the cold end.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int, quotas: Dict[str, int]):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.quotas = quotas
+        self.entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self.namespaces: Dict[str, "OrderedDict[str, CacheEntry]"] = {}
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions: Dict[str, int] = {"lru": 0, "bytes": 0, "quota": 0, "expired": 0}
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __contains__(self, key: str) -> bool:
+        return self.peek(key) is not None
+
+    def max_age(self, namespace: str) -> int:
+        """Hard lifetime of an entry: fresh TTL plus stale window"""
+        if namespace not in CACHE_TTLS:
+            return CACHE_DEFAULT_MAX_AGE
+        return CACHE_TTLS[namespace] + CACHE_STALE_TTLS.get(namespace, 0)
+
+    def peek(self, key: str) -> Optional[CacheEntry]:
+        """Get an entry without touching LRU order or counters"""
+        entry = self.entries.get(key)
+        if entry is not None and entry.expires_at <= time.time():
+            self._remove(entry, "expired")
+            return None
+        return entry
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        """Get a live entry and mark it most recently used"""
+        entry = self.peek(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        self.namespaces[entry.namespace].move_to_end(key)
+        return entry
+
+    def set(self, key: str, value: Any, stored_at: Optional[float] = None) -> CacheEntry:
+        """Store a value, evicting as needed to stay within bounds"""
+        now = time.time()
+        stored_at = stored_at or now
+        namespace = cache_namespace(key)
+        existing = self.entries.get(key)
+        if existing is not None:
+            self._remove(existing, None)
+        # Before inserting, so an already-expired value (adopted from the
+        # shared tier) cannot be removed out from under the quota checks
+        self._expire_oldest(now)
+        size, etag, body = self.encode(value)
+        entry = CacheEntry(key, namespace, value, stored_at, stored_at + self.max_age(namespace), size, etag, body)
+        self.entries[key] = entry
+        self.namespaces.setdefault(namespace, OrderedDict())[key] = entry
+        self.bytes += entry.size
+
+        bucket = self.namespaces[namespace]
+        quota = self.quotas.get(namespace)
+        while quota is not None and len(bucket) > quota:
+            self._remove(next(iter(bucket.values())), "quota")
+        while len(self.entries) > self.max_entries:
+            self._remove(next(iter(self.entries.values())), "lru")
+        while self.bytes > self.max_bytes and len(self.entries) > 1:
+            self._remove(next(iter(self.entries.values())), "bytes")
+        return entry
+
+    def delete(self, key: str):
+        entry = self.entries.get(key)
+        if entry is not None:
+            self._remove(entry, None)
+
+    def _expire_oldest(self, now: float, limit: int = 2):
+        # Amortised cleanup: entries that are never read again still go away
+        for _ in range(limit):
+            if not self.entries:
+                return
+            oldest = next(iter(self.entries.values()))
+            if oldest.expires_at > now:
+                return
+            self._remove(oldest, "expired")
+
+    def _remove(self, entry: CacheEntry, reason: Optional[str]):
+        del self.entries[entry.key]
+        bucket = self.namespaces[entry.namespace]
+        del bucket[entry.key]
+        if not bucket:
+            del self.namespaces[entry.namespace]
+        self.bytes -= entry.size
+        if reason:
+            self.evictions[reason] += 1
+
+    @staticmethod
+    def estimate_size(value: Any) -> int:
+        """Approximate memory cost of a value by its JSON size"""
+        if isinstance(value, (bytes, bytearray)):
+            return len(value)
+        if hasattr(value, "nbytes"):
+            return value.nbytes
+        try:
+            return len(json.dumps(value, default=str))
+        except (TypeError, ValueError):
+            return sys.getsizeof(value)
+
+    @staticmethod
+    def encode(value: Any) -> Tuple[int, str, Optional[bytes]]:
+        """Size, strong ETag and response bytes of a value, from a single encoding of it.
+
+        Values that are only ever served through views (the market snapshot)
+        have no body of their own; their views are encoded on first use.
+        """
+        if isinstance(value, (bytes, bytearray)):
+            return len(value), content_digest(value), bytes(value)
+        if hasattr(value, "etag"):
+            return value.nbytes, value.etag, None
+        try:
+            body = encode_json(value)
+        except (TypeError, ValueError):
+            return sys.getsizeof(value), uuid.uuid4().hex, None
+        # The decoded value and its encoded body are both kept
+        return 2 * len(body), content_digest(body), body
+
+    def stats(self) -> Dict:
+        """Report hit/miss/eviction counters and current size"""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "bytes": self.bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0,
+            "evictions": dict(self.evictions),
+            "namespaces": {
+                namespace: {"entries": len(bucket), "quota": self.quotas.get(namespace)}
+                for namespace, bucket in self.namespaces.items()
+            }
+        }
+
 # In-memory cache for rate limiting - cleared on restart
-cache: Dict[str, Any] = {}
-cache_timestamps: Dict[str, datetime] = {}
-
-def get_cached(key: str, ttl_seconds: int = 60):
-    """Get cached data if not expired"""
-    if key in cache and key in cache_timestamps:
-        elapsed = (datetime.now(timezone.utc) - cache_timestamps[key]).total_seconds()
-        if elapsed < ttl_seconds:
-            return cache[key]
+cache = MarketCache(CACHE_MAX_ENTRIES, CACHE_MAX_BYTES, CACHE_NAMESPACE_QUOTAS)
+
+def get_cached(key: str, ttl_seconds: int = 60, refresh: Optional[Callable[[], Awaitable[Any]]] = None):
+    """Get cached data if not expired.
+
+    When a refresh loader is given, an entry past ttl_seconds but still inside
+    its namespace's stale TTL is returned as-is and one background refresh is
+    scheduled for it.
+    """
+    entry = cache.get(key)
+    if entry is None:
+        return None
+    elapsed = time.time() - entry.stored_at
+    if elapsed < ttl_seconds:
+        return entry.value
+    stale_ttl = CACHE_STALE_TTLS.get(entry.namespace, 0)
+    if refresh is not None and elapsed < ttl_seconds + stale_ttl:
+        swr_stats["stale_served"] += 1
+        schedule_refresh(key, refresh)
+        return entry.value
     return None
 
-def set_cached(key: str, data: Any):
-    """Set cache data with timestamp"""
-    cache[key] = data
-    cache_timestamps[key] = datetime.now(timezone.utc)
+def set_cached(key: str, data: Any, stored_at: Optional[float] = None):
+    """Set cache data with timestamp (a derived value passes its source's stored_at)"""
+    cache.set(key, data, stored_at)
+    market_hub.notify(key, data)
+
+# ============ SINGLE-FLIGHT ============
+
+class SingleFlight:
+    """Coalesce concurrent cache misses so each key is fetched once at a time"""
+
+    def __init__(self, history_size: int = 100):
+        self.inflight: Dict[str, asyncio.Task] = {}
+        # Background flights (prefetch, refreshes) run at background priority,
+        # so user requests never join them; background callers join either kind
+        self.background: Dict[str, asyncio.Task] = {}
+        self.callers: Dict[asyncio.Task, int] = {}
+        self.fetches = 0
+        self.coalesced = 0
+        self.bypassed_background = 0
+        self.max_callers = 0
+        self.history = deque(maxlen=history_size)
+
+    def running(self, key: str) -> bool:
+        return key in self.inflight or key in self.background
+
+    async def do(self, key: str, loader: Callable[[], Awaitable[Any]]):
+        """Run loader for key, or await the fetch already in flight for it"""
+        background = upstream_priority_floor.get() >= UPSTREAM_PRIORITY_BACKGROUND
+        task = self.inflight.get(key)
+        if task is None and background:
+            task = self.background.get(key)
+        if task is None:
+            if key in self.background:
+                self.bypassed_background += 1
+            flights = self.background if background else self.inflight
+            task = asyncio.ensure_future(shared_cache.load(key, loader))
+            flights[key] = task
+            self.callers[task] = 0
+            self.fetches += 1
+            started = time.monotonic()
+            task.add_done_callback(lambda t: self._finish(key, flights, t, started))
+        else:
+            self.coalesced += 1
+        self.callers[task] += 1
+        # Shield so a disconnecting caller does not cancel the shared fetch
+        return await asyncio.shield(task)
+
+    def _finish(self, key: str, flights: Dict[str, asyncio.Task], task: asyncio.Task, started: float):
+        callers = self.callers.pop(task, 0)
+        if flights.get(key) is task:
+            del flights[key]
+        self.max_callers = max(self.max_callers, callers)
+        failed = task.cancelled() or task.exception() is not None
+        self.history.append({
+            "key": key,
+            "callers": callers,
+            "background": flights is self.background,
+            "duration_ms": round((time.monotonic() - started) * 1000, 1),
+            "ok": not failed,
+            "finished_at": datetime.now(timezone.utc).isoformat()
+        })
+
+    def stats(self) -> Dict:
+        """Report fetch counts and how many callers each fetch served"""
+        return {
+            "fetches": self.fetches,
+            "coalesced_callers": self.coalesced,
+            "foreground_fetches_beside_background": self.bypassed_background,
+            "max_callers_per_fetch": self.max_callers,
+            "in_flight": {key: self.callers.get(task, 0) for key, task in self.inflight.items()},
+            "background_in_flight": {key: self.callers.get(task, 0) for key, task in self.background.items()},
+            "recent": list(self.history)
+        }
+
+single_flight = SingleFlight()
+
+# ============ STALE-WHILE-REVALIDATE ============
+
+swr_stats: Dict[str, int] = {"stale_served": 0, "refreshes_scheduled": 0, "refresh_failures": 0}
+background_refreshes: Dict[str, asyncio.Task] = {}
+
+def schedule_refresh(key: str, loader: Callable[[], Awaitable[Any]]):
+    """Refresh a stale key in the background unless a fetch is already running"""
+    if key in background_refreshes or single_flight.running(key):
+        return
+    swr_stats["refreshes_scheduled"] += 1
+    # Keep a reference so the task is not garbage collected mid-flight
+    task = asyncio.ensure_future(run_refresh(key, loader))
+    background_refreshes[key] = task
+    task.add_done_callback(lambda t: background_refreshes.pop(key, None))
+
+async def run_refresh(key: str, loader: Callable[[], Awaitable[Any]]):
+    """Run a background refresh; the stale value keeps being served on failure"""
+    upstream_priority_floor.set(UPSTREAM_PRIORITY_BACKGROUND)
+    try:
+        await single_flight.do(key, loader)
+    except Exception as e:
+        swr_stats["refresh_failures"] += 1
+        logger.warning(f"Background refresh failed for {key}: {e}")
+
+# ============ RESPONSE COMPRESSION ============
+
+# Compressed variants are built lazily per cache entry, the first time a
+# client asks for that content-coding, and live as long as the entry - so a
+# payload is compressed once per refresh rather than once per request.
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
+COMPRESSION_MIN_BYTES = int(os.environ.get('COMPRESSION_MIN_BYTES', '1024'))
+COMPRESSION_GZIP_LEVEL = int(os.environ.get('COMPRESSION_GZIP_LEVEL', '6'))
+COMPRESSION_BROTLI_QUALITY = int(os.environ.get('COMPRESSION_BROTLI_QUALITY', '5'))
+# Server preference when the client accepts several codings equally
+COMPRESSION_PREFERENCE = ("br", "gzip") if BROTLI_AVAILABLE else ("gzip",)
+ETAG_CODING_SUFFIX = {"br": "br", "gzip": "gz"}
+
+compression_stats: Dict[str, Any] = {
+    "builds": {"br": 0, "gzip": 0},
+    "served": {"br": 0, "gzip": 0, "identity": 0},
+    "bytes_in": 0,
+    "bytes_out": 0
+}
+
+def compress(body: bytes, coding: str) -> bytes:
+    if coding == "br":
+        return brotli.compress(body, quality=COMPRESSION_BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=COMPRESSION_GZIP_LEVEL, mtime=0)
+
+def choose_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Best content-coding we can produce for an Accept-Encoding header, or None for identity"""
+    if not accept_encoding:
+        return None
+    weights: Dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        weight = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        weights[coding.strip().lower()] = weight
+    best, best_weight = None, 0.0
+    for coding in COMPRESSION_PREFERENCE:
+        weight = weights.get(coding, weights.get("*", 0.0))
+        if weight > best_weight:
+            best, best_weight = coding, weight
+    return best
+
+def compressed_variant(entry: CacheEntry, body: bytes, view: Optional[str], coding: str) -> Optional[bytes]:
+    """The entry's compressed bytes for a view, built on first request; None means send identity"""
+    slot = (view, coding)
+    if slot not in entry.compressed:
+        variant = compress(body, coding)
+        compression_stats["builds"][coding] += 1
+        compression_stats["bytes_in"] += len(body)
+        compression_stats["bytes_out"] += len(variant)
+        if len(variant) >= len(body):
+            variant = None
+        entry.compressed[slot] = variant
+        if variant is not None and cache.entries.get(entry.key) is entry:
+            # Count the variant against the cache's byte budget
+            entry.size += len(variant)
+            cache.bytes += len(variant)
+    return entry.compressed[slot]
+
+# ============ CONDITIONAL GET ============
+
+# Cached market responses carry the entry's ETag (computed once at store
+# time), its Last-Modified and a max-age for the rest of its fresh TTL, so
+# browsers and the CDN can revalidate instead of re-downloading.
+conditional_stats: Dict[str, int] = {"not_modified": 0, "full": 0}
+
+def entry_holding(value: Any, *keys: str) -> Optional[CacheEntry]:
+    """The live cache entry under one of keys whose value is this exact object"""
+    for key in keys:
+        entry = cache.peek(key)
+        if entry is not None and entry.value is value:
+            return entry
+    return None
+
+def cache_headers(entry: CacheEntry, view: Optional[str] = None, vary: Optional[str] = None,
+                  coding: Optional[str] = None) -> Dict[str, str]:
+    """Validator and freshness headers for a response built from a cache entry"""
+    age = time.time() - entry.stored_at
+    fresh_ttl = CACHE_TTLS.get(entry.namespace, 0)
+    # Each content-coding is a different representation, so it gets its own strong ETag
+    tag = "-".join(part for part in (entry.etag, view, ETAG_CODING_SUFFIX.get(coding)) if part)
+    headers = {
+        "ETag": f'"{tag}"',
+        "Last-Modified": formatdate(entry.stored_at, usegmt=True),
+        "Cache-Control": f"public, max-age={max(0, int(fresh_ttl - age))}"
+    }
+    stale_ttl = CACHE_STALE_TTLS.get(entry.namespace, 0)
+    if stale_ttl:
+        headers["Cache-Control"] += f", stale-while-revalidate={stale_ttl}"
+    headers["Vary"] = f"{vary}, Accept-Encoding" if vary else "Accept-Encoding"
+    return headers
+
+def is_not_modified(request: Request, headers: Dict[str, str], stored_at: float) -> bool:
+    """Evaluate If-None-Match (preferred) or If-Modified-Since against a cached entry"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if if_none_match.strip() == "*":
+            return True
+        etag = headers["ETag"]
+        # Weak comparison, as RFC 9110 requires for If-None-Match
+        return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(stored_at) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+# (payload, cache entry it came from or None, view name for derived payloads)
+MarketView = Tuple[Any, Optional[CacheEntry], Optional[str]]
+
+def cached_response(request: Request, payload: Any, entry: Optional[CacheEntry], view: Optional[str] = None,
+                    media_type: Optional[str] = None, vary: Optional[str] = None):
+    """Answer from a cache entry: 304 when the client's copy is current, else its pre-encoded bytes.
+
+    payload is returned unchanged when it did not come from a cache entry
+    (inline fallbacks), so those responses stay uncacheable.
+    """
+    if entry is None:
+        return payload
+    accepted = choose_encoding(request.headers.get("accept-encoding"))
+    if "if-none-match" in request.headers or "if-modified-since" in request.headers:
+        # Revalidate before any encoding or compression work. The client's
+        # ETag names the coding it holds, so try each tag we could have sent.
+        for candidate in dict.fromkeys((accepted, None, *COMPRESSION_PREFERENCE)):
+            headers = cache_headers(entry, view, vary, candidate)
+            if is_not_modified(request, headers, entry.stored_at):
+                conditional_stats["not_modified"] += 1
+                return Response(status_code=304, headers=headers)
+    body = entry.encoded(payload, view)
+    coding = accepted if len(body) >= COMPRESSION_MIN_BYTES else None
+    if coding is not None:
+        variant = compressed_variant(entry, body, view, coding)
+        if variant is None:
+            coding = None
+        else:
+            body = variant
+    headers = cache_headers(entry, view, vary, coding)
+    conditional_stats["full"] += 1
+    compression_stats["served"][coding or "identity"] += 1
+    if coding is not None:
+        headers["Content-Encoding"] = coding
+    return Response(content=body, media_type=media_type or "application/json", headers=headers)
+
+# ============ SHARED CACHE TIER ============
+
+# Optional MongoDB-backed tier shared by all uvicorn workers. Misses in the
+# in-process cache read through to it, and only the worker holding a key's
+# lease refreshes that key from upstream.
+SHARED_CACHE_ENABLED = os.environ.get('SHARED_CACHE_ENABLED', 'false').lower() == 'true'
+SHARED_CACHE_LEASE_SECONDS = float(os.environ.get('SHARED_CACHE_LEASE_SECONDS', '30'))
+SHARED_CACHE_LEASE_WAIT = float(os.environ.get('SHARED_CACHE_LEASE_WAIT', '5'))
+SHARED_CACHE_POLL_INTERVAL = 0.25
+SHARED_CACHE_NAMESPACES = {"price", "historical", "top_coins", "trending", "global", "snapshot"}
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+class SharedCache:
+    """Second cache tier in MongoDB with TTL-indexed entries and refresh leases"""
+
+    def __init__(self, enabled: bool):
+        self.enabled = enabled
+        self.entries = db.market_cache
+        self.leases = db.cache_leases
+        self.counters = {
+            "hits": 0, "misses": 0, "writes": 0,
+            "leases_acquired": 0, "lease_waits": 0, "lease_wait_hits": 0, "errors": 0
+        }
+
+    async def ensure_indexes(self):
+        """TTL indexes so MongoDB drops expired entries and abandoned leases"""
+        if not self.enabled:
+            return
+        await self.entries.create_index("expires_at", expireAfterSeconds=0)
+        await self.leases.create_index("expires_at", expireAfterSeconds=0)
+
+    async def load(self, key: str, loader: Callable[[], Awaitable[Any]]):
+        """Read through the shared tier; refresh upstream only under a lease"""
+        namespace = cache_namespace(key)
+        if not self.enabled or namespace not in SHARED_CACHE_NAMESPACES:
+            return await loader()
+        fresh_ttl = CACHE_TTLS.get(namespace, 60)
+
+        doc = await self.read_fresh(key, fresh_ttl)
+        if doc is not None:
+            self.counters["hits"] += 1
+            return self.adopt(key, doc)
+        self.counters["misses"] += 1
+
+        if await self.acquire_lease(key):
+            try:
+                value = await loader()
+                await self.write(key)
+                return value
+            finally:
+                await self.release_lease(key)
+
+        # Another worker holds the lease: wait for its result
+        self.counters["lease_waits"] += 1
+        deadline = time.monotonic() + SHARED_CACHE_LEASE_WAIT
+        while time.monotonic() < deadline:
+            await asyncio.sleep(SHARED_CACHE_POLL_INTERVAL)
+            doc = await self.read_fresh(key, fresh_ttl)
+            if doc is not None:
+                self.counters["lease_wait_hits"] += 1
+                return self.adopt(key, doc)
+        logger.warning(f"Timed out waiting for shared refresh of {key}, fetching directly")
+        return await loader()
+
+    async def read_fresh(self, key: str, fresh_ttl: float) -> Optional[Dict]:
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=fresh_ttl)
+        try:
+            return await self.entries.find_one({"_id": key, "stored_at": {"$gt": cutoff}})
+        except PyMongoError as e:
+            self.counters["errors"] += 1
+            logger.warning(f"Shared cache read failed for {key}: {e}")
+            return None
+
+    def adopt(self, key: str, doc: Dict):
+        """Copy a shared entry into the in-process cache, keeping its age"""
+        value = doc["value"]
+        if doc.get("kind") == "snapshot":
+            value = MarketSnapshot(value["rows"], value["last_updated"])
+        stored_at = doc["stored_at"]
+        if stored_at.tzinfo is None:
+            stored_at = stored_at.replace(tzinfo=timezone.utc)
+        cache.set(key, value, stored_at=stored_at.timestamp())
+        market_hub.notify(key, value)
+        return value
+
+    async def write(self, key: str):
+        """Publish the freshly loaded in-process entry to the other workers"""
+        entry = cache.peek(key)
+        if entry is None:
+            return
+        value, kind = entry.value, "value"
+        if isinstance(value, MarketSnapshot):
+            value, kind = {"rows": value.rows, "last_updated": value.last_updated}, "snapshot"
+        stored_at = datetime.fromtimestamp(entry.stored_at, timezone.utc)
+        try:
+            await self.entries.replace_one(
+                {"_id": key},
+                {
+                    "value": value,
+                    "kind": kind,
+                    "stored_at": stored_at,
+                    "expires_at": datetime.fromtimestamp(entry.expires_at, timezone.utc),
+                    "worker": WORKER_ID
+                },
+                upsert=True
+            )
+            self.counters["writes"] += 1
+        except PyMongoError as e:
+            self.counters["errors"] += 1
+            logger.warning(f"Shared cache write failed for {key}: {e}")
+
+    async def acquire_lease(self, key: str) -> bool:
+        """Take the refresh lease for key unless another worker holds a live one"""
+        now = datetime.now(timezone.utc)
+        try:
+            # Matches only a missing or expired lease; a live one makes the
+            # upsert collide on _id instead
+            await self.leases.update_one(
+                {"_id": key, "expires_at": {"$lt": now}},
+                {"$set": {"owner": WORKER_ID, "expires_at": now + timedelta(seconds=SHARED_CACHE_LEASE_SECONDS)}},
+                upsert=True
+            )
+            self.counters["leases_acquired"] += 1
+            return True
+        except DuplicateKeyError:
+            return False
+        except PyMongoError as e:
+            # Without the shared tier each worker just refreshes for itself
+            self.counters["errors"] += 1
+            logger.warning(f"Shared cache lease failed for {key}: {e}")
+            return True
+
+    async def release_lease(self, key: str):
+        try:
+            await self.leases.delete_one({"_id": key, "owner": WORKER_ID})
+        except PyMongoError as e:
+            logger.warning(f"Shared cache lease release failed for {key}: {e}")
+
+    def stats(self) -> Dict:
+        return {"enabled": self.enabled, "worker_id": WORKER_ID, **self.counters}
+
+shared_cache = SharedCache(SHARED_CACHE_ENABLED)
 
 # Fallback data when API is rate limited - Updated to current market prices
 FALLBACK_BITCOIN = {
@@ -123,16 +797,191 @@ FALLBACK_TRENDING = [
     {"id": "injective-protocol", "name": "Injective", "symbol": "inj", "market_cap_rank": 35, "thumb": "https://assets.coingecko.com/coins/images/12882/thumb/Secondary_Symbol.png", "score": 4}
 ]
 
-# ============ AUTH HELPERS ============
+# ============ PASSWORD HASHING ============
+
+# bcrypt takes 100-300 ms of CPU per call; run on the event loop it stalls
+# every other request. Calls go to a small thread pool instead (bcrypt releases
+# the GIL while it works), and once too many are waiting new ones are refused
+# with a 503 rather than queueing without bound.
+PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', str(min(4, os.cpu_count() or 1))))
+PASSWORD_HASH_MAX_QUEUE = int(os.environ.get('PASSWORD_HASH_MAX_QUEUE', '64'))
+PASSWORD_HASH_RETRY_AFTER = 1
+PASSWORD_HASH_SAMPLES = 500
+
+class PasswordHasher:
+    """Bounded worker pool for bcrypt hash/verify with queue and timing metrics"""
+
+    def __init__(self, workers: int, max_queue: int):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self.lock = threading.Lock()
+        self.pending = 0
+        self.max_pending = 0
+        self.rejected = 0
+        self.counts = {"hash": 0, "verify": 0}
+        self.run_ms = {"hash": deque(maxlen=PASSWORD_HASH_SAMPLES), "verify": deque(maxlen=PASSWORD_HASH_SAMPLES)}
+        self.wait_ms: deque = deque(maxlen=PASSWORD_HASH_SAMPLES)
+
+    async def run(self, op: str, fn: Callable, *args):
+        with self.lock:
+            if self.pending >= self.workers + self.max_queue:
+                self.rejected += 1
+                raise HTTPException(status_code=503, detail="Server busy, please retry",
+                                    headers={"Retry-After": str(PASSWORD_HASH_RETRY_AFTER)})
+            self.pending += 1
+            self.max_pending = max(self.max_pending, self.pending)
+        future = self.executor.submit(self._timed, op, time.perf_counter(), fn, *args)
+        # Fires on completion and on cancellation before start alike
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+    def _timed(self, op: str, submitted: float, fn: Callable, *args):
+        started = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            with self.lock:
+                self.counts[op] += 1
+                self.wait_ms.append((started - submitted) * 1000)
+                self.run_ms[op].append((time.perf_counter() - started) * 1000)
+
+    def _release(self, _future):
+        with self.lock:
+            self.pending -= 1
 
-def hash_password(password: str) -> str:
-    """Hash a password using bcrypt"""
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
 
-def verify_password(password: str, hashed: str) -> bool:
-    """Verify a password against its hash"""
+    @staticmethod
+    def summarize(samples) -> Dict:
+        if not samples:
+            return {"p50_ms": None, "p95_ms": None, "max_ms": None}
+        ordered = sorted(samples)
+        return {
+            "p50_ms": round(ordered[len(ordered) // 2], 2),
+            "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 2),
+            "max_ms": round(ordered[-1], 2)
+        }
+
+    def stats(self) -> Dict:
+        with self.lock:
+            return {
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "in_flight": self.pending,
+                "queued": max(0, self.pending - self.workers),
+                "max_in_flight": self.max_pending,
+                "rejected": self.rejected,
+                "completed": dict(self.counts),
+                "queue_wait": self.summarize(self.wait_ms),
+                "hash": self.summarize(self.run_ms["hash"]),
+                "verify": self.summarize(self.run_ms["verify"])
+            }
+
+password_hasher = PasswordHasher(PASSWORD_HASH_WORKERS, PASSWORD_HASH_MAX_QUEUE)
+
+# Hash cost policy: a fixed bcrypt cost, or (with PASSWORD_HASH_TARGET_MS) the
+# highest cost that hashes within the target on this box, found by a
+# benchmark at startup. Hashes made under another cost are upgraded in the
+# background on the next successful login.
+PASSWORD_HASH_COST = int(os.environ.get('PASSWORD_HASH_COST', '12'))
+PASSWORD_HASH_TARGET_MS = float(os.environ.get('PASSWORD_HASH_TARGET_MS', '0'))
+PASSWORD_HASH_MIN_COST = int(os.environ.get('PASSWORD_HASH_MIN_COST', '10'))
+PASSWORD_HASH_MAX_COST = int(os.environ.get('PASSWORD_HASH_MAX_COST', '16'))
+PASSWORD_REHASH_ON_LOGIN = os.environ.get('PASSWORD_REHASH_ON_LOGIN', 'true').lower() == 'true'
+
+def bcrypt_cost(hashed: str) -> Optional[int]:
+    """Cost factor of a $2b$NN$... hash, or None if it is not one we produce"""
+    parts = hashed.split("$")
+    if len(parts) < 4 or parts[1] != "2b" or not parts[2].isdigit():
+        return None
+    return int(parts[2])
+
+def benchmark_bcrypt(min_cost: int, max_cost: int, target_ms: float) -> List[Dict]:
+    """Time one hash per cost, from min_cost up until a cost exceeds target_ms"""
+    password = uuid.uuid4().hex.encode()
+    results = []
+    for cost in range(min_cost, max_cost + 1):
+        started = time.perf_counter()
+        bcrypt.hashpw(password, bcrypt.gensalt(rounds=cost))
+        elapsed = (time.perf_counter() - started) * 1000
+        results.append({"cost": cost, "ms": round(elapsed, 1)})
+        if elapsed > target_ms:
+            break
+    return results
+
+class HashPolicy:
+    """The bcrypt cost new hashes are made with, and which old hashes to upgrade"""
+
+    def __init__(self, cost: int):
+        self.cost = cost
+        self.source = "configured"
+        self.target_ms: Optional[float] = None
+        self.calibration: List[Dict] = []
+        self.rehash = {"scheduled": 0, "completed": 0, "skipped_busy": 0, "failed": 0}
+        self.rehash_tasks: set = set()
+
+    def calibrate(self, target_ms: float, min_cost: int, max_cost: int):
+        """Pick the highest cost whose hash time stays within target_ms (never below min_cost)"""
+        self.calibration = benchmark_bcrypt(min_cost, max_cost, target_ms)
+        within = [r["cost"] for r in self.calibration if r["ms"] <= target_ms]
+        self.cost = max(within) if within else min_cost
+        self.source = "calibrated"
+        self.target_ms = target_ms
+        logger.info(f"bcrypt cost calibrated to {self.cost} for {target_ms:.0f} ms target: {self.calibration}")
+
+    def needs_rehash(self, hashed: str) -> bool:
+        return bcrypt_cost(hashed) != self.cost
+
+    def schedule_rehash(self, user_id: str, password: str, old_hash: str):
+        """Upgrade a verified user's hash in the background, unless the pool is busy with logins"""
+        if password_hasher.pending >= password_hasher.workers:
+            self.rehash["skipped_busy"] += 1
+            return
+        self.rehash["scheduled"] += 1
+        task = asyncio.ensure_future(self._rehash(user_id, password, old_hash))
+        self.rehash_tasks.add(task)
+        task.add_done_callback(self.rehash_tasks.discard)
+
+    async def _rehash(self, user_id: str, password: str, old_hash: str):
+        try:
+            new_hash = await hash_password(password)
+            # Only replace the hash we verified; a concurrent password change wins
+            await db.users.update_one({"id": user_id, "password": old_hash}, {"$set": {"password": new_hash}})
+            self.rehash["completed"] += 1
+        except Exception as e:
+            self.rehash["failed"] += 1
+            logger.warning(f"Background rehash failed for user {user_id}: {e}")
+
+    def stats(self) -> Dict:
+        return {
+            "cost": self.cost,
+            "source": self.source,
+            "target_ms": self.target_ms,
+            "calibration": self.calibration,
+            "rehash_on_login": PASSWORD_REHASH_ON_LOGIN,
+            "rehash": dict(self.rehash)
+        }
+
+hash_policy = HashPolicy(PASSWORD_HASH_COST)
+
+def bcrypt_hash(password: str) -> str:
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=hash_policy.cost)).decode('utf-8')
+
+def bcrypt_verify(password: str, hashed: str) -> bool:
     return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
 
+# ============ AUTH HELPERS ============
+
+async def hash_password(password: str) -> str:
+    """Hash a password using bcrypt (on the hashing pool)"""
+    return await password_hasher.run("hash", bcrypt_hash, password)
+
+async def verify_password(password: str, hashed: str) -> bool:
+    """Verify a password against its hash (on the hashing pool)"""
+    return await password_hasher.run("verify", bcrypt_verify, password, hashed)
+
 def create_token(user_id: str, email: str) -> str:
     """Create a JWT token"""
     payload = {
@@ -142,15 +991,108 @@ def create_token(user_id: str, email: str) -> str:
     }
     return jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
 
+# ============ PRINCIPAL CACHE ============
+
+# Authenticated requests resolve token -> payload -> user document. Both steps
+# are cached in-process: verified JWT payloads until they expire, user
+# principals (the document without its password) for a short TTL. Writes to a
+# user document in this process invalidate its principal; the TTL bounds how
+# long other workers can serve the old one.
+AUTH_TOKEN_CACHE_MAX = int(os.environ.get('AUTH_TOKEN_CACHE_MAX', '10000'))
+AUTH_PRINCIPAL_TTL = float(os.environ.get('AUTH_PRINCIPAL_TTL', '30'))
+AUTH_PRINCIPAL_MAX = int(os.environ.get('AUTH_PRINCIPAL_MAX', '10000'))
+
+class TokenCache:
+    """Bounded LRU of verified JWT payloads, each kept until its exp claim"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[str, Dict]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, token: str) -> Optional[Dict]:
+        payload = self.entries.get(token)
+        if payload is None or payload.get("exp", 0) <= time.time():
+            if payload is not None:
+                del self.entries[token]
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(token)
+        return payload
+
+    def set(self, token: str, payload: Dict):
+        self.entries[token] = payload
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def stats(self) -> Dict:
+        return {"entries": len(self.entries), "max_entries": self.max_entries, "hits": self.hits, "misses": self.misses}
+
+class PrincipalCache:
+    """Bounded short-TTL cache of user principals keyed by user id"""
+
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self.inflight: Dict[str, asyncio.Future] = {}
+        # Bumped by every invalidation so a lookup that raced one is not stored
+        self.epoch = 0
+        self.counters = {"hits": 0, "misses": 0, "coalesced": 0, "invalidations": 0}
+
+    async def get(self, user_id: str) -> Optional[Dict]:
+        """The user's principal (treat as read-only), loading it once on a miss"""
+        cached = self.entries.get(user_id)
+        if cached is not None and cached[1] > time.time():
+            self.counters["hits"] += 1
+            self.entries.move_to_end(user_id)
+            return cached[0]
+        if user_id in self.inflight:
+            self.counters["coalesced"] += 1
+            return await asyncio.shield(self.inflight[user_id])
+        self.counters["misses"] += 1
+        future = asyncio.ensure_future(self._load(user_id))
+        self.inflight[user_id] = future
+        future.add_done_callback(lambda f: self.inflight.pop(user_id, None))
+        return await asyncio.shield(future)
+
+    async def _load(self, user_id: str) -> Optional[Dict]:
+        epoch = self.epoch
+        user = await db.users.find_one({"id": user_id}, {"_id": 0, "password": 0})
+        if user is not None and epoch == self.epoch:
+            self.entries[user_id] = (user, time.time() + self.ttl)
+            self.entries.move_to_end(user_id)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return user
+
+    def invalidate(self, user_id: str):
+        """Drop a user's principal after their document changed"""
+        self.epoch += 1
+        self.counters["invalidations"] += 1
+        self.entries.pop(user_id, None)
+
+    def stats(self) -> Dict:
+        return {"entries": len(self.entries), "max_entries": self.max_entries, "ttl": self.ttl, **self.counters}
+
+token_cache = TokenCache(AUTH_TOKEN_CACHE_MAX)
+principal_cache = PrincipalCache(AUTH_PRINCIPAL_TTL, AUTH_PRINCIPAL_MAX)
+
 def decode_token(token: str) -> Optional[Dict]:
-    """Decode and verify a JWT token"""
+    """Decode and verify a JWT token (verified payloads are cached until they expire)"""
+    payload = token_cache.get(token)
+    if payload is not None:
+        return payload
     try:
         payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
-        return payload
     except jwt.ExpiredSignatureError:
         return None
     except jwt.InvalidTokenError:
         return None
+    token_cache.set(token, payload)
+    return payload
 
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> Optional[Dict]:
     """Get current user from JWT token"""
@@ -160,8 +1102,7 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
     payload = decode_token(token)
     if not payload:
         return None
-    user = await db.users.find_one({"id": payload["user_id"]}, {"_id": 0, "password": 0})
-    return user
+    return await principal_cache.get(payload["user_id"])
 
 async def require_auth(credentials: HTTPAuthorizationCredentials = Depends(security)) -> Dict:
     """Require authentication - raises 401 if not authenticated"""
@@ -171,11 +1112,161 @@ async def require_auth(credentials: HTTPAuthorizationCredentials = Depends(secur
     payload = decode_token(token)
     if not payload:
         raise HTTPException(status_code=401, detail="Invalid or expired token")
-    user = await db.users.find_one({"id": payload["user_id"]}, {"_id": 0, "password": 0})
+    user = await principal_cache.get(payload["user_id"])
     if not user:
         raise HTTPException(status_code=401, detail="User not found")
     return user
 
+# ============ AUTH ADMISSION CONTROL ============
+
+# Password endpoints are throttled before any database or bcrypt work: a
+# sliding window per client IP and per email, plus a cap on requests that
+# hold a password hash slot. With AUTH_RATE_BACKEND=mongo the windows are
+# shared by all workers.
+AUTH_RATE_WINDOW_SECONDS = int(os.environ.get('AUTH_RATE_WINDOW_SECONDS', '60'))
+AUTH_RATE_LIMIT_PER_IP = int(os.environ.get('AUTH_RATE_LIMIT_PER_IP', '30'))
+AUTH_RATE_LIMIT_PER_EMAIL = int(os.environ.get('AUTH_RATE_LIMIT_PER_EMAIL', '10'))
+AUTH_MAX_CONCURRENT_HASHES = int(os.environ.get('AUTH_MAX_CONCURRENT_HASHES', str(PASSWORD_HASH_WORKERS * 4)))
+AUTH_RATE_BACKEND = os.environ.get('AUTH_RATE_BACKEND', 'memory').lower()
+AUTH_RATE_MAX_KEYS = int(os.environ.get('AUTH_RATE_MAX_KEYS', '100000'))
+# Proxies in front of the app that append to X-Forwarded-For; 0 trusts only the socket peer
+AUTH_RATE_PROXY_HOPS = int(os.environ.get('AUTH_RATE_PROXY_HOPS', '0'))
+
+def sliding_estimate(previous: int, current: int, window: float, now: float) -> float:
+    """Sliding-window count: the current bucket plus the unexpired share of the previous one"""
+    elapsed = (now % window) / window
+    return current + previous * (1 - elapsed)
+
+class MemoryWindowCounter:
+    """Per-key sliding-window counters held in this process"""
+
+    def __init__(self, window: int, max_keys: int):
+        self.window = window
+        self.max_keys = max_keys
+        # key -> [bucket, previous count, current count]
+        self.buckets: OrderedDict = OrderedDict()
+
+    async def hit(self, key: str, now: float) -> float:
+        bucket = int(now // self.window)
+        state = self.buckets.get(key)
+        if state is None or state[0] < bucket - 1:
+            state = [bucket, 0, 0]
+        elif state[0] == bucket - 1:
+            state = [bucket, state[2], 0]
+        state[2] += 1
+        self.buckets[key] = state
+        self.buckets.move_to_end(key)
+        while len(self.buckets) > self.max_keys:
+            self.buckets.popitem(last=False)
+        return sliding_estimate(state[1], state[2], self.window, now)
+
+    def stats(self) -> Dict:
+        return {"backend": "memory", "keys": len(self.buckets), "max_keys": self.max_keys}
+
+class MongoWindowCounter:
+    """Sliding-window counters in MongoDB, one TTL-indexed document per key and bucket"""
+
+    def __init__(self, window: int, fallback: MemoryWindowCounter):
+        self.window = window
+        self.fallback = fallback
+        self.collection = db.auth_rate_limits
+        self.errors = 0
+
+    async def ensure_indexes(self):
+        await self.collection.create_index("expires_at", expireAfterSeconds=0)
+
+    async def hit(self, key: str, now: float) -> float:
+        bucket = int(now // self.window)
+        try:
+            current = await self.collection.find_one_and_update(
+                {"_id": f"{key}|{bucket}"},
+                {"$inc": {"count": 1},
+                 "$setOnInsert": {"expires_at": datetime.fromtimestamp((bucket + 2) * self.window, timezone.utc)}},
+                upsert=True, return_document=ReturnDocument.AFTER
+            )
+            previous = await self.collection.find_one({"_id": f"{key}|{bucket - 1}"}, {"count": 1})
+        except PyMongoError as e:
+            # Keep limiting per worker rather than failing open
+            self.errors += 1
+            logger.warning(f"Shared auth rate limit unavailable, using local window: {e}")
+            return await self.fallback.hit(key, now)
+        return sliding_estimate(previous["count"] if previous else 0, current["count"], self.window, now)
+
+    def stats(self) -> Dict:
+        return {"backend": "mongo", "errors": self.errors, "local_fallback": self.fallback.stats()}
+
+class AuthAdmission:
+    """Cheap 429 gate in front of password verification and hashing"""
+
+    def __init__(self, counter, window: int, ip_limit: int, email_limit: int, max_hashes: int):
+        self.counter = counter
+        self.window = window
+        self.ip_limit = ip_limit
+        self.email_limit = email_limit
+        self.max_hashes = max_hashes
+        self.hashing = 0
+        self.counters = {"admitted": 0, "rejected_busy": 0, "rejected_ip": 0, "rejected_email": 0}
+
+    def reject(self, reason: str, detail: str, retry_after: int):
+        self.counters[f"rejected_{reason}"] += 1
+        raise HTTPException(status_code=429, detail=detail, headers={"Retry-After": str(retry_after)})
+
+    @asynccontextmanager
+    async def admit(self, request: Request, email: str, hashes: bool = True):
+        """Count the attempt and hold a hash slot for the handler; raise 429 when over budget"""
+        if hashes:
+            # Reserved up front and released on exit, so a burst cannot all
+            # pass the check before any of them reaches the password pool
+            if self.hashing >= self.max_hashes:
+                self.reject("busy", "Too many sign-in attempts in progress, please retry", PASSWORD_HASH_RETRY_AFTER)
+            self.hashing += 1
+        try:
+            now = time.time()
+            retry_after = int(self.window - now % self.window) + 1
+            ip_count, email_count = await asyncio.gather(
+                self.counter.hit(f"ip:{client_ip(request)}", now),
+                # Hashed so the shared backend never stores addresses in the clear
+                self.counter.hit(f"email:{content_digest(email.lower().encode())}", now)
+            )
+            if ip_count > self.ip_limit:
+                self.reject("ip", "Too many attempts from this address, please retry later", retry_after)
+            if email_count > self.email_limit:
+                self.reject("email", "Too many attempts for this account, please retry later", retry_after)
+            self.counters["admitted"] += 1
+            yield
+        finally:
+            if hashes:
+                self.hashing -= 1
+
+    def stats(self) -> Dict:
+        return {
+            "window_seconds": self.window,
+            "limit_per_ip": self.ip_limit,
+            "limit_per_email": self.email_limit,
+            "max_concurrent_hashes": self.max_hashes,
+            "hashes_in_flight": self.hashing,
+            "hashes_pending": password_hasher.pending,
+            **self.counters,
+            "store": self.counter.stats()
+        }
+
+def client_ip(request: Request) -> str:
+    """Client address, read from X-Forwarded-For only as far as AUTH_RATE_PROXY_HOPS trusted proxies"""
+    if AUTH_RATE_PROXY_HOPS > 0:
+        forwarded = [part.strip() for part in request.headers.get("x-forwarded-for", "").split(",") if part.strip()]
+        if len(forwarded) >= AUTH_RATE_PROXY_HOPS:
+            return forwarded[-AUTH_RATE_PROXY_HOPS]
+    return request.client.host if request.client else "unknown"
+
+def build_auth_rate_counter():
+    memory = MemoryWindowCounter(AUTH_RATE_WINDOW_SECONDS, AUTH_RATE_MAX_KEYS)
+    if AUTH_RATE_BACKEND == "mongo":
+        return MongoWindowCounter(AUTH_RATE_WINDOW_SECONDS, memory)
+    return memory
+
+auth_admission = AuthAdmission(build_auth_rate_counter(), AUTH_RATE_WINDOW_SECONDS, AUTH_RATE_LIMIT_PER_IP,
+                               AUTH_RATE_LIMIT_PER_EMAIL, AUTH_MAX_CONCURRENT_HASHES)
+
 # ============ AUTH MODELS ============
 
 class UserRegister(BaseModel):
@@ -228,19 +1319,426 @@ async def require_admin(credentials: HTTPAuthorizationCredentials = Depends(secu
         raise HTTPException(status_code=403, detail="Admin access required")
     return payload
 
-async def fetch_with_retry(url: str, params: dict = None, max_retries: int = 2):
+# ============ UPSTREAM HTTP CLIENT ============
+
+# Pool settings for the shared upstream client (from environment)
+UPSTREAM_MAX_CONNECTIONS = int(os.environ.get('UPSTREAM_MAX_CONNECTIONS', '20'))
+UPSTREAM_MAX_KEEPALIVE = int(os.environ.get('UPSTREAM_MAX_KEEPALIVE', '10'))
+UPSTREAM_KEEPALIVE_EXPIRY = float(os.environ.get('UPSTREAM_KEEPALIVE_EXPIRY', '60'))
+UPSTREAM_TIMEOUT = float(os.environ.get('UPSTREAM_TIMEOUT', '10'))
+UPSTREAM_CONNECT_TIMEOUT = float(os.environ.get('UPSTREAM_CONNECT_TIMEOUT', '5'))
+UPSTREAM_POOL_TIMEOUT = float(os.environ.get('UPSTREAM_POOL_TIMEOUT', '5'))
+UPSTREAM_HTTP2 = os.environ.get('UPSTREAM_HTTP2', 'true').lower() == 'true'
+
+try:
+    import h2  # noqa: F401 - httpx only needs it to be importable
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# httpx has no public pool API; connection counts come from its httpcore 1.x
+# pool and are only read when that is the version installed
+POOL_STATS_AVAILABLE = httpcore.__version__.startswith("1.")
+
+class UpstreamClient:
+    """App-scoped pooled httpx client shared by every upstream call"""
+
+    def __init__(self):
+        self.client: Optional[httpx.AsyncClient] = None
+        self.http2 = UPSTREAM_HTTP2 and HTTP2_AVAILABLE
+        self.requests = 0
+        self.in_flight = 0
+        self.errors = 0
+        self.started_at: Optional[datetime] = None
+
+    async def start(self):
+        """Create the pooled client (called on app startup)"""
+        if self.client is not None:
+            return
+        self.client = httpx.AsyncClient(
+            http2=self.http2,
+            limits=httpx.Limits(
+                max_connections=UPSTREAM_MAX_CONNECTIONS,
+                max_keepalive_connections=UPSTREAM_MAX_KEEPALIVE,
+                keepalive_expiry=UPSTREAM_KEEPALIVE_EXPIRY
+            ),
+            timeout=httpx.Timeout(
+                UPSTREAM_TIMEOUT,
+                connect=UPSTREAM_CONNECT_TIMEOUT,
+                pool=UPSTREAM_POOL_TIMEOUT
+            ),
+            headers={"Accept": "application/json"}
+        )
+        self.started_at = datetime.now(timezone.utc)
+        logger.info(f"Upstream client started (http2={self.http2}, max_connections={UPSTREAM_MAX_CONNECTIONS})")
+
+    async def close(self):
+        """Close the pooled client (called on app shutdown)"""
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+
+    async def get(self, url: str, params: dict = None) -> httpx.Response:
+        """GET through the shared pool, starting it lazily if needed"""
+        if self.client is None:
+            await self.start()
+        self.requests += 1
+        self.in_flight += 1
+        try:
+            return await self.client.get(url, params=params)
+        except Exception:
+            self.errors += 1
+            raise
+        finally:
+            self.in_flight -= 1
+
+    def pool_connections(self) -> Optional[List]:
+        """Connections in the client's pool, or None when they cannot be read (approximate)"""
+        if self.client is None:
+            return []
+        if not POOL_STATS_AVAILABLE:
+            return None
+        pool = getattr(getattr(self.client, "_transport", None), "_pool", None)
+        connections = getattr(pool, "connections", None)
+        return list(connections) if connections is not None else None
+
+    def pool_stats(self) -> Dict:
+        """Connection counts, each "unavailable" when the pool internals cannot be read"""
+        connections = self.pool_connections()
+        try:
+            idle = sum(1 for c in connections if c.is_idle()) if connections is not None else None
+        except AttributeError:
+            idle = None
+        if idle is None:
+            return dict.fromkeys(("connections", "idle_connections", "active_connections"), "unavailable")
+        return {"connections": len(connections), "idle_connections": idle,
+                "active_connections": len(connections) - idle}
+
+    def stats(self) -> Dict:
+        """Report request counters and connection pool usage.
+
+        in_flight counts requests, so it stays exact under HTTP/2 where one
+        connection carries several of them; connection counts are best effort.
+        """
+        return {
+            "started": self.client is not None,
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "http2": self.http2,
+            "http2_available": HTTP2_AVAILABLE,
+            "requests": self.requests,
+            "in_flight": self.in_flight,
+            "errors": self.errors,
+            **self.pool_stats(),
+            "limits": {
+                "max_connections": UPSTREAM_MAX_CONNECTIONS,
+                "max_keepalive_connections": UPSTREAM_MAX_KEEPALIVE,
+                "keepalive_expiry": UPSTREAM_KEEPALIVE_EXPIRY,
+                "timeout": UPSTREAM_TIMEOUT,
+                "connect_timeout": UPSTREAM_CONNECT_TIMEOUT
+            }
+        }
+
+upstream = UpstreamClient()
+
+# ============ UPSTREAM RATE-LIMIT BUDGET ============
+
+# CoinGecko call budget shared by every endpoint and background job
+UPSTREAM_CALLS_PER_MINUTE = float(os.environ.get('UPSTREAM_CALLS_PER_MINUTE', '30'))
+UPSTREAM_BURST = float(os.environ.get('UPSTREAM_BURST', '5'))
+# Tokens kept back for interactive calls; background calls wait above this
+UPSTREAM_RESERVE_TOKENS = float(os.environ.get('UPSTREAM_RESERVE_TOKENS', '1'))
+
+# Priority classes - lower runs first
+UPSTREAM_PRIORITY_INTERACTIVE = 0  # user-facing prices
+UPSTREAM_PRIORITY_STANDARD = 1     # other user-facing market data
+UPSTREAM_PRIORITY_BACKGROUND = 2   # prefetch and stale-while-revalidate refreshes
+UPSTREAM_PRIORITY_NAMES = {
+    UPSTREAM_PRIORITY_INTERACTIVE: "interactive",
+    UPSTREAM_PRIORITY_STANDARD: "standard",
+    UPSTREAM_PRIORITY_BACKGROUND: "background",
+}
+# Longest expected queueing delay per class before a call is shed instead
+UPSTREAM_MAX_QUEUE_WAIT = {
+    UPSTREAM_PRIORITY_INTERACTIVE: float(os.environ.get('UPSTREAM_MAX_WAIT_INTERACTIVE', '5')),
+    UPSTREAM_PRIORITY_STANDARD: float(os.environ.get('UPSTREAM_MAX_WAIT_STANDARD', '10')),
+    UPSTREAM_PRIORITY_BACKGROUND: float(os.environ.get('UPSTREAM_MAX_WAIT_BACKGROUND', '60')),
+}
+
+# Background tasks set this so every upstream call they cause is low priority
+upstream_priority_floor: ContextVar[int] = ContextVar("upstream_priority_floor", default=UPSTREAM_PRIORITY_INTERACTIVE)
+
+class UpstreamBudgetExceeded(Exception):
+    """Raised when an upstream call is shed because the budget is exhausted"""
+
+class UpstreamBudget:
+    """Token bucket with a priority queue in front of every CoinGecko call"""
+
+    def __init__(self, calls_per_minute: float, burst: float, reserve: float):
+        self.rate = calls_per_minute / 60.0
+        self.capacity = max(burst, 1.0)
+        self.reserve = reserve
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.waiters: List[tuple] = []
+        self.seq = 0
+        self.dispatcher: Optional[asyncio.Task] = None
+        self.metrics = {
+            name: {"granted": 0, "queued": 0, "shed": 0, "total_wait": 0.0, "max_wait": 0.0}
+            for name in UPSTREAM_PRIORITY_NAMES.values()
+        }
+        self.rate_limited = 0
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def _threshold(self, priority: int) -> float:
+        """Tokens that must be left before a call of this class may run"""
+        return 1 + (self.reserve if priority >= UPSTREAM_PRIORITY_BACKGROUND else 0)
+
+    async def acquire(self, priority: int = UPSTREAM_PRIORITY_STANDARD):
+        """Wait for a token, or raise UpstreamBudgetExceeded if the wait is too long"""
+        priority = max(priority, upstream_priority_floor.get())
+        metrics = self.metrics[UPSTREAM_PRIORITY_NAMES[priority]]
+        self._refill()
+        if not self.waiters and self.tokens >= self._threshold(priority):
+            self.tokens -= 1
+            metrics["granted"] += 1
+            return
+
+        ahead = sum(1 for waiter in self.waiters if waiter[0] <= priority and not waiter[2].done())
+        expected_wait = (ahead + self._threshold(priority) - self.tokens) / self.rate if self.rate > 0 else float("inf")
+        if expected_wait > UPSTREAM_MAX_QUEUE_WAIT[priority]:
+            metrics["shed"] += 1
+            raise UpstreamBudgetExceeded(
+                f"Upstream budget exhausted ({UPSTREAM_PRIORITY_NAMES[priority]} call shed, expected wait {expected_wait:.1f}s)"
+            )
+
+        future = asyncio.get_running_loop().create_future()
+        self.seq += 1
+        heapq.heappush(self.waiters, (priority, self.seq, future))
+        metrics["queued"] += 1
+        if self.dispatcher is None or self.dispatcher.done():
+            self.dispatcher = asyncio.ensure_future(self._dispatch())
+        started = time.monotonic()
+        await future
+        waited = time.monotonic() - started
+        metrics["granted"] += 1
+        metrics["total_wait"] += waited
+        metrics["max_wait"] = max(metrics["max_wait"], waited)
+
+    async def _dispatch(self):
+        """Hand out tokens to queued calls in priority order as they refill"""
+        while self.waiters:
+            priority, _, future = self.waiters[0]
+            if future.done():
+                # Caller went away while queued
+                heapq.heappop(self.waiters)
+                continue
+            self._refill()
+            threshold = self._threshold(priority)
+            if self.tokens >= threshold:
+                heapq.heappop(self.waiters)
+                self.tokens -= 1
+                future.set_result(None)
+                continue
+            await asyncio.sleep((threshold - self.tokens) / self.rate)
+
+    def penalize(self):
+        """Upstream answered 429: drain the bucket so every caller backs off"""
+        self.rate_limited += 1
+        self._refill()
+        self.tokens = min(self.tokens, 0)
+
+    def stats(self) -> Dict:
+        self._refill()
+        classes = {}
+        for name, metrics in self.metrics.items():
+            waited = metrics["queued"]
+            classes[name] = {
+                **{k: v for k, v in metrics.items() if k != "total_wait"},
+                "max_wait": round(metrics["max_wait"], 3),
+                "avg_wait": round(metrics["total_wait"] / waited, 3) if waited else 0,
+                "waiting": sum(
+                    1 for w in self.waiters
+                    if UPSTREAM_PRIORITY_NAMES[w[0]] == name and not w[2].done()
+                )
+            }
+        return {
+            "calls_per_minute": self.rate * 60,
+            "burst": self.capacity,
+            "reserve_tokens": self.reserve,
+            "remaining_tokens": round(self.tokens, 2),
+            "queue_depth": sum(1 for w in self.waiters if not w[2].done()),
+            "rate_limited_responses": self.rate_limited,
+            "classes": classes
+        }
+
+upstream_budget = UpstreamBudget(UPSTREAM_CALLS_PER_MINUTE, UPSTREAM_BURST, UPSTREAM_RESERVE_TOKENS)
+
+# ============ CIRCUIT BREAKER ============
+
+CIRCUIT_WINDOW = int(os.environ.get('CIRCUIT_WINDOW', '20'))
+CIRCUIT_MIN_CALLS = int(os.environ.get('CIRCUIT_MIN_CALLS', '5'))
+CIRCUIT_FAILURE_RATE = float(os.environ.get('CIRCUIT_FAILURE_RATE', '0.5'))
+CIRCUIT_SLOW_CALL_SECONDS = float(os.environ.get('CIRCUIT_SLOW_CALL_SECONDS', '5'))
+CIRCUIT_OPEN_SECONDS = float(os.environ.get('CIRCUIT_OPEN_SECONDS', '30'))
+CIRCUIT_HALF_OPEN_CALLS = int(os.environ.get('CIRCUIT_HALF_OPEN_CALLS', '1'))
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling upstream while the circuit breaker is open"""
+
+class CircuitBreaker:
+    """Closed/open/half-open breaker driven by error rate and slow calls.
+
+    Errors and calls slower than slow_call_seconds both count as failures
+    over a sliding window of recent calls. Once the failure rate trips the
+    breaker, calls fail immediately until open_seconds pass; then a few
+    trial calls decide whether it closes again.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, window: int, min_calls: int, failure_rate: float,
+                 slow_call_seconds: float, open_seconds: float, half_open_calls: int):
+        self.name = name
+        self.window = deque(maxlen=window)
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.open_seconds = open_seconds
+        self.half_open_calls = half_open_calls
+        self.state = self.CLOSED
+        self.opened_at = 0.0
+        self.trials_in_flight = 0
+        self.trial_successes = 0
+        self.times_opened = 0
+        self.rejected = 0
+        self.last_failure: Optional[str] = None
+        self.changed_at = datetime.now(timezone.utc)
+
+    def _transition(self, state: str):
+        if state != self.state:
+            logger.warning(f"Circuit breaker '{self.name}' {self.state} -> {state}")
+            self.state = state
+            self.changed_at = datetime.now(timezone.utc)
+
+    def check(self):
+        """Raise CircuitOpenError if calls are currently refused"""
+        if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.open_seconds:
+            self._transition(self.HALF_OPEN)
+            self.trials_in_flight = 0
+            self.trial_successes = 0
+        if self.state == self.OPEN or (
+            self.state == self.HALF_OPEN and self.trials_in_flight >= self.half_open_calls
+        ):
+            self.rejected += 1
+            raise CircuitOpenError(f"Circuit breaker '{self.name}' is {self.state}")
+
+    def before_call(self):
+        """Check the breaker and claim a trial slot when half-open"""
+        self.check()
+        if self.state == self.HALF_OPEN:
+            self.trials_in_flight += 1
+
+    def record(self, ok: bool, duration: float, error: Optional[str] = None):
+        """Record the outcome of a call made after before_call"""
+        failed = not ok or duration >= self.slow_call_seconds
+        if failed:
+            self.last_failure = error or f"slow call ({duration:.1f}s)"
+        if self.state == self.HALF_OPEN:
+            self.trials_in_flight = max(self.trials_in_flight - 1, 0)
+            if failed:
+                self._trip()
+            else:
+                self.trial_successes += 1
+                if self.trial_successes >= self.half_open_calls:
+                    self.window.clear()
+                    self._transition(self.CLOSED)
+            return
+        self.window.append(failed)
+        if self.state == self.CLOSED and len(self.window) >= self.min_calls:
+            if sum(self.window) / len(self.window) >= self.failure_rate:
+                self._trip()
+
+    def abandon(self):
+        """A call made after before_call was cancelled without an outcome"""
+        if self.state == self.HALF_OPEN:
+            self.trials_in_flight = max(self.trials_in_flight - 1, 0)
+
+    def _trip(self):
+        self.opened_at = time.monotonic()
+        self.times_opened += 1
+        self._transition(self.OPEN)
+
+    def stats(self) -> Dict:
+        failures = sum(self.window)
+        retry_in = 0.0
+        if self.state == self.OPEN:
+            retry_in = max(self.open_seconds - (time.monotonic() - self.opened_at), 0)
+        return {
+            "name": self.name,
+            "state": self.state,
+            "since": self.changed_at.isoformat(),
+            "retry_in_seconds": round(retry_in, 1),
+            "window_calls": len(self.window),
+            "window_failures": failures,
+            "failure_rate": round(failures / len(self.window), 3) if self.window else 0,
+            "times_opened": self.times_opened,
+            "rejected_calls": self.rejected,
+            "last_failure": self.last_failure,
+            "config": {
+                "window": self.window.maxlen,
+                "min_calls": self.min_calls,
+                "failure_rate": self.failure_rate,
+                "slow_call_seconds": self.slow_call_seconds,
+                "open_seconds": self.open_seconds,
+                "half_open_calls": self.half_open_calls
+            }
+        }
+
+coingecko_breaker = CircuitBreaker(
+    "coingecko", CIRCUIT_WINDOW, CIRCUIT_MIN_CALLS, CIRCUIT_FAILURE_RATE,
+    CIRCUIT_SLOW_CALL_SECONDS, CIRCUIT_OPEN_SECONDS, CIRCUIT_HALF_OPEN_CALLS
+)
+
+def last_good_value(key: str):
+    """Most recent cached value for key, however stale, without going upstream"""
+    entry = cache.peek(key)
+    return entry.value if entry is not None else None
+
+async def fetch_with_retry(url: str, params: dict = None, max_retries: int = 2,
+                           priority: int = UPSTREAM_PRIORITY_STANDARD):
     """Fetch with retry and exponential backoff"""
     for attempt in range(max_retries):
+        # Fail fast while the breaker is open; neither that nor shedding is retried
+        coingecko_breaker.check()
+        await upstream_budget.acquire(priority)
+        coingecko_breaker.before_call()
+        started = time.monotonic()
         try:
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                response = await client.get(url, params=params)
-                if response.status_code == 429:
-                    wait_time = (attempt + 1) * 2 + random.uniform(0, 1)
-                    logger.warning(f"Rate limited, waiting {wait_time:.1f}s before retry {attempt + 1}")
-                    await asyncio.sleep(wait_time)
-                    continue
-                response.raise_for_status()
-                return response.json()
+            try:
+                response = await upstream.get(url, params=params)
+            except asyncio.CancelledError:
+                coingecko_breaker.abandon()
+                raise
+            except Exception as e:
+                coingecko_breaker.record(False, time.monotonic() - started, str(e) or type(e).__name__)
+                raise
+            # 429s are budget problems, not outages; 4xx means a bad request
+            coingecko_breaker.record(response.status_code < 500, time.monotonic() - started,
+                                     f"HTTP {response.status_code}")
+            if response.status_code == 429:
+                upstream_budget.penalize()
+                wait_time = (attempt + 1) * 2 + random.uniform(0, 1)
+                logger.warning(f"Rate limited, waiting {wait_time:.1f}s before retry {attempt + 1}")
+                await asyncio.sleep(wait_time)
+                continue
+            response.raise_for_status()
+            return response.json()
         except Exception as e:
             if attempt == max_retries - 1:
                 raise e
@@ -263,6 +1761,11 @@ class CryptoPrice(BaseModel):
     circulating_supply: Optional[float] = 0
     last_updated: str
 
+class CryptoPriceBatch(BaseModel):
+    prices: List[CryptoPrice]
+    not_found: List[str] = []
+    last_updated: str
+
 class HistoricalData(BaseModel):
     coin_id: str
     days: int
@@ -283,104 +1786,283 @@ class TrendingCoin(BaseModel):
 async def root():
     return {"message": "CryptoTrack API", "status": "online"}
 
+# ============ DATABASE INDEXES ============
+
+INDEX_BOOTSTRAP_ENABLED = os.environ.get('INDEX_BOOTSTRAP_ENABLED', 'true').lower() == 'true'
+INDEX_SLOW_BUILD_SECONDS = float(os.environ.get('INDEX_SLOW_BUILD_SECONDS', '2'))
+
+# Indexes the auth, admin and payment routes rely on: collection -> [(keys, options)]
+INDEX_SPECS: Dict[str, List[Tuple[List[Tuple[str, int]], Dict[str, Any]]]] = {
+    "users": [
+        ([("email", 1)], {"unique": True}),
+        ([("id", 1)], {"unique": True}),
+        ([("created_at", -1)], {}),
+    ],
+    "payment_transactions": [
+        ([("user_id", 1), ("created_at", -1)], {}),
+        ([("session_id", 1)], {}),
+        ([("created_at", -1)], {}),
+        ([("payment_status", 1)], {}),
+    ],
+    "password_resets": [
+        ([("token", 1)], {}),
+        ([("email", 1)], {}),
+        ([("used", 1), ("created_at", -1)], {}),
+        ([("expires_at", 1)], {"expireAfterSeconds": 0}),
+    ],
+    "admin_settings": [
+        ([("key", 1)], {"unique": True}),
+    ],
+}
+
+# One representative query per route: (route, collection, filter, sort)
+QUERY_PLAN_PROBES = [
+    ("POST /auth/register, /auth/login, /auth/forgot-password", "users", {"email": "probe@example.com"}, None),
+    ("GET /auth/me, POST /auth/change-password", "users", {"id": "probe"}, None),
+    ("GET /admin/users", "users", {}, [("created_at", -1)]),
+    ("GET /auth/transactions", "payment_transactions", {"user_id": "probe"}, [("created_at", -1)]),
+    ("GET /payments/status/{session_id}, POST /webhook/stripe", "payment_transactions", {"session_id": "probe"}, None),
+    ("GET /admin/transactions", "payment_transactions", {}, [("created_at", -1)]),
+    ("GET /admin/stats", "payment_transactions", {"payment_status": "paid"}, None),
+    ("POST /auth/forgot-password", "password_resets", {"email": "probe@example.com"}, None),
+    ("POST /auth/reset-password", "password_resets", {"token": "probe", "used": False}, None),
+    ("GET /admin/password-resets", "password_resets", {"used": False}, [("created_at", -1)]),
+    ("POST /admin/change-password", "admin_settings", {"key": "admin_password"}, None),
+]
+
+index_report: Dict[str, Any] = {"ran_at": None, "created": 0, "slow_builds": 0, "failed": 0, "collections": {}}
+
+def index_key_name(keys: List[Tuple[str, int]]) -> str:
+    """MongoDB's default index name for a key pattern, e.g. user_id_1_created_at_-1"""
+    return "_".join(f"{field}_{direction}" for field, direction in keys)
+
+def find_index(existing: Dict[str, Dict], keys: List[Tuple[str, int]]) -> Optional[Tuple[str, Dict]]:
+    """Locate an existing index with the same key pattern, whatever it was named"""
+    for name, info in existing.items():
+        if list(info.get("key", [])) == keys:
+            return name, info
+    return None
+
+def index_options_match(info: Dict, options: Dict[str, Any]) -> bool:
+    return all(info.get(option) == value for option, value in options.items())
+
+async def ensure_indexes() -> Dict[str, Any]:
+    """Create any missing indexes from INDEX_SPECS; safe to run on every startup"""
+    await migrate_reset_expiry()
+    created = slow = failed = 0
+    report = {}
+    for collection, specs in INDEX_SPECS.items():
+        existing = await db[collection].index_information()
+        rows = []
+        for keys, options in specs:
+            row = {"index": index_key_name(keys), **options}
+            found = find_index(existing, keys)
+            if found is not None:
+                name, info = found
+                if index_options_match(info, options):
+                    row["status"] = "present"
+                else:
+                    # Never drop an index behind the operator's back; report it instead
+                    row["status"] = "conflict"
+                    failed += 1
+                    logger.warning(f"Index {collection}.{name} exists without required options {options}")
+                rows.append(row)
+                continue
+
+            logger.info(f"Index {collection}.{row['index']} missing; building")
+            started = time.perf_counter()
+            try:
+                await db[collection].create_index(keys, **options)
+            except DuplicateKeyError as e:
+                row.update(status="failed", error="duplicate values")
+                failed += 1
+                logger.error(f"Cannot build unique index {collection}.{row['index']}: duplicate values ({e})")
+            except PyMongoError as e:
+                row.update(status="failed", error=str(e))
+                failed += 1
+                logger.error(f"Index build {collection}.{row['index']} failed: {e}")
+            else:
+                row["status"] = "created"
+                created += 1
+            row["seconds"] = round(time.perf_counter() - started, 3)
+            if row["seconds"] >= INDEX_SLOW_BUILD_SECONDS:
+                slow += 1
+                logger.warning(f"Slow index build {collection}.{row['index']}: {row['seconds']:.1f}s")
+            rows.append(row)
+        report[collection] = rows
+
+    index_report.update(ran_at=datetime.now(timezone.utc).isoformat(), created=created,
+                        slow_builds=slow, failed=failed, collections=report)
+    logger.info(f"Index bootstrap: {created} created, {failed} failed, {slow} slow")
+    return index_report
+
+async def migrate_reset_expiry():
+    """TTL indexes only expire BSON dates, so convert reset tokens stored with ISO-string expiries"""
+    legacy = await db.password_resets.find(
+        {"expires_at": {"$type": "string"}}, {"_id": 1, "expires_at": 1}
+    ).to_list(None)
+    for doc in legacy:
+        await db.password_resets.update_one(
+            {"_id": doc["_id"]}, {"$set": {"expires_at": parse_expiry(doc["expires_at"])}}
+        )
+    if legacy:
+        logger.info(f"Converted {len(legacy)} password reset expiries to dates")
+
+def parse_expiry(value: Any) -> datetime:
+    """Expiry as an aware UTC datetime from a BSON date (read back naive) or a legacy ISO string"""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value
+
+def plan_stages(plan: Dict) -> List[Dict]:
+    """Flatten an explain() plan tree into its stages, root first"""
+    stages = [plan]
+    children = plan.get("inputStages", [])
+    if "inputStage" in plan:
+        children = [plan["inputStage"], *children]
+    for child in children:
+        stages.extend(plan_stages(child))
+    return stages
+
+def summarize_plan(explain: Dict) -> Dict[str, Any]:
+    """Reduce explain output to the access path: COLLSCAN, IXSCAN (with index) or EOF"""
+    winning = explain.get("queryPlanner", {}).get("winningPlan", {})
+    # Slot-based engine nests the classic tree under queryPlan
+    stages = plan_stages(winning.get("queryPlan", winning))
+    names = [stage.get("stage", "") for stage in stages]
+    indexes = [stage["indexName"] for stage in stages if "indexName" in stage]
+    if "COLLSCAN" in names:
+        access = "COLLSCAN"
+    elif any("IXSCAN" in name or name == "IDHACK" for name in names):
+        access = "IXSCAN"
+    else:
+        access = names[-1] if names else "UNKNOWN"
+    return {"access": access, "indexes": indexes, "in_memory_sort": "SORT" in names}
+
+async def explain_route_queries() -> List[Dict[str, Any]]:
+    """Run each QUERY_PLAN_PROBES query through explain and report how MongoDB would serve it"""
+    results = []
+    for route, collection, query, sort in QUERY_PLAN_PROBES:
+        find = {"find": collection, "filter": query}
+        if sort:
+            find["sort"] = dict(sort)
+        row = {"route": route, "collection": collection, "filter": sorted(query), "sort": [field for field, _ in sort or []]}
+        try:
+            explain = await db.command({"explain": find, "verbosity": "queryPlanner"})
+            row.update(summarize_plan(explain))
+        except PyMongoError as e:
+            row.update(access="ERROR", error=str(e))
+        results.append(row)
+    return results
+
 # ============ AUTH ENDPOINTS ============
 
 @api_router.post("/auth/register")
-async def register(user_data: UserRegister):
+async def register(request: Request, user_data: UserRegister):
     """Register a new user"""
-    # Check if email already exists
-    existing = await db.users.find_one({"email": user_data.email.lower()})
-    if existing:
-        raise HTTPException(status_code=400, detail="Email already registered")
-    
-    # Validate password
-    if len(user_data.password) < 6:
-        raise HTTPException(status_code=400, detail="Password must be at least 6 characters")
-    
-    # Create user
-    user_id = str(uuid.uuid4())
-    
-    # Generate unique wallet addresses for each crypto
-    wallets = {
-        "BTC": generate_wallet_address("BTC", user_id),
-        "ETH": generate_wallet_address("ETH", user_id),
-        "SOL": generate_wallet_address("SOL", user_id),
-        "XRP": generate_wallet_address("XRP", user_id),
-        "USDT": generate_wallet_address("USDT", user_id)
-    }
-    
-    user = {
-        "id": user_id,
-        "email": user_data.email.lower(),
-        "password": hash_password(user_data.password),
-        "name": user_data.name,
-        "created_at": datetime.now(timezone.utc).isoformat(),
-        "wallets": wallets,
-        "balances": {
-            "BTC": 0.0,
-            "ETH": 0.0,
-            "SOL": 0.0,
-            "XRP": 0.0,
-            "USDT": 0.0
-        },
-        "total_deposited": 0.0,
-        "total_withdrawn": 0.0
-    }
-    
-    await db.users.insert_one(user)
-    
-    # Create token
-    token = create_token(user_id, user_data.email.lower())
-    
-    return {
-        "token": token,
-        "user": {
+    async with auth_admission.admit(request, user_data.email):
+        # Check if email already exists
+        existing = await db.users.find_one({"email": user_data.email.lower()})
+        if existing:
+            raise HTTPException(status_code=400, detail="Email already registered")
+        
+        # Validate password
+        if len(user_data.password) < 6:
+            raise HTTPException(status_code=400, detail="Password must be at least 6 characters")
+        
+        # Create user
+        user_id = str(uuid.uuid4())
+        
+        # Generate unique wallet addresses for each crypto
+        wallets = {
+            "BTC": generate_wallet_address("BTC", user_id),
+            "ETH": generate_wallet_address("ETH", user_id),
+            "SOL": generate_wallet_address("SOL", user_id),
+            "XRP": generate_wallet_address("XRP", user_id),
+            "USDT": generate_wallet_address("USDT", user_id)
+        }
+        
+        user = {
             "id": user_id,
             "email": user_data.email.lower(),
+            "password": await hash_password(user_data.password),
             "name": user_data.name,
-            "balances": user["balances"],
-            "wallets": wallets
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "wallets": wallets,
+            "balances": {
+                "BTC": 0.0,
+                "ETH": 0.0,
+                "SOL": 0.0,
+                "XRP": 0.0,
+                "USDT": 0.0
+            },
+            "total_deposited": 0.0,
+            "total_withdrawn": 0.0
+        }
+        
+        try:
+            await db.users.insert_one(user)
+        except DuplicateKeyError:
+            # Lost a race with a concurrent registration for the same email
+            raise HTTPException(status_code=400, detail="Email already registered")
+        
+        # Create token
+        token = create_token(user_id, user_data.email.lower())
+        
+        return {
+            "token": token,
+            "user": {
+                "id": user_id,
+                "email": user_data.email.lower(),
+                "name": user_data.name,
+                "balances": user["balances"],
+                "wallets": wallets
+            }
         }
-    }
 
 @api_router.post("/auth/login")
-async def login(credentials: UserLogin):
+async def login(request: Request, credentials: UserLogin):
     """Login user"""
-    user = await db.users.find_one({"email": credentials.email.lower()})
-    if not user:
-        raise HTTPException(status_code=401, detail="Invalid email or password")
-    
-    if not verify_password(credentials.password, user["password"]):
-        raise HTTPException(status_code=401, detail="Invalid email or password")
-    
-    # Create token
-    token = create_token(user["id"], user["email"])
-    
-    return {
-        "token": token,
-        "user": {
-            "id": user["id"],
-            "email": user["email"],
-            "name": user["name"],
-            "balances": user.get("balances", {}),
-            "wallets": user.get("wallets", {})
+    async with auth_admission.admit(request, credentials.email):
+        user = await db.users.find_one({"email": credentials.email.lower()})
+        if not user:
+            raise HTTPException(status_code=401, detail="Invalid email or password")
+        
+        if not await verify_password(credentials.password, user["password"]):
+            raise HTTPException(status_code=401, detail="Invalid email or password")
+        
+        if PASSWORD_REHASH_ON_LOGIN and hash_policy.needs_rehash(user["password"]):
+            hash_policy.schedule_rehash(user["id"], credentials.password, user["password"])
+        
+        # Create token
+        token = create_token(user["id"], user["email"])
+        
+        return {
+            "token": token,
+            "user": {
+                "id": user["id"],
+                "email": user["email"],
+                "name": user["name"],
+                "balances": user.get("balances", {}),
+                "wallets": user.get("wallets", {})
+            }
         }
-    }
 
 @api_router.get("/auth/me")
 async def get_me(user: Dict = Depends(require_auth)):
     """Get current user profile"""
-    # Get full user data including wallets
-    full_user = await db.users.find_one({"id": user["id"]}, {"_id": 0, "password": 0})
+    # The principal is already the full user document (minus the password)
     return {
-        "id": full_user["id"],
-        "email": full_user["email"],
-        "name": full_user["name"],
-        "balances": full_user.get("balances", {}),
-        "wallets": full_user.get("wallets", {}),
-        "total_deposited": full_user.get("total_deposited", 0),
-        "total_withdrawn": full_user.get("total_withdrawn", 0),
-        "created_at": full_user.get("created_at")
+        "id": user["id"],
+        "email": user["email"],
+        "name": user["name"],
+        "balances": user.get("balances", {}),
+        "wallets": user.get("wallets", {}),
+        "total_deposited": user.get("total_deposited", 0),
+        "total_withdrawn": user.get("total_withdrawn", 0),
+        "created_at": user.get("created_at")
     }
 
 @api_router.get("/auth/transactions")
@@ -405,27 +2087,28 @@ async def get_user_balances(user: Dict = Depends(require_auth)):
 # ============ ADMIN ENDPOINTS ============
 
 @api_router.post("/admin/login")
-async def admin_login(credentials: AdminLogin):
+async def admin_login(request: Request, credentials: AdminLogin):
     """Admin login"""
-    if credentials.email.lower() != ADMIN_EMAIL.lower():
-        raise HTTPException(status_code=401, detail="Invalid admin credentials")
-    if credentials.password != ADMIN_PASSWORD:
-        raise HTTPException(status_code=401, detail="Invalid admin credentials")
-    
-    # Create admin token
-    payload = {
-        "user_id": "admin",
-        "email": ADMIN_EMAIL,
-        "is_admin": True,
-        "exp": datetime.now(timezone.utc) + timedelta(hours=24)
-    }
-    token = jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
-    
-    return {
-        "token": token,
-        "admin": True,
-        "email": ADMIN_EMAIL
-    }
+    async with auth_admission.admit(request, credentials.email, hashes=False):
+        if credentials.email.lower() != ADMIN_EMAIL.lower():
+            raise HTTPException(status_code=401, detail="Invalid admin credentials")
+        if credentials.password != ADMIN_PASSWORD:
+            raise HTTPException(status_code=401, detail="Invalid admin credentials")
+        
+        # Create admin token
+        payload = {
+            "user_id": "admin",
+            "email": ADMIN_EMAIL,
+            "is_admin": True,
+            "exp": datetime.now(timezone.utc) + timedelta(hours=24)
+        }
+        token = jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
+        
+        return {
+            "token": token,
+            "admin": True,
+            "email": ADMIN_EMAIL
+        }
 
 @api_router.get("/admin/users")
 async def get_all_users(admin: Dict = Depends(require_admin)):
@@ -516,7 +2199,7 @@ async def user_change_password(req: ChangePasswordRequest, user: Dict = Depends(
     # Get full user with password
     full_user = await db.users.find_one({"id": user["id"]})
     
-    if not verify_password(req.current_password, full_user["password"]):
+    if not await verify_password(req.current_password, full_user["password"]):
         raise HTTPException(status_code=400, detail="Current password is incorrect")
     
     if len(req.new_password) < 6:
@@ -525,8 +2208,9 @@ async def user_change_password(req: ChangePasswordRequest, user: Dict = Depends(
     # Update password
     await db.users.update_one(
         {"id": user["id"]},
-        {"$set": {"password": hash_password(req.new_password), "updated_at": datetime.now(timezone.utc).isoformat()}}
+        {"$set": {"password": await hash_password(req.new_password), "updated_at": datetime.now(timezone.utc).isoformat()}}
     )
+    principal_cache.invalidate(user["id"])
     
     return {"message": "Password changed successfully"}
 
@@ -549,7 +2233,7 @@ async def forgot_password(req: ResetPasswordRequest):
         {"$set": {
             "token": reset_token,
             "email": req.email.lower(),
-            "expires_at": expires_at.isoformat(),
+            "expires_at": expires_at,
             "used": False,
             "created_at": datetime.now(timezone.utc).isoformat()
         }},
@@ -577,18 +2261,20 @@ async def reset_password(req: ResetPasswordConfirm):
         raise HTTPException(status_code=400, detail="Invalid or expired reset token")
     
     # Check expiration
-    expires_at = datetime.fromisoformat(reset_record["expires_at"].replace('Z', '+00:00'))
-    if datetime.now(timezone.utc) > expires_at:
+    if datetime.now(timezone.utc) > parse_expiry(reset_record["expires_at"]):
         raise HTTPException(status_code=400, detail="Reset token has expired")
     
     if len(req.new_password) < 6:
         raise HTTPException(status_code=400, detail="Password must be at least 6 characters")
     
     # Update user password
-    await db.users.update_one(
+    updated_user = await db.users.find_one_and_update(
         {"email": reset_record["email"]},
-        {"$set": {"password": hash_password(req.new_password), "updated_at": datetime.now(timezone.utc).isoformat()}}
+        {"$set": {"password": await hash_password(req.new_password), "updated_at": datetime.now(timezone.utc).isoformat()}},
+        projection={"_id": 0, "id": 1}
     )
+    if updated_user:
+        principal_cache.invalidate(updated_user["id"])
     
     # Mark token as used
     await db.password_resets.update_one(
@@ -598,313 +2284,1528 @@ async def reset_password(req: ResetPasswordConfirm):
     
     return {"message": "Password has been reset successfully"}
 
-@api_router.get("/admin/password-resets")
-async def get_password_resets(admin: Dict = Depends(require_admin)):
-    """Admin can see pending password reset requests"""
-    resets = await db.password_resets.find(
-        {"used": False},
-        {"_id": 0}
-    ).sort("created_at", -1).limit(50).to_list(50)
+@api_router.get("/admin/password-resets")
+async def get_password_resets(admin: Dict = Depends(require_admin)):
+    """Admin can see pending password reset requests"""
+    resets = await db.password_resets.find(
+        {"used": False},
+        {"_id": 0}
+    ).sort("created_at", -1).limit(50).to_list(50)
+    for reset in resets:
+        reset["expires_at"] = parse_expiry(reset["expires_at"]).isoformat()
+    
+    return {"resets": resets}
+
+def coin_to_price(coin: Dict) -> CryptoPrice:
+    """Build a CryptoPrice from a CoinGecko coins/markets row"""
+    return CryptoPrice(
+        coin_id=coin["id"],
+        name=coin["name"],
+        symbol=coin["symbol"],
+        current_price=coin.get("current_price", 0) or 0,
+        price_change_24h=coin.get("price_change_24h", 0) or 0,
+        price_change_percentage_24h=coin.get("price_change_percentage_24h", 0) or 0,
+        market_cap=coin.get("market_cap", 0) or 0,
+        total_volume=coin.get("total_volume", 0) or 0,
+        high_24h=coin.get("high_24h", 0) or 0,
+        low_24h=coin.get("low_24h", 0) or 0,
+        circulating_supply=coin.get("circulating_supply", 0) or 0,
+        last_updated=datetime.now(timezone.utc).isoformat()
+    )
+
+def coin_to_market_row(coin: Dict) -> Dict:
+    """Build a top-coins table row from a CoinGecko coins/markets row"""
+    return {
+        "id": coin["id"],
+        "name": coin["name"],
+        "symbol": coin["symbol"],
+        "image": coin.get("image", ""),
+        "current_price": coin.get("current_price", 0) or 0,
+        "market_cap": coin.get("market_cap", 0) or 0,
+        "market_cap_rank": coin.get("market_cap_rank", 0),
+        "price_change_percentage_24h": coin.get("price_change_percentage_24h", 0) or 0,
+        "price_change_percentage_7d": coin.get("price_change_percentage_7d_in_currency", 0) or 0,
+        "total_volume": coin.get("total_volume", 0) or 0
+    }
+
+# ============ MARKET SNAPSHOT ============
+
+class MarketSnapshot:
+    """The top-N coins/markets table, indexed by coin id.
+
+    One upstream call fills it; every /crypto/top-coins limit is a slice of
+    it and /crypto/price/{coin_id} is answered from it for any coin inside.
+    """
+
+    def __init__(self, rows: List[Dict], last_updated: Optional[str] = None):
+        self.rows = rows
+        self.coins = [coin_to_market_row(row) for row in rows]
+        self.by_id = {row["id"]: idx for idx, row in enumerate(rows)}
+        self.last_updated = last_updated or datetime.now(timezone.utc).isoformat()
+        encoded = encode_json(rows)
+        # Every view (top-coins slice, per-coin price) derives from rows + last_updated
+        self.etag = content_digest(encoded + self.last_updated.encode())
+        self.nbytes = len(encoded) + MarketCache.estimate_size(self.coins)
+        self.prices: Dict[str, Dict] = {}
+
+    def __contains__(self, coin_id: str) -> bool:
+        return coin_id in self.by_id
+
+    def top_coins(self, limit: int) -> Dict:
+        """Top-coins response for any limit up to the snapshot size"""
+        return {"coins": self.coins[:limit], "last_updated": self.last_updated}
+
+    def price(self, coin_id: str) -> Optional[Dict]:
+        """CryptoPrice-shaped data for a coin in the snapshot (built once)"""
+        idx = self.by_id.get(coin_id)
+        if idx is None:
+            return None
+        if coin_id not in self.prices:
+            price = coin_to_price(self.rows[idx]).model_dump()
+            price["last_updated"] = self.last_updated
+            self.prices[coin_id] = price
+        return self.prices[coin_id]
+
+async def load_market_snapshot() -> MarketSnapshot:
+    """Fetch the top-N market table from CoinGecko and cache it"""
+    data = await fetch_with_retry(
+        f"{COINGECKO_API}/coins/markets",
+        params={
+            "vs_currency": "usd",
+            "order": "market_cap_desc",
+            "per_page": MARKET_SNAPSHOT_SIZE,
+            "page": 1,
+            "sparkline": "false",
+            "price_change_percentage": "24h,7d"
+        },
+        priority=UPSTREAM_PRIORITY_INTERACTIVE
+    )
+    if not data:
+        raise ValueError("Empty coins/markets response")
+    snapshot = MarketSnapshot(data)
+    set_cached(MARKET_SNAPSHOT_KEY, snapshot)
+    return snapshot
+
+async def get_market_snapshot() -> MarketSnapshot:
+    """Get the market snapshot, fetching it if nothing usable is cached"""
+    snapshot = get_cached(MARKET_SNAPSHOT_KEY, CACHE_TTLS["snapshot"], refresh=load_market_snapshot)
+    if snapshot:
+        return snapshot
+    return await single_flight.do(MARKET_SNAPSHOT_KEY, load_market_snapshot)
+
+def peek_market_snapshot() -> Optional[MarketSnapshot]:
+    """Get the cached market snapshot without ever going upstream"""
+    return get_cached(MARKET_SNAPSHOT_KEY, CACHE_TTLS["snapshot"], refresh=load_market_snapshot)
+
+async def load_crypto_price(coin_id: str, cache_key: str):
+    """Fetch a coin price from CoinGecko and cache it"""
+    data = await fetch_with_retry(
+        f"{COINGECKO_API}/coins/markets",
+        params={
+            "vs_currency": "usd",
+            "ids": coin_id,
+            "order": "market_cap_desc",
+            "sparkline": "false",
+            "price_change_percentage": "24h"
+        },
+        priority=UPSTREAM_PRIORITY_INTERACTIVE
+    )
+    
+    if not data:
+        # Use fallback for bitcoin
+        if coin_id == "bitcoin":
+            logger.info("Using fallback data for bitcoin")
+            set_cached(cache_key, FALLBACK_BITCOIN)
+            return FALLBACK_BITCOIN
+        raise HTTPException(status_code=404, detail=f"Cryptocurrency {coin_id} not found")
+    
+    result = coin_to_price(data[0]).model_dump()
+    set_cached(cache_key, result)
+    return result
+
+async def resolve_crypto_price(coin_id: str) -> MarketView:
+    """Current price for a coin, with the cache entry it was served from"""
+    cache_key = f"price:{coin_id}"
+    cached = get_cached(cache_key, CACHE_TTLS["price"], refresh=lambda: load_crypto_price(coin_id, cache_key))
+    if cached:
+        return cached, entry_holding(cached, cache_key), None
+    
+    snapshot = peek_market_snapshot()
+    if snapshot and coin_id in snapshot:
+        return snapshot.price(coin_id), entry_holding(snapshot, MARKET_SNAPSHOT_KEY), f"price-{coin_id}"
+    
+    try:
+        result = await single_flight.do(cache_key, lambda: load_crypto_price(coin_id, cache_key))
+        return result, entry_holding(result, cache_key), None
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error fetching price: {e}")
+        stale = last_good_value(cache_key)
+        if stale:
+            return stale, entry_holding(stale, cache_key), None
+        # Return fallback for bitcoin
+        if coin_id == "bitcoin":
+            logger.info("Using fallback data for bitcoin due to error")
+            return FALLBACK_BITCOIN, None, None
+        raise HTTPException(status_code=500, detail="Failed to fetch price data")
+
+@api_router.get("/crypto/price/{coin_id}", response_model=CryptoPrice)
+async def get_crypto_price(request: Request, coin_id: str):
+    """Get current price for a cryptocurrency"""
+    return cached_response(request, *await resolve_crypto_price(coin_id))
+
+async def load_crypto_prices(coin_ids: List[str]) -> Dict[str, Dict]:
+    """Fetch several coin prices in one upstream call and cache each one"""
+    data = await fetch_with_retry(
+        f"{COINGECKO_API}/coins/markets",
+        params={
+            "vs_currency": "usd",
+            "ids": ",".join(coin_ids),
+            "order": "market_cap_desc",
+            "per_page": len(coin_ids),
+            "page": 1,
+            "sparkline": "false",
+            "price_change_percentage": "24h"
+        },
+        priority=UPSTREAM_PRIORITY_INTERACTIVE
+    )
+    
+    results = {}
+    for coin in data or []:
+        price = coin_to_price(coin).model_dump()
+        set_cached(f"price:{price['coin_id']}", price)
+        results[price["coin_id"]] = price
+    return results
+
+@api_router.get("/crypto/prices", response_model=CryptoPriceBatch)
+async def get_crypto_prices(ids: str):
+    """Get current prices for several cryptocurrencies (comma-separated ids)"""
+    coin_ids = list(dict.fromkeys(i.strip().lower() for i in ids.split(",") if i.strip()))
+    if not coin_ids:
+        raise HTTPException(status_code=400, detail="No coin ids given")
+    if len(coin_ids) > MAX_BATCH_PRICE_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_PRICE_IDS} ids per request")
+    
+    prices: Dict[str, Dict] = {}
+    missing = []
+    snapshot = peek_market_snapshot()
+    for coin_id in coin_ids:
+        cached = get_cached(f"price:{coin_id}", CACHE_TTLS["price"])
+        if cached:
+            prices[coin_id] = cached
+        elif snapshot and coin_id in snapshot:
+            prices[coin_id] = snapshot.price(coin_id)
+        else:
+            missing.append(coin_id)
+    
+    if missing:
+        try:
+            batch_key = f"prices:{','.join(sorted(missing))}"
+            prices.update(await single_flight.do(batch_key, lambda: load_crypto_prices(missing)))
+        except Exception as e:
+            logger.error(f"Error fetching batch prices: {e}")
+            # Serve whatever is still cached, however old, before giving up on a coin
+            for coin_id in missing:
+                stale = last_good_value(f"price:{coin_id}")
+                if stale:
+                    prices[coin_id] = stale
+                elif coin_id == "bitcoin":
+                    prices[coin_id] = FALLBACK_BITCOIN
+    
+    return {
+        "prices": [prices[coin_id] for coin_id in coin_ids if coin_id in prices],
+        "not_found": [coin_id for coin_id in coin_ids if coin_id not in prices],
+        "last_updated": datetime.now(timezone.utc).isoformat()
+    }
+
+def generate_fallback_historical(coin_id: str, days: int) -> Dict:
+    """Generate synthetic historical data when the API is unavailable"""
+    base_price = 104500 if coin_id == "bitcoin" else 3350
+    now = datetime.now(timezone.utc).timestamp() * 1000
+    prices = []
+    for i in range(days + 1):
+        timestamp = now - (days - i) * 86400000
+        variation = random.uniform(-0.02, 0.02)
+        price = base_price * (1 + variation * (i / days))
+        prices.append([timestamp, price])
+    
+    return {
+        "coin_id": coin_id,
+        "days": days,
+        "prices": prices,
+        "market_caps": [],
+        "total_volumes": [],
+        "is_fallback": True
+    }
+
+async def fetch_market_chart(coin_id: str, days: int):
+    """Fetch a market_chart series from CoinGecko"""
+    return await fetch_with_retry(
+        f"{COINGECKO_API}/coins/{coin_id}/market_chart",
+        params={
+            "vs_currency": "usd",
+            "days": days,
+            "interval": "daily" if days > 1 else "hourly"
+        }
+    )
+
+# ============ HISTORICAL PRICE STORE ============
+
+# Historical points are kept in a MongoDB time-series collection so each
+# series is downloaded once and afterwards only its missing tail is fetched
+HISTORY_STORE_ENABLED = os.environ.get('HISTORY_STORE_ENABLED', 'true').lower() == 'true'
+HISTORY_SYNC_SECONDS = int(os.environ.get('HISTORY_SYNC_SECONDS', str(CACHE_TTLS["historical"])))
+HISTORY_COLLECTION = "price_history"
+HISTORY_LIVE_MAX = 1000
+HISTORY_LOCK_STRIPES = 64
+
+class HistoricalStore:
+    """Incremental per-coin price history backed by a time-series collection.
+
+    Points are stored per (coin, interval) series, where interval follows the
+    market_chart request ("daily" for days > 1, "hourly" otherwise). The last
+    point of every upstream series is the live price rather than a closed
+    interval, so it is held in memory and appended when serving instead of
+    being persisted.
+    """
+
+    def __init__(self):
+        self.points = db[HISTORY_COLLECTION]
+        self.meta = db.price_history_meta
+        self.live: "OrderedDict[str, tuple]" = OrderedDict()
+        self.locks = [asyncio.Lock() for _ in range(HISTORY_LOCK_STRIPES)]
+        self.counters = {"full_fetches": 0, "tail_fetches": 0, "points_inserted": 0, "range_reads": 0,
+                         "sync_errors": 0}
+
+    async def ensure_collection(self):
+        """Create the time-series collection and its query index"""
+        existing = await db.list_collection_names(filter={"name": HISTORY_COLLECTION})
+        if not existing:
+            try:
+                await db.create_collection(
+                    HISTORY_COLLECTION,
+                    timeseries={"timeField": "ts", "metaField": "meta", "granularity": "hours"}
+                )
+            except PyMongoError as e:
+                # Pre-5.0 servers: a regular collection with the same index works too
+                logger.warning(f"Could not create time-series collection {HISTORY_COLLECTION}: {e}")
+        await self.points.create_index([("meta.coin_id", 1), ("meta.interval", 1), ("ts", 1)])
+
+    @staticmethod
+    def series_id(coin_id: str, interval: str) -> str:
+        return f"{coin_id}:{interval}"
+
+    async def get_series(self, coin_id: str, days: int) -> Optional[Dict]:
+        """Serve a days window from stored points, syncing the series first"""
+        interval = "daily" if days > 1 else "hourly"
+        series = self.series_id(coin_id, interval)
+        sync_error = None
+        async with self.locks[hash(series) % HISTORY_LOCK_STRIPES]:
+            try:
+                await self.sync(coin_id, interval, days)
+            except PyMongoError:
+                raise
+            except Exception as e:
+                # Upstream is down: whatever is already stored still answers the window
+                sync_error = e
+                self.counters["sync_errors"] += 1
+                logger.warning(f"History sync failed for {series}, serving stored points: {e}")
+
+        since = datetime.now(timezone.utc) - timedelta(days=days)
+        docs = await self.points.find(
+            {"meta.coin_id": coin_id, "meta.interval": interval, "ts": {"$gte": since}},
+            {"_id": 0, "ts": 1, "price": 1, "market_cap": 1, "total_volume": 1}
+        ).sort("ts", 1).to_list(None)
+        self.counters["range_reads"] += 1
+
+        rows = [
+            (to_epoch_ms(doc["ts"]), doc.get("price"), doc.get("market_cap"), doc.get("total_volume"))
+            for doc in docs
+        ]
+        live = self.live.get(series)
+        if live is not None and (not rows or live[0][0] > rows[-1][0]):
+            rows.append(live[0])
+        if not rows:
+            if sync_error is not None:
+                raise sync_error
+            return None
+        return {
+            "coin_id": coin_id,
+            "days": days,
+            "prices": [[ts, price] for ts, price, _, _ in rows if price is not None],
+            "market_caps": [[ts, cap] for ts, _, cap, _ in rows if cap is not None],
+            "total_volumes": [[ts, volume] for ts, _, _, volume in rows if volume is not None]
+        }
+
+    async def sync(self, coin_id: str, interval: str, days: int):
+        """Fetch whatever the stored series is missing for a days window"""
+        series = self.series_id(coin_id, interval)
+        meta = await self.meta.find_one({"_id": series})
+        live = self.live.get(series)
+        now = time.time()
+
+        if meta is None or meta.get("days_fetched", 0) < days:
+            fetch_days = days
+            self.counters["full_fetches"] += 1
+        elif live is None or now - live[1] >= HISTORY_SYNC_SECONDS:
+            gap = now - to_epoch_ms(meta["latest_ts"]) / 1000 if meta.get("latest_ts") else days * 86400
+            fetch_days = min(days, max(1, math.ceil(gap / 86400) + 1)) if interval == "daily" else days
+            self.counters["tail_fetches"] += 1
+        else:
+            return
+
+        data = await fetch_market_chart(coin_id, fetch_days)
+        if not data or not data.get("prices"):
+            return
+        caps = {int(ts): value for ts, value in data.get("market_caps", [])}
+        volumes = {int(ts): value for ts, value in data.get("total_volumes", [])}
+        rows = [(int(ts), price, caps.get(int(ts)), volumes.get(int(ts))) for ts, price in data["prices"]]
+
+        *closed, last = rows
+        self.live[series] = (last, now)
+        self.live.move_to_end(series)
+        while len(self.live) > HISTORY_LIVE_MAX:
+            self.live.popitem(last=False)
+
+        latest = to_epoch_ms(meta["latest_ts"]) if meta and meta.get("latest_ts") else None
+        earliest = to_epoch_ms(meta["earliest_ts"]) if meta and meta.get("earliest_ts") else None
+        new_rows = [
+            row for row in closed
+            if latest is None or row[0] > latest or row[0] < earliest
+        ]
+        if new_rows:
+            await self.points.insert_many([
+                {
+                    "meta": {"coin_id": coin_id, "interval": interval},
+                    "ts": datetime.fromtimestamp(ts / 1000, timezone.utc),
+                    "price": price,
+                    "market_cap": cap,
+                    "total_volume": volume
+                }
+                for ts, price, cap, volume in new_rows
+            ], ordered=False)
+            self.counters["points_inserted"] += len(new_rows)
+
+        stored = [row[0] for row in new_rows] + [ts for ts in (latest, earliest) if ts is not None]
+        update: Dict[str, Any] = {
+            "coin_id": coin_id,
+            "interval": interval,
+            "days_fetched": max(days, meta.get("days_fetched", 0) if meta else 0),
+            "synced_at": datetime.now(timezone.utc)
+        }
+        if stored:
+            update["latest_ts"] = datetime.fromtimestamp(max(stored) / 1000, timezone.utc)
+            update["earliest_ts"] = datetime.fromtimestamp(min(stored) / 1000, timezone.utc)
+        await self.meta.update_one({"_id": series}, {"$set": update}, upsert=True)
+
+    def stats(self) -> Dict:
+        return {"enabled": HISTORY_STORE_ENABLED, "live_series": len(self.live), **self.counters}
+
+def to_epoch_ms(value: datetime) -> int:
+    """Epoch milliseconds for a datetime read back from MongoDB (naive UTC)"""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(value.timestamp() * 1000)
+
+historical_store = HistoricalStore()
+
+def build_historical_result(coin_id: str, days: int, data: Optional[Dict]) -> Optional[Dict]:
+    """Shape a raw market_chart response for /crypto/historical"""
+    if not data:
+        return None
+    return {
+        "coin_id": coin_id,
+        "days": days,
+        "prices": data.get("prices", []),
+        "market_caps": data.get("market_caps", []),
+        "total_volumes": data.get("total_volumes", [])
+    }
+
+async def load_historical_data(coin_id: str, days: int, cache_key: str):
+    """Load historical chart data (from the store when enabled) and cache it"""
+    if HISTORY_STORE_ENABLED and days >= 1:
+        try:
+            result = await historical_store.get_series(coin_id, days)
+        except PyMongoError as e:
+            logger.warning(f"Historical store unavailable, fetching {coin_id} directly: {e}")
+            result = build_historical_result(coin_id, days, await fetch_market_chart(coin_id, days))
+    else:
+        result = build_historical_result(coin_id, days, await fetch_market_chart(coin_id, days))
+    
+    if not result:
+        # Generate fallback historical data
+        logger.info(f"Using fallback historical data for {coin_id}")
+        fallback_result = generate_fallback_historical(coin_id, days)
+        set_cached(cache_key, fallback_result)
+        return fallback_result
+    
+    set_cached(cache_key, result)
+    return result
+
+# ============ HISTORICAL DOWNSAMPLING ============
+
+# Bounds for the points= parameter of /crypto/historical
+HISTORICAL_MIN_POINTS = 3
+HISTORICAL_MAX_POINTS = 5000
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """Indices kept by Largest-Triangle-Three-Buckets downsampling.
+
+    The first and last points are always kept; every bucket in between keeps
+    the point forming the largest triangle with the previously kept point and
+    the average of the next bucket, which preserves peaks and troughs.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    kept = np.empty(threshold, dtype=np.int64)
+    kept[0], kept[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(area.argmax())
+        kept[i + 1] = a
+    return kept
+
+def downsample_series(series: List[List[float]], points: int) -> List[List[float]]:
+    """Downsample a [[timestamp, value], ...] series to at most points pairs"""
+    if len(series) <= points:
+        return series
+    arr = np.asarray(series, dtype=np.float64)
+    kept = lttb_indices(arr[:, 0], arr[:, 1], points)
+    return arr[kept].tolist()
+
+def downsample_historical(result: Dict, points: int) -> Dict:
+    """Copy of a historical result with every series downsampled"""
+    return {
+        **result,
+        "prices": downsample_series(result.get("prices", []), points),
+        "market_caps": downsample_series(result.get("market_caps", []), points),
+        "total_volumes": downsample_series(result.get("total_volumes", []), points),
+        "points": points
+    }
+
+# ============ COLUMNAR HISTORICAL ENCODING ============
+
+# Compact binary alternative to JSON for /crypto/historical, negotiated with
+# format=columnar or an Accept header naming COLUMNAR_MEDIA_TYPE. Layout
+# (little-endian):
+#   header:     4s magic "CTH1" | u8 version | u8 value width (4 or 8) | u32 meta length
+#   meta:       UTF-8 JSON {"coin_id", "days", "series", optional "points"/"is_fallback"}
+#   per series: u32 count | u8 delta width (4 or 8) | i64 first timestamp (ms)
+#               | (count - 1) timestamp deltas (ms) | count values (float32/float64)
+COLUMNAR_MEDIA_TYPE = "application/vnd.cryptotrack.columnar"
+COLUMNAR_MAGIC = b"CTH1"
+COLUMNAR_VERSION = 1
+COLUMNAR_SERIES = ("prices", "market_caps", "total_volumes")
+
+def encode_columnar(result: Dict, value_width: int = 8) -> bytes:
+    """Encode a historical result as delta-encoded timestamps plus packed values"""
+    meta = {key: result[key] for key in ("coin_id", "days", "points", "is_fallback") if key in result}
+    meta["series"] = list(COLUMNAR_SERIES)
+    meta_bytes = json.dumps(meta).encode("utf-8")
+    parts = [struct.pack("<4sBBI", COLUMNAR_MAGIC, COLUMNAR_VERSION, value_width, len(meta_bytes)), meta_bytes]
+    value_dtype = "<f4" if value_width == 4 else "<f8"
+    for name in COLUMNAR_SERIES:
+        arr = np.asarray(result.get(name) or [], dtype=np.float64).reshape(-1, 2)
+        timestamps = arr[:, 0].astype(np.int64)
+        deltas = np.diff(timestamps)
+        delta_width = 4 if deltas.size == 0 or np.abs(deltas).max() < 2 ** 31 else 8
+        first = int(timestamps[0]) if timestamps.size else 0
+        parts.append(struct.pack("<IBq", timestamps.size, delta_width, first))
+        parts.append(deltas.astype("<i4" if delta_width == 4 else "<i8").tobytes())
+        parts.append(arr[:, 1].astype(value_dtype).tobytes())
+    return b"".join(parts)
+
+def decode_columnar(body: bytes) -> Dict:
+    """Decode encode_columnar output back into the JSON response shape"""
+    magic, version, value_width, meta_len = struct.unpack_from("<4sBBI", body, 0)
+    if magic != COLUMNAR_MAGIC or version != COLUMNAR_VERSION:
+        raise ValueError("Not a columnar historical payload")
+    offset = struct.calcsize("<4sBBI")
+    result = json.loads(body[offset:offset + meta_len].decode("utf-8"))
+    offset += meta_len
+    value_dtype = "<f4" if value_width == 4 else "<f8"
+    for name in result.pop("series"):
+        count, delta_width, first = struct.unpack_from("<IBq", body, offset)
+        offset += struct.calcsize("<IBq")
+        deltas = np.frombuffer(body, dtype="<i4" if delta_width == 4 else "<i8", count=max(count - 1, 0), offset=offset)
+        offset += deltas.nbytes
+        values = np.frombuffer(body, dtype=value_dtype, count=count, offset=offset)
+        offset += values.nbytes
+        timestamps = np.concatenate(([first], first + np.cumsum(deltas))) if count else np.empty(0)
+        result[name] = [[int(ts), float(value)] for ts, value in zip(timestamps, values)]
+    return result
+
+def wants_columnar(request: Request, fmt: Optional[str]) -> bool:
+    """format= wins; otherwise honour an Accept header asking for columnar"""
+    if fmt:
+        return fmt.lower() == "columnar"
+    return COLUMNAR_MEDIA_TYPE in request.headers.get("accept", "")
+
+@api_router.get("/crypto/historical/{coin_id}")
+async def get_historical_data(request: Request, coin_id: str, days: int = 7, points: Optional[int] = None,
+                              fmt: Optional[str] = Query(None, alias="format"), precision: int = 64):
+    """Get historical price data for charts, optionally downsampled and/or columnar-encoded"""
+    # The representation can depend on Accept, so shared caches must key on it
+    if not wants_columnar(request, fmt):
+        return cached_response(request, *await get_historical_view(coin_id, days, points), vary="Accept")
     
-    return {"resets": resets}
+    value_width = 4 if precision == 32 else 8
+    cache_key = f"historical:{coin_id}:{days}:{points or 'all'}:columnar{value_width * 8}"
+    cached = get_cached(cache_key, CACHE_TTLS["historical"])
+    if cached:
+        return cached_response(request, cached, entry_holding(cached, cache_key),
+                               media_type=COLUMNAR_MEDIA_TYPE, vary="Accept")
+    
+    result, source, _ = await get_historical_view(coin_id, days, points)
+    body = await asyncio.to_thread(encode_columnar, result, value_width)
+    if source is not None and not result.get("is_fallback"):
+        # Inherit the series' age so stale data is not re-served as fresh binary
+        set_cached(cache_key, body, stored_at=source.stored_at)
+        return cached_response(request, body, entry_holding(body, cache_key),
+                               media_type=COLUMNAR_MEDIA_TYPE, vary="Accept")
+    return Response(content=body, media_type=COLUMNAR_MEDIA_TYPE)
 
-@api_router.get("/crypto/price/{coin_id}", response_model=CryptoPrice)
-async def get_crypto_price(coin_id: str):
-    """Get current price for a cryptocurrency"""
-    cache_key = f"price:{coin_id}"
-    cached = get_cached(cache_key, 60)  # Cache for 60 seconds
+async def get_historical_view(coin_id: str, days: int, points: Optional[int]) -> MarketView:
+    """Historical data at full resolution or downsampled to points"""
+    if points is None:
+        return await get_historical_series(coin_id, days)
+    points = min(max(points, HISTORICAL_MIN_POINTS), HISTORICAL_MAX_POINTS)
+    
+    cache_key = f"historical:{coin_id}:{days}:{points}"
+    cached = get_cached(cache_key, CACHE_TTLS["historical"])
     if cached:
-        return cached
+        return cached, entry_holding(cached, cache_key), None
     
-    try:
-        data = await fetch_with_retry(
-            f"{COINGECKO_API}/coins/markets",
-            params={
-                "vs_currency": "usd",
-                "ids": coin_id,
-                "order": "market_cap_desc",
-                "sparkline": "false",
-                "price_change_percentage": "24h"
-            }
-        )
-        
-        if not data:
-            # Use fallback for bitcoin
-            if coin_id == "bitcoin":
-                logger.info("Using fallback data for bitcoin")
-                set_cached(cache_key, FALLBACK_BITCOIN)
-                return FALLBACK_BITCOIN
-            raise HTTPException(status_code=404, detail=f"Cryptocurrency {coin_id} not found")
-        
-        coin = data[0]
-        result = CryptoPrice(
-            coin_id=coin["id"],
-            name=coin["name"],
-            symbol=coin["symbol"],
-            current_price=coin.get("current_price", 0) or 0,
-            price_change_24h=coin.get("price_change_24h", 0) or 0,
-            price_change_percentage_24h=coin.get("price_change_percentage_24h", 0) or 0,
-            market_cap=coin.get("market_cap", 0) or 0,
-            total_volume=coin.get("total_volume", 0) or 0,
-            high_24h=coin.get("high_24h", 0) or 0,
-            low_24h=coin.get("low_24h", 0) or 0,
-            circulating_supply=coin.get("circulating_supply", 0) or 0,
-            last_updated=datetime.now(timezone.utc).isoformat()
-        )
-        set_cached(cache_key, result.model_dump())
-        return result
-        
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.error(f"Error fetching price: {e}")
-        # Return fallback for bitcoin
-        if coin_id == "bitcoin":
-            logger.info("Using fallback data for bitcoin due to error")
-            return FALLBACK_BITCOIN
-        raise HTTPException(status_code=500, detail="Failed to fetch price data")
+    result, entry, _ = await get_historical_series(coin_id, days)
+    if len(result.get("prices", [])) <= points:
+        return result, entry, None
+    downsampled = await asyncio.to_thread(downsample_historical, result, points)
+    if entry is None or result.get("is_fallback"):
+        return downsampled, None, None
+    # Same age as the series it came from, so a stale series is not re-served as fresh
+    set_cached(cache_key, downsampled, stored_at=entry.stored_at)
+    return downsampled, entry_holding(downsampled, cache_key), None
 
-@api_router.get("/crypto/historical/{coin_id}")
-async def get_historical_data(coin_id: str, days: int = 7):
-    """Get historical price data for charts"""
+async def get_historical_series(coin_id: str, days: int) -> MarketView:
+    """Full-resolution historical data, from cache or upstream"""
     cache_key = f"historical:{coin_id}:{days}"
-    cached = get_cached(cache_key, 600)  # Cache for 10 minutes
+    cached = get_cached(cache_key, CACHE_TTLS["historical"], refresh=lambda: load_historical_data(coin_id, days, cache_key))
     if cached:
-        return cached
+        return cached, entry_holding(cached, cache_key), None
     
     try:
-        data = await fetch_with_retry(
-            f"{COINGECKO_API}/coins/{coin_id}/market_chart",
-            params={
-                "vs_currency": "usd",
-                "days": days,
-                "interval": "daily" if days > 1 else "hourly"
-            }
-        )
-        
-        if not data:
-            # Generate fallback historical data
-            logger.info(f"Using fallback historical data for {coin_id}")
-            base_price = 104500 if coin_id == "bitcoin" else 3350
-            now = datetime.now(timezone.utc).timestamp() * 1000
-            prices = []
-            for i in range(days + 1):
-                timestamp = now - (days - i) * 86400000
-                variation = random.uniform(-0.02, 0.02)
-                price = base_price * (1 + variation * (i / days))
-                prices.append([timestamp, price])
-            
-            fallback_result = {
-                "coin_id": coin_id,
-                "days": days,
-                "prices": prices,
-                "market_caps": [],
-                "total_volumes": [],
-                "is_fallback": True
-            }
-            set_cached(cache_key, fallback_result)
-            return fallback_result
-        
-        result = {
-            "coin_id": coin_id,
-            "days": days,
-            "prices": data.get("prices", []),
-            "market_caps": data.get("market_caps", []),
-            "total_volumes": data.get("total_volumes", [])
-        }
-        set_cached(cache_key, result)
-        return result
+        result = await single_flight.do(cache_key, lambda: load_historical_data(coin_id, days, cache_key))
+        return result, entry_holding(result, cache_key), None
         
     except Exception as e:
         logger.error(f"Error fetching historical data: {e}")
+        stale = last_good_value(cache_key)
+        if stale:
+            return stale, entry_holding(stale, cache_key), None
         # Generate fallback
-        base_price = 104500 if coin_id == "bitcoin" else 3350
-        now = datetime.now(timezone.utc).timestamp() * 1000
-        prices = []
-        for i in range(days + 1):
-            timestamp = now - (days - i) * 86400000
-            variation = random.uniform(-0.02, 0.02)
-            price = base_price * (1 + variation * (i / days))
-            prices.append([timestamp, price])
-        
-        return {
-            "coin_id": coin_id,
-            "days": days,
-            "prices": prices,
-            "market_caps": [],
-            "total_volumes": [],
+        return generate_fallback_historical(coin_id, days), None, None
+
+async def load_top_coins(limit: int, cache_key: str):
+    """Fetch the top coins table from CoinGecko and cache it"""
+    data = await fetch_with_retry(
+        f"{COINGECKO_API}/coins/markets",
+        params={
+            "vs_currency": "usd",
+            "order": "market_cap_desc",
+            "per_page": limit,
+            "page": 1,
+            "sparkline": "false",
+            "price_change_percentage": "24h,7d"
+        }
+    )
+    
+    if not data:
+        # Use fallback data
+        logger.info("Using fallback data for top coins")
+        fallback_result = {
+            "coins": FALLBACK_TOP_COINS[:limit],
+            "last_updated": datetime.now(timezone.utc).isoformat(),
             "is_fallback": True
         }
+        set_cached(cache_key, fallback_result)
+        return fallback_result
+    
+    result = {
+        "coins": [coin_to_market_row(coin) for coin in data],
+        "last_updated": datetime.now(timezone.utc).isoformat()
+    }
+    set_cached(cache_key, result)
+    return result
 
-@api_router.get("/crypto/top-coins")
-async def get_top_coins(limit: int = 10):
-    """Get top cryptocurrencies by market cap"""
+async def resolve_top_coins(limit: int) -> MarketView:
+    """Top coins by market cap, with the cache entry they were served from"""
+    if 0 < limit <= MARKET_SNAPSHOT_SIZE:
+        try:
+            snapshot = await get_market_snapshot()
+        except Exception as e:
+            logger.error(f"Error fetching top coins: {e}")
+            snapshot = last_good_value(MARKET_SNAPSHOT_KEY)
+        if snapshot:
+            return snapshot.top_coins(limit), entry_holding(snapshot, MARKET_SNAPSHOT_KEY), f"top-{limit}"
+        # Return fallback
+        return {
+            "coins": FALLBACK_TOP_COINS[:limit],
+            "last_updated": datetime.now(timezone.utc).isoformat(),
+            "is_fallback": True
+        }, None, None
+    
+    # Limits beyond the snapshot are fetched and cached on their own
     cache_key = f"top_coins:{limit}"
-    cached = get_cached(cache_key, 120)  # Cache for 2 minutes
+    cached = get_cached(cache_key, CACHE_TTLS["top_coins"], refresh=lambda: load_top_coins(limit, cache_key))
     if cached:
-        return cached
+        return cached, entry_holding(cached, cache_key), None
     
     try:
-        data = await fetch_with_retry(
-            f"{COINGECKO_API}/coins/markets",
-            params={
-                "vs_currency": "usd",
-                "order": "market_cap_desc",
-                "per_page": limit,
-                "page": 1,
-                "sparkline": "false",
-                "price_change_percentage": "24h,7d"
-            }
-        )
-        
-        if not data:
-            # Use fallback data
-            logger.info("Using fallback data for top coins")
-            fallback_result = {
-                "coins": FALLBACK_TOP_COINS[:limit],
-                "last_updated": datetime.now(timezone.utc).isoformat(),
-                "is_fallback": True
-            }
-            set_cached(cache_key, fallback_result)
-            return fallback_result
-        
-        result = {
-            "coins": [
-                {
-                    "id": coin["id"],
-                    "name": coin["name"],
-                    "symbol": coin["symbol"],
-                    "image": coin.get("image", ""),
-                    "current_price": coin.get("current_price", 0) or 0,
-                    "market_cap": coin.get("market_cap", 0) or 0,
-                    "market_cap_rank": coin.get("market_cap_rank", 0),
-                    "price_change_percentage_24h": coin.get("price_change_percentage_24h", 0) or 0,
-                    "price_change_percentage_7d": coin.get("price_change_percentage_7d_in_currency", 0) or 0,
-                    "total_volume": coin.get("total_volume", 0) or 0
-                }
-                for coin in data
-            ],
-            "last_updated": datetime.now(timezone.utc).isoformat()
-        }
-        set_cached(cache_key, result)
-        return result
+        result = await single_flight.do(cache_key, lambda: load_top_coins(limit, cache_key))
+        return result, entry_holding(result, cache_key), None
         
     except Exception as e:
         logger.error(f"Error fetching top coins: {e}")
+        stale = last_good_value(cache_key)
+        if stale:
+            return stale, entry_holding(stale, cache_key), None
         # Return fallback
         fallback_result = {
             "coins": FALLBACK_TOP_COINS[:limit],
             "last_updated": datetime.now(timezone.utc).isoformat(),
             "is_fallback": True
         }
+        return fallback_result, None, None
+
+@api_router.get("/crypto/top-coins")
+async def get_top_coins(request: Request, limit: int = 10):
+    """Get top cryptocurrencies by market cap"""
+    return cached_response(request, *await resolve_top_coins(limit))
+
+async def load_trending_coins(cache_key: str):
+    """Fetch trending coins from CoinGecko and cache them"""
+    data = await fetch_with_retry(f"{COINGECKO_API}/search/trending")
+    
+    if not data:
+        # Use fallback
+        logger.info("Using fallback data for trending coins")
+        fallback_result = {
+            "trending_coins": FALLBACK_TRENDING,
+            "last_updated": datetime.now(timezone.utc).isoformat(),
+            "is_fallback": True
+        }
+        set_cached(cache_key, fallback_result)
         return fallback_result
+    
+    result = {
+        "trending_coins": [
+            {
+                "id": coin["item"]["id"],
+                "name": coin["item"]["name"],
+                "symbol": coin["item"]["symbol"],
+                "market_cap_rank": coin["item"].get("market_cap_rank"),
+                "thumb": coin["item"].get("thumb", ""),
+                "score": coin["item"].get("score", idx)
+            }
+            for idx, coin in enumerate(data.get("coins", [])[:7])
+        ],
+        "last_updated": datetime.now(timezone.utc).isoformat()
+    }
+    set_cached(cache_key, result)
+    return result
 
-@api_router.get("/crypto/trending")
-async def get_trending_coins():
-    """Get trending cryptocurrencies"""
+async def resolve_trending_coins() -> MarketView:
+    """Trending coins, with the cache entry they were served from"""
     cache_key = "trending"
-    cached = get_cached(cache_key, 600)  # Cache for 10 minutes
+    cached = get_cached(cache_key, CACHE_TTLS["trending"], refresh=lambda: load_trending_coins(cache_key))
     if cached:
-        return cached
+        return cached, entry_holding(cached, cache_key), None
     
     try:
-        data = await fetch_with_retry(f"{COINGECKO_API}/search/trending")
-        
-        if not data:
-            # Use fallback
-            logger.info("Using fallback data for trending coins")
-            fallback_result = {
-                "trending_coins": FALLBACK_TRENDING,
-                "last_updated": datetime.now(timezone.utc).isoformat(),
-                "is_fallback": True
-            }
-            set_cached(cache_key, fallback_result)
-            return fallback_result
-        
-        result = {
-            "trending_coins": [
-                {
-                    "id": coin["item"]["id"],
-                    "name": coin["item"]["name"],
-                    "symbol": coin["item"]["symbol"],
-                    "market_cap_rank": coin["item"].get("market_cap_rank"),
-                    "thumb": coin["item"].get("thumb", ""),
-                    "score": coin["item"].get("score", idx)
-                }
-                for idx, coin in enumerate(data.get("coins", [])[:7])
-            ],
-            "last_updated": datetime.now(timezone.utc).isoformat()
-        }
-        set_cached(cache_key, result)
-        return result
+        result = await single_flight.do(cache_key, lambda: load_trending_coins(cache_key))
+        return result, entry_holding(result, cache_key), None
         
     except Exception as e:
         logger.error(f"Error fetching trending coins: {e}")
+        stale = last_good_value(cache_key)
+        if stale:
+            return stale, entry_holding(stale, cache_key), None
         # Return fallback
         fallback_result = {
             "trending_coins": FALLBACK_TRENDING,
             "last_updated": datetime.now(timezone.utc).isoformat(),
             "is_fallback": True
         }
+        return fallback_result, None, None
+
+@api_router.get("/crypto/trending")
+async def get_trending_coins(request: Request):
+    """Get trending cryptocurrencies"""
+    return cached_response(request, *await resolve_trending_coins())
+
+def fallback_global_stats() -> Dict:
+    """Fallback global market data when the API is unavailable"""
+    return {
+        "total_market_cap": 2850000000000,
+        "total_volume": 125000000000,
+        "market_cap_change_24h": -1.85,
+        "active_cryptocurrencies": 15420,
+        "markets": 1120,
+        "btc_dominance": 61.4,
+        "eth_dominance": 10.3,
+        "last_updated": datetime.now(timezone.utc).isoformat(),
+        "is_fallback": True
+    }
+
+async def load_global_stats(cache_key: str):
+    """Fetch global market data from CoinGecko and cache it"""
+    data = await fetch_with_retry(f"{COINGECKO_API}/global")
+    
+    if not data or "data" not in data:
+        # Use fallback
+        logger.info("Using fallback data for global stats")
+        fallback_result = fallback_global_stats()
+        set_cached(cache_key, fallback_result)
         return fallback_result
+    
+    global_data = data["data"]
+    result = {
+        "total_market_cap": global_data.get("total_market_cap", {}).get("usd", 0),
+        "total_volume": global_data.get("total_volume", {}).get("usd", 0),
+        "market_cap_change_24h": global_data.get("market_cap_change_percentage_24h_usd", 0),
+        "active_cryptocurrencies": global_data.get("active_cryptocurrencies", 0),
+        "markets": global_data.get("markets", 0),
+        "btc_dominance": global_data.get("market_cap_percentage", {}).get("btc", 0),
+        "eth_dominance": global_data.get("market_cap_percentage", {}).get("eth", 0),
+        "last_updated": datetime.now(timezone.utc).isoformat()
+    }
+    set_cached(cache_key, result)
+    return result
 
-@api_router.get("/crypto/global")
-async def get_global_stats():
-    """Get global cryptocurrency market data"""
+async def resolve_global_stats() -> MarketView:
+    """Global market data, with the cache entry it was served from"""
     cache_key = "global"
-    cached = get_cached(cache_key, 300)  # Cache for 5 minutes
+    cached = get_cached(cache_key, CACHE_TTLS["global"], refresh=lambda: load_global_stats(cache_key))
     if cached:
-        return cached
+        return cached, entry_holding(cached, cache_key), None
     
     try:
-        data = await fetch_with_retry(f"{COINGECKO_API}/global")
-        
-        if not data or "data" not in data:
-            # Use fallback
-            logger.info("Using fallback data for global stats")
-            fallback_result = {
-                "total_market_cap": 2850000000000,
-                "total_volume": 125000000000,
-                "market_cap_change_24h": -1.85,
-                "active_cryptocurrencies": 15420,
-                "markets": 1120,
-                "btc_dominance": 61.4,
-                "eth_dominance": 10.3,
-                "last_updated": datetime.now(timezone.utc).isoformat(),
-                "is_fallback": True
-            }
-            set_cached(cache_key, fallback_result)
-            return fallback_result
-        
-        global_data = data["data"]
-        result = {
-            "total_market_cap": global_data.get("total_market_cap", {}).get("usd", 0),
-            "total_volume": global_data.get("total_volume", {}).get("usd", 0),
-            "market_cap_change_24h": global_data.get("market_cap_change_percentage_24h_usd", 0),
-            "active_cryptocurrencies": global_data.get("active_cryptocurrencies", 0),
-            "markets": global_data.get("markets", 0),
-            "btc_dominance": global_data.get("market_cap_percentage", {}).get("btc", 0),
-            "eth_dominance": global_data.get("market_cap_percentage", {}).get("eth", 0),
-            "last_updated": datetime.now(timezone.utc).isoformat()
-        }
-        set_cached(cache_key, result)
-        return result
+        result = await single_flight.do(cache_key, lambda: load_global_stats(cache_key))
+        return result, entry_holding(result, cache_key), None
         
     except Exception as e:
         logger.error(f"Error fetching global stats: {e}")
+        stale = last_good_value(cache_key)
+        if stale:
+            return stale, entry_holding(stale, cache_key), None
         # Return fallback
+        return fallback_global_stats(), None, None
+
+@api_router.get("/crypto/global")
+async def get_global_stats(request: Request):
+    """Get global cryptocurrency market data"""
+    return cached_response(request, *await resolve_global_stats())
+
+# ============ DASHBOARD BUNDLE ============
+
+# Everything the landing page needs in one response. Sections come from the
+# same cache entries as the individual routes; the encoded bundle is reused
+# until one of those entries changes (or goes stale), which its version - a
+# digest of the section ETags - detects without re-encoding anything.
+DASHBOARD_SECTIONS = ("price", "historical", "top_coins", "trending", "global")
+
+async def resolve_dashboard(coin_id: str, days: int, points: Optional[int], limit: int) -> MarketView:
+    """Assemble (or reuse) the dashboard bundle, resolving section misses concurrently"""
+    cache_key = f"dashboard:{coin_id}:{days}:{points or 'all'}:{limit}"
+    results = await asyncio.gather(
+        resolve_crypto_price(coin_id),
+        get_historical_view(coin_id, days, points),
+        resolve_top_coins(limit),
+        resolve_trending_coins(),
+        resolve_global_stats(),
+        return_exceptions=True
+    )
+    
+    now = time.time()
+    sections: Dict[str, Any] = {}
+    status: Dict[str, Dict] = {}
+    tokens = []
+    for name, result in zip(DASHBOARD_SECTIONS, results):
+        if isinstance(result, asyncio.CancelledError):
+            raise result
+        if isinstance(result, Exception):
+            detail = result.detail if isinstance(result, HTTPException) else "unavailable"
+            logger.error(f"Dashboard section {name} failed: {result}")
+            sections[name] = None
+            status[name] = {"stale": True, "is_fallback": True, "error": detail}
+            tokens.append(f"{name}:error")
+            continue
+        payload, entry, view = result
+        stale = entry is None or now - entry.stored_at >= CACHE_TTLS.get(entry.namespace, 0)
+        sections[name] = payload
+        status[name] = {
+            "stale": stale,
+            "is_fallback": entry is None or bool(payload.get("is_fallback")),
+            "last_updated": payload.get("last_updated")
+        }
+        tokens.append(f"{name}:{entry.etag}-{view}:{stale}" if entry is not None else f"{name}:fallback")
+    
+    version = content_digest("|".join(tokens).encode())
+    entry = cache.get(cache_key)
+    if entry is not None and entry.value["version"] == version:
+        return entry.value, entry, None
+    
+    bundle = {
+        **sections,
+        "sections": status,
+        "version": version,
+        "last_updated": datetime.now(timezone.utc).isoformat()
+    }
+    set_cached(cache_key, bundle)
+    return bundle, entry_holding(bundle, cache_key), None
+
+@api_router.get("/crypto/dashboard")
+async def get_dashboard(request: Request, coin: str = "bitcoin", days: int = 7,
+                        points: Optional[int] = None, limit: int = 10):
+    """Get price, historical, top coins, trending and global stats in one response"""
+    if not 0 < limit <= MARKET_SNAPSHOT_SIZE:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {MARKET_SNAPSHOT_SIZE}")
+    return cached_response(request, *await resolve_dashboard(coin.lower(), days, points, limit))
+
+# ============ REAL-TIME PRICE STREAM ============
+
+# One upstream WebSocket per worker, fanned out to any number of clients on
+# /api/ws/prices. blockchain.info's inv feed only carries transactions and
+# blocks, so ticks come from a configurable exchange ticker feed instead.
+PRICE_STREAM_ENABLED = os.environ.get('PRICE_STREAM_ENABLED', 'true').lower() == 'true'
+PRICE_FEED_WS_URL = os.environ.get('PRICE_FEED_WS_URL', 'wss://ws-feed.exchange.coinbase.com')
+PRICE_FEED_SUBSCRIBE = os.environ.get(
+    'PRICE_FEED_SUBSCRIBE',
+    '{"type": "subscribe", "product_ids": ["BTC-USD"], "channels": ["ticker"]}'
+)
+PRICE_STREAM_MIN_BACKOFF = float(os.environ.get('PRICE_STREAM_MIN_BACKOFF', '1'))
+PRICE_STREAM_MAX_BACKOFF = float(os.environ.get('PRICE_STREAM_MAX_BACKOFF', '60'))
+
+def parse_price_message(raw: Any) -> Optional[Dict]:
+    """Turn an upstream feed message into a tick, or None if it is not a price.
+
+    Understands Coinbase ticker messages and plain {"price": ..., "ts": ...}
+    messages (used by local fake feeds).
+    """
+    try:
+        msg = json.loads(raw)
+    except (TypeError, ValueError):
+        return None
+    if not isinstance(msg, dict) or msg.get("price") is None:
+        return None
+    if msg.get("type") not in (None, "ticker", "tick"):
+        return None
+    try:
+        price = float(msg["price"])
+        if msg.get("ts") is not None:
+            ts = int(msg["ts"])
+        elif msg.get("time"):
+            ts = int(datetime.fromisoformat(msg["time"].replace("Z", "+00:00")).timestamp() * 1000)
+        else:
+            ts = int(time.time() * 1000)
+    except (TypeError, ValueError, AttributeError):
+        # One malformed frame must not take the whole feed connection down
+        return None
+    return {
+        "type": "tick",
+        "coin_id": "bitcoin",
+        "symbol": msg.get("product_id", "BTC-USD"),
+        "price": price,
+        "ts": ts
+    }
+
+class PriceSubscriber:
+    """One client's outbox: holds only the newest tick, older ones are dropped"""
+
+    def __init__(self):
+        self.slot: asyncio.Queue = asyncio.Queue(maxsize=1)
+        self.dropped = 0
+
+    def offer(self, message: str):
+        if self.slot.full():
+            try:
+                self.slot.get_nowait()
+                self.dropped += 1
+            except asyncio.QueueEmpty:
+                pass
+        self.slot.put_nowait(message)
+
+class PriceStream:
+    """Holds the upstream price feed connection and broadcasts its ticks"""
+
+    def __init__(self, url: str, subscribe_message: Optional[str]):
+        self.url = url
+        self.subscribe_message = subscribe_message
+        self.latest: Optional[Dict] = None
+        self.latest_message: Optional[str] = None
+        self.subscribers: set = set()
+        self.task: Optional[asyncio.Task] = None
+        self.connected = False
+        self.connects = 0
+        self.ticks = 0
+        self.dropped_total = 0
+        self.last_error: Optional[str] = None
+
+    def start(self):
+        if self.task is None:
+            self.task = asyncio.ensure_future(self.run())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+
+    async def run(self):
+        """Keep the upstream connection open, reconnecting with backoff"""
+        delay = PRICE_STREAM_MIN_BACKOFF
+        while True:
+            try:
+                async with ws_connect(self.url, open_timeout=10) as feed:
+                    self.connected = True
+                    self.connects += 1
+                    logger.info(f"Price feed connected: {self.url}")
+                    if self.subscribe_message:
+                        await feed.send(self.subscribe_message)
+                    async for raw in feed:
+                        tick = parse_price_message(raw)
+                        if tick is not None:
+                            delay = PRICE_STREAM_MIN_BACKOFF
+                            self.publish(tick)
+                self.last_error = "connection closed by upstream"
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.last_error = str(e) or type(e).__name__
+            finally:
+                self.connected = False
+            wait = delay * (1 + random.uniform(0, 0.25))
+            logger.warning(f"Price feed disconnected ({self.last_error}), reconnecting in {wait:.1f}s")
+            await asyncio.sleep(wait)
+            delay = min(delay * 2, PRICE_STREAM_MAX_BACKOFF)
+
+    def publish(self, tick: Dict):
+        """Store the tick and hand it to every subscriber (encoded once)"""
+        self.ticks += 1
+        self.latest = tick
+        self.latest_message = json.dumps(tick)
+        for subscriber in self.subscribers:
+            subscriber.offer(self.latest_message)
+
+    def subscribe(self) -> PriceSubscriber:
+        subscriber = PriceSubscriber()
+        if self.latest_message is not None:
+            subscriber.offer(self.latest_message)
+        self.subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: PriceSubscriber):
+        self.subscribers.discard(subscriber)
+        self.dropped_total += subscriber.dropped
+
+    def stats(self) -> Dict:
         return {
-            "total_market_cap": 2850000000000,
-            "total_volume": 125000000000,
-            "market_cap_change_24h": -1.85,
-            "active_cryptocurrencies": 15420,
-            "markets": 1120,
-            "btc_dominance": 61.4,
-            "eth_dominance": 10.3,
-            "last_updated": datetime.now(timezone.utc).isoformat(),
-            "is_fallback": True
+            "enabled": PRICE_STREAM_ENABLED,
+            "url": self.url,
+            "connected": self.connected,
+            "connects": self.connects,
+            "ticks": self.ticks,
+            "latest": self.latest,
+            "subscribers": len(self.subscribers),
+            "dropped_ticks": self.dropped_total + sum(s.dropped for s in self.subscribers),
+            "last_error": self.last_error
+        }
+
+price_stream = PriceStream(PRICE_FEED_WS_URL, PRICE_FEED_SUBSCRIBE or None)
+
+@api_router.websocket("/ws/prices")
+async def ws_prices(websocket: WebSocket):
+    """Stream real-time BTC ticks; slow clients only ever get the newest tick"""
+    await websocket.accept()
+    subscriber = price_stream.subscribe()
+
+    async def send_ticks():
+        while True:
+            await websocket.send_text(await subscriber.slot.get())
+
+    async def wait_for_disconnect():
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+
+    tasks = [asyncio.ensure_future(send_ticks()), asyncio.ensure_future(wait_for_disconnect())]
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        price_stream.unsubscribe(subscriber)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+# ============ MARKET EVENT STREAM ============
+
+# Server-Sent Events for the landing page widgets. Cache writes are routed
+# through one hub that re-encodes a topic only when its content changed, so
+# every subscriber shares the same encoded frame and idle topics cost nothing.
+MARKET_STREAM_TOPICS = ("top-coins", "global", "trending")
+MARKET_STREAM_DEFAULT_TOPICS = "price:bitcoin,top-coins,global,trending"
+MARKET_STREAM_MAX_TOPICS = int(os.environ.get('MARKET_STREAM_MAX_TOPICS', '10'))
+MARKET_STREAM_TOP_COINS = int(os.environ.get('MARKET_STREAM_TOP_COINS', '10'))
+MARKET_STREAM_KEEPALIVE = float(os.environ.get('MARKET_STREAM_KEEPALIVE', '15'))
+# How often the hub re-reads its topics so stale entries get revalidated
+# even when nothing else is requesting them
+MARKET_STREAM_REFRESH_SECONDS = float(os.environ.get('MARKET_STREAM_REFRESH_SECONDS', '30'))
+# A topic that cannot be read is retried with exponential backoff; price
+# topics are dropped after this many failed reads in a row
+MARKET_STREAM_MAX_FAILURES = int(os.environ.get('MARKET_STREAM_MAX_FAILURES', '5'))
+MARKET_STREAM_MAX_BACKOFF = float(os.environ.get('MARKET_STREAM_MAX_BACKOFF', '300'))
+MARKET_STREAM_RETRY_MS = 5000
+
+def parse_market_topics(raw: str, snapshot: Optional[MarketSnapshot] = None) -> List[str]:
+    """Validate a comma-separated topic list, keeping order and dropping duplicates.
+
+    With a snapshot, price topics are limited to the coins it lists, so a
+    stream cannot make the hub poll upstream for arbitrary ids.
+    """
+    topics = list(dict.fromkeys(t.strip().lower() for t in raw.split(",") if t.strip()))
+    if not topics:
+        raise HTTPException(status_code=400, detail="No topics given")
+    if len(topics) > MARKET_STREAM_MAX_TOPICS:
+        raise HTTPException(status_code=400, detail=f"At most {MARKET_STREAM_MAX_TOPICS} topics per stream")
+    unknown = [t for t in topics if t not in MARKET_STREAM_TOPICS and not (t.startswith("price:") and len(t) > 6)]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown topics: {', '.join(unknown)}")
+    if snapshot is not None:
+        untracked = [t for t in topics if t.startswith("price:") and t[6:] not in snapshot]
+        if untracked:
+            raise HTTPException(status_code=400, detail=f"Untracked coins: {', '.join(t[6:] for t in untracked)}")
+    return topics
+
+def market_fingerprint(payload: Dict) -> str:
+    """Digest of a payload ignoring last_updated, which changes on every refresh"""
+    content = {k: v for k, v in payload.items() if k != "last_updated"}
+    encoded = json.dumps(content, sort_keys=True, default=str).encode()
+    return hashlib.blake2b(encoded, digest_size=16).hexdigest()
+
+class MarketSubscriber:
+    """One client's outbox: the newest frame per topic, older ones are dropped"""
+
+    def __init__(self, topics: List[str]):
+        self.topics = topics
+        self.pending: Dict[str, str] = {}
+        self.wake = asyncio.Event()
+        self.dropped = 0
+
+    def offer(self, topic: str, frame: str):
+        if topic in self.pending:
+            self.dropped += 1
+        self.pending[topic] = frame
+        self.wake.set()
+
+    async def next_frames(self, timeout: float) -> List[str]:
+        """Wait for pending frames; an empty list means the timeout passed"""
+        if not self.pending:
+            try:
+                await asyncio.wait_for(self.wake.wait(), timeout)
+            except asyncio.TimeoutError:
+                return []
+        self.wake.clear()
+        frames = list(self.pending.values())
+        self.pending.clear()
+        return frames
+
+class MarketHub:
+    """Broadcasts market topics to SSE subscribers when their content changes"""
+
+    def __init__(self):
+        self.subscribers: Dict[str, set] = {}
+        self.frames: Dict[str, str] = {}
+        self.fingerprints: Dict[str, str] = {}
+        self.task: Optional[asyncio.Task] = None
+        self.seq = 0
+        # Consecutive failed reads per topic, and when each may be read again
+        self.failures: Dict[str, int] = {}
+        self.retry_at: Dict[str, float] = {}
+        self.counters = {"published": 0, "unchanged": 0, "connects": 0, "dropped_frames": 0,
+                         "read_failures": 0, "dropped_topics": 0}
+
+    def active_topics(self) -> List[str]:
+        return [topic for topic, subs in self.subscribers.items() if subs]
+
+    def notify(self, key: str, value: Any):
+        """Cache-write hook: map the key onto any topics someone is listening to"""
+        if not self.subscribers:
+            return
+        if key == MARKET_SNAPSHOT_KEY:
+            if self.subscribers.get("top-coins"):
+                self.update("top-coins", value.top_coins(MARKET_STREAM_TOP_COINS))
+            for topic in self.active_topics():
+                if topic.startswith("price:") and topic[6:] in value:
+                    self.update(topic, value.price(topic[6:]))
+        elif key in ("global", "trending") or key.startswith("price:"):
+            if self.subscribers.get(key):
+                self.update(key, value)
+
+    def update(self, topic: str, payload: Any):
+        """Encode and broadcast a topic value unless its content is unchanged"""
+        if isinstance(payload, BaseModel):
+            payload = payload.model_dump()
+        fingerprint = market_fingerprint(payload)
+        if self.fingerprints.get(topic) == fingerprint:
+            self.counters["unchanged"] += 1
+            return
+        self.seq += 1
+        self.fingerprints[topic] = fingerprint
+        self.frames[topic] = f"id: {self.seq}\nevent: {topic}\ndata: {encode_json(payload).decode()}\n\n"
+        self.counters["published"] += 1
+        for subscriber in self.subscribers.get(topic, ()):
+            subscriber.offer(topic, self.frames[topic])
+
+    async def read_topic(self, topic: str) -> Any:
+        """Current value of a topic, through the same cache paths as the REST endpoints"""
+        if topic == "top-coins":
+            payload, _, _ = await resolve_top_coins(MARKET_STREAM_TOP_COINS)
+        elif topic == "global":
+            payload, _, _ = await resolve_global_stats()
+        elif topic == "trending":
+            payload, _, _ = await resolve_trending_coins()
+        else:
+            payload, _, _ = await resolve_crypto_price(topic[6:])
+        return payload
+
+    async def refresh(self, topics: List[str]) -> Dict[str, str]:
+        """Read the topics so changed values are published and stale ones revalidated.
+
+        A topic that cannot be read is retried with backoff. Price topics are
+        dropped after MARKET_STREAM_MAX_FAILURES failed reads in a row; the
+        fixed topics have fallbacks and are kept. Returns the dropped topics
+        with the error frame sent for each.
+        """
+        results = await asyncio.gather(*(self.read_topic(t) for t in topics), return_exceptions=True)
+        dropped = {}
+        for topic, result in zip(topics, results):
+            if isinstance(result, Exception):
+                frame = self.read_failed(topic, result)
+                if frame is not None:
+                    dropped[topic] = frame
+                continue
+            self.failures.pop(topic, None)
+            self.retry_at.pop(topic, None)
+            if result is not None:
+                self.update(topic, result)
+        return dropped
+
+    def read_failed(self, topic: str, error: Exception) -> Optional[str]:
+        """Back off a topic after a failed read; returns the error frame if it was dropped"""
+        failures = self.failures.get(topic, 0) + 1
+        self.counters["read_failures"] += 1
+        logger.warning(f"Market stream could not read {topic} ({failures} in a row): {error}")
+        if topic.startswith("price:") and failures >= MARKET_STREAM_MAX_FAILURES:
+            return self.drop(topic, getattr(error, "detail", None) or str(error) or type(error).__name__)
+        self.failures[topic] = failures
+        backoff = min(MARKET_STREAM_REFRESH_SECONDS * 2 ** (failures - 1), MARKET_STREAM_MAX_BACKOFF)
+        self.retry_at[topic] = time.monotonic() + backoff
+        return None
+
+    def backing_off(self, topic: str) -> bool:
+        return self.retry_at.get(topic, 0) > time.monotonic()
+
+    def drop(self, topic: str, detail: str) -> str:
+        """Stop serving a topic, sending its subscribers an error event so they can poll instead"""
+        frame = f"event: error\ndata: {encode_json({'topic': topic, 'detail': detail}).decode()}\n\n"
+        for subscriber in self.subscribers.pop(topic, ()):
+            subscriber.offer(f"error:{topic}", frame)
+        self.forget(topic)
+        self.counters["dropped_topics"] += 1
+        return frame
+
+    def forget(self, topic: str):
+        self.frames.pop(topic, None)
+        self.fingerprints.pop(topic, None)
+        self.failures.pop(topic, None)
+        self.retry_at.pop(topic, None)
+
+    async def run(self):
+        # Periodic re-reads are background work even though a request started the loop
+        upstream_priority_floor.set(UPSTREAM_PRIORITY_BACKGROUND)
+        while self.subscribers:
+            await asyncio.sleep(MARKET_STREAM_REFRESH_SECONDS)
+            await self.refresh([t for t in self.active_topics() if not self.backing_off(t)])
+
+    async def subscribe(self, topics: List[str]) -> MarketSubscriber:
+        """Register a subscriber and queue the current value of each of its topics"""
+        dropped = await self.refresh([t for t in topics if t not in self.frames and not self.backing_off(t)])
+        topics = [t for t in topics if t not in dropped]
+        subscriber = MarketSubscriber(topics)
+        for topic, frame in dropped.items():
+            subscriber.offer(f"error:{topic}", frame)
+        for topic in topics:
+            self.subscribers.setdefault(topic, set()).add(subscriber)
+            if topic in self.frames:
+                subscriber.offer(topic, self.frames[topic])
+        self.counters["connects"] += 1
+        if self.task is None or self.task.done():
+            self.task = asyncio.ensure_future(self.run())
+        return subscriber
+
+    def unsubscribe(self, subscriber: MarketSubscriber):
+        for topic in subscriber.topics:
+            subs = self.subscribers.get(topic)
+            if subs is not None:
+                subs.discard(subscriber)
+                if not subs:
+                    # Forget the topic so a later subscriber re-reads it fresh
+                    del self.subscribers[topic]
+                    self.forget(topic)
+        self.counters["dropped_frames"] += subscriber.dropped
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+
+    def stats(self) -> Dict:
+        return {
+            "subscribers": len({s for subs in self.subscribers.values() for s in subs}),
+            "topics": {topic: len(subs) for topic, subs in self.subscribers.items()},
+            "failing_topics": dict(self.failures),
+            **self.counters
+        }
+
+market_hub = MarketHub()
+
+@api_router.get("/stream/market")
+async def stream_market(topics: str = MARKET_STREAM_DEFAULT_TOPICS):
+    """Server-Sent Events stream of market topics, pushed only when they change"""
+    snapshot = None
+    if "price:" in topics.lower():
+        try:
+            snapshot = await get_market_snapshot()
+        except Exception as e:
+            # Unverified price topics are still dropped by the hub if their reads keep failing
+            logger.warning(f"Market stream could not load the snapshot to check topics: {e}")
+    subscriber = await market_hub.subscribe(parse_market_topics(topics, snapshot))
+
+    async def events():
+        try:
+            yield f"retry: {MARKET_STREAM_RETRY_MS}\n\n"
+            while True:
+                frames = await subscriber.next_frames(MARKET_STREAM_KEEPALIVE)
+                if not frames:
+                    yield ": keepalive\n\n"
+                for frame in frames:
+                    yield frame
+        finally:
+            market_hub.unsubscribe(subscriber)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# ============ PREFETCH SCHEDULER ============
+
+PREFETCH_ENABLED = os.environ.get('PREFETCH_ENABLED', 'true').lower() == 'true'
+PREFETCH_CONCURRENCY = int(os.environ.get('PREFETCH_CONCURRENCY', '2'))
+PREFETCH_JITTER = float(os.environ.get('PREFETCH_JITTER', '0.1'))  # +/- fraction of the interval
+PREFETCH_MAX_BACKOFF = float(os.environ.get('PREFETCH_MAX_BACKOFF', '900'))
+# Refresh hot keys this far into their fresh TTL so they never go stale
+PREFETCH_TTL_FRACTION = 0.8
+
+class PrefetchJob:
+    """One cache key refreshed on its own cadence"""
+
+    def __init__(self, key: str, loader: Callable[[], Awaitable[Any]], interval: float):
+        self.key = key
+        self.loader = loader
+        self.interval = interval
+        self.failures = 0
+        self.runs = 0
+        self.last_run: Optional[datetime] = None
+        self.last_error: Optional[str] = None
+        self.next_delay = 0.0
+
+    def schedule_next(self):
+        """Delay before the next run: jittered interval, backed off on failure"""
+        delay = self.interval * (2 ** self.failures) if self.failures else self.interval
+        delay = min(delay, max(PREFETCH_MAX_BACKOFF, self.interval))
+        self.next_delay = delay * (1 + random.uniform(-PREFETCH_JITTER, PREFETCH_JITTER))
+        return self.next_delay
+
+class PrefetchScheduler:
+    """Keeps hot market-data keys warm so request handlers rarely go upstream"""
+
+    def __init__(self, concurrency: int):
+        self.jobs: List[PrefetchJob] = []
+        self.tasks: List[asyncio.Task] = []
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.concurrency = concurrency
+
+    def add(self, key: str, loader: Callable[[], Awaitable[Any]], interval: float):
+        self.jobs.append(PrefetchJob(key, loader, interval))
+
+    def start(self):
+        for idx, job in enumerate(self.jobs):
+            # Stagger the first runs so startup does not burst upstream
+            self.tasks.append(asyncio.ensure_future(self.run(job, initial_delay=idx * 0.5)))
+        logger.info(f"Prefetch scheduler started with {len(self.jobs)} jobs")
+
+    async def stop(self):
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+
+    async def run(self, job: PrefetchJob, initial_delay: float = 0):
+        upstream_priority_floor.set(UPSTREAM_PRIORITY_BACKGROUND)
+        await asyncio.sleep(initial_delay)
+        while True:
+            async with self.semaphore:
+                job.runs += 1
+                job.last_run = datetime.now(timezone.utc)
+                try:
+                    await single_flight.do(job.key, job.loader)
+                    job.failures = 0
+                    job.last_error = None
+                except Exception as e:
+                    job.failures += 1
+                    job.last_error = str(e)
+                    logger.warning(f"Prefetch failed for {job.key} ({job.failures} in a row): {e}")
+            await asyncio.sleep(job.schedule_next())
+
+    def stats(self) -> Dict:
+        return {
+            "enabled": PREFETCH_ENABLED,
+            "running": bool(self.tasks),
+            "concurrency": self.concurrency,
+            "jobs": [
+                {
+                    "key": job.key,
+                    "interval": job.interval,
+                    "runs": job.runs,
+                    "failures": job.failures,
+                    "last_run": job.last_run.isoformat() if job.last_run else None,
+                    "last_error": job.last_error,
+                    "next_delay": round(job.next_delay, 1)
+                }
+                for job in self.jobs
+            ]
         }
 
+def build_prefetch_scheduler() -> PrefetchScheduler:
+    """Register the hot keys the landing page reads"""
+    scheduler = PrefetchScheduler(PREFETCH_CONCURRENCY)
+    # The market snapshot covers bitcoin's price and every top-coins limit
+    scheduler.add(MARKET_SNAPSHOT_KEY, load_market_snapshot,
+                  CACHE_TTLS["snapshot"] * PREFETCH_TTL_FRACTION)
+    scheduler.add("trending", lambda: load_trending_coins("trending"),
+                  CACHE_TTLS["trending"] * PREFETCH_TTL_FRACTION)
+    scheduler.add("global", lambda: load_global_stats("global"),
+                  CACHE_TTLS["global"] * PREFETCH_TTL_FRACTION)
+    return scheduler
+
+prefetch_scheduler: Optional[PrefetchScheduler] = None
+
+# ============ SYSTEM ENDPOINTS ============
+
+@api_router.get("/system/upstream")
+async def get_upstream_stats(admin: Dict = Depends(require_admin)):
+    """Get upstream HTTP client pool statistics (Admin only)"""
+    return upstream.stats()
+
+@api_router.get("/system/upstream/budget")
+async def get_upstream_budget_stats(admin: Dict = Depends(require_admin)):
+    """Get upstream rate-limit budget and queueing metrics (Admin only)"""
+    return upstream_budget.stats()
+
+@api_router.get("/system/circuit-breaker")
+async def get_circuit_breaker_status(admin: Dict = Depends(require_admin)):
+    """Get the CoinGecko circuit breaker state (Admin only)"""
+    return coingecko_breaker.stats()
+
+@api_router.get("/system/history")
+async def get_history_store_stats(admin: Dict = Depends(require_admin)):
+    """Get historical price store statistics (Admin only)"""
+    return historical_store.stats()
+
+@api_router.get("/system/price-stream")
+async def get_price_stream_stats(admin: Dict = Depends(require_admin)):
+    """Get real-time price feed status (Admin only)"""
+    return price_stream.stats()
+
+@api_router.get("/system/market-stream")
+async def get_market_stream_stats(admin: Dict = Depends(require_admin)):
+    """Get SSE market stream hub statistics (Admin only)"""
+    return market_hub.stats()
+
+@api_router.get("/system/password-hasher")
+async def get_password_hasher_stats(admin: Dict = Depends(require_admin)):
+    """Get password hashing pool statistics and the hash cost policy (Admin only)"""
+    return {**password_hasher.stats(), "policy": hash_policy.stats()}
+
+@api_router.get("/system/auth-cache")
+async def get_auth_cache_stats(admin: Dict = Depends(require_admin)):
+    """Get decoded-token and user principal cache statistics (Admin only)"""
+    return {"tokens": token_cache.stats(), "principals": principal_cache.stats()}
+
+@api_router.get("/system/indexes")
+async def get_index_report(admin: Dict = Depends(require_admin)):
+    """Get the result of the startup index bootstrap (Admin only)"""
+    return index_report
+
+@api_router.get("/system/query-plans")
+async def get_query_plans(admin: Dict = Depends(require_admin)):
+    """Explain each route's query and report COLLSCAN vs IXSCAN (Admin only)"""
+    return {"plans": await explain_route_queries()}
+
+@api_router.get("/system/auth-admission")
+async def get_auth_admission_stats(admin: Dict = Depends(require_admin)):
+    """Get password endpoint rate-limit and admission counters (Admin only)"""
+    return auth_admission.stats()
+
+@api_router.get("/system/singleflight")
+async def get_single_flight_stats(admin: Dict = Depends(require_admin)):
+    """Get single-flight coalescing statistics for market-data fetches (Admin only)"""
+    return single_flight.stats()
+
+@api_router.get("/system/prefetch")
+async def get_prefetch_stats(admin: Dict = Depends(require_admin)):
+    """Get background prefetch scheduler status (Admin only)"""
+    if prefetch_scheduler is None:
+        return {"enabled": PREFETCH_ENABLED, "running": False, "jobs": []}
+    return prefetch_scheduler.stats()
+
+@api_router.get("/system/cache")
+async def get_cache_stats(admin: Dict = Depends(require_admin)):
+    """Get market-data cache statistics (Admin only)"""
+    return {
+        **cache.stats(),
+        "fresh_ttls": CACHE_TTLS,
+        "stale_ttls": CACHE_STALE_TTLS,
+        "stale_while_revalidate": swr_stats,
+        "conditional_get": conditional_stats,
+        "compression": {**compression_stats, "brotli_available": BROTLI_AVAILABLE},
+        "background_refreshes": len(background_refreshes),
+        "shared": shared_cache.stats()
+    }
+
 # ============ PAYMENT ENDPOINTS ============
 
 # Crypto purchase packages (amounts in USD)
@@ -1098,6 +3999,7 @@ async def stripe_webhook(request: Request):
                         }
                     }
                 )
+                principal_cache.invalidate(user_id)
                 logger.info(f"Credited {crypto_amount} {crypto_type} to user {user_id}")
         
         return {"status": "received"}
@@ -1130,6 +4032,101 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("startup")
+async def startup_upstream_client():
+    await upstream.start()
+
+@app.on_event("startup")
+async def startup_hash_policy():
+    if PASSWORD_HASH_TARGET_MS > 0:
+        await asyncio.to_thread(hash_policy.calibrate, PASSWORD_HASH_TARGET_MS,
+                                PASSWORD_HASH_MIN_COST, PASSWORD_HASH_MAX_COST)
+
+@app.on_event("startup")
+async def startup_indexes():
+    if INDEX_BOOTSTRAP_ENABLED:
+        try:
+            await ensure_indexes()
+        except PyMongoError as e:
+            logger.warning(f"Could not bootstrap database indexes: {e}")
+
+@app.on_event("startup")
+async def startup_auth_admission():
+    if isinstance(auth_admission.counter, MongoWindowCounter):
+        try:
+            await auth_admission.counter.ensure_indexes()
+        except PyMongoError as e:
+            logger.warning(f"Could not create auth rate limit indexes: {e}")
+
+@app.on_event("startup")
+async def startup_shared_cache():
+    try:
+        await shared_cache.ensure_indexes()
+    except PyMongoError as e:
+        logger.warning(f"Could not create shared cache indexes: {e}")
+
+@app.on_event("startup")
+async def startup_historical_store():
+    if HISTORY_STORE_ENABLED:
+        try:
+            await historical_store.ensure_collection()
+        except PyMongoError as e:
+            logger.warning(f"Could not prepare historical store: {e}")
+
+@app.on_event("startup")
+async def startup_price_stream():
+    if PRICE_STREAM_ENABLED:
+        price_stream.start()
+
+@app.on_event("shutdown")
+async def shutdown_price_stream():
+    await price_stream.stop()
+
+@app.on_event("startup")
+async def startup_prefetch_scheduler():
+    global prefetch_scheduler
+    if PREFETCH_ENABLED:
+        prefetch_scheduler = build_prefetch_scheduler()
+        prefetch_scheduler.start()
+
+@app.on_event("shutdown")
+async def shutdown_prefetch_scheduler():
+    if prefetch_scheduler is not None:
+        await prefetch_scheduler.stop()
+
+@app.on_event("shutdown")
+async def shutdown_market_hub():
+    await market_hub.stop()
+
+@app.on_event("shutdown")
+async def shutdown_password_hasher():
+    password_hasher.shutdown()
+
+@app.on_event("shutdown")
+async def shutdown_upstream_client():
+    await upstream.close()
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
     client.close()
+
+if __name__ == "__main__":
+    # Calibration benchmark for this box: python server.py calibrate-bcrypt [target_ms]
+    if len(sys.argv) > 1 and sys.argv[1] == "calibrate-bcrypt":
+        target = float(sys.argv[2]) if len(sys.argv) > 2 else (PASSWORD_HASH_TARGET_MS or 250)
+        hash_policy.calibrate(target, PASSWORD_HASH_MIN_COST, PASSWORD_HASH_MAX_COST)
+        for row in hash_policy.calibration:
+            print(f"cost {row['cost']:>2}: {row['ms']:>8.1f} ms")
+        print(f"PASSWORD_HASH_COST={hash_policy.cost}  (target {target:.0f} ms)")
+
+    # Query plan report: python server.py index-diagnostics [--create]
+    if len(sys.argv) > 1 and sys.argv[1] == "index-diagnostics":
+        async def index_diagnostics():
+            if "--create" in sys.argv[2:]:
+                await ensure_indexes()
+            for row in await explain_route_queries():
+                detail = ", ".join(row.get("indexes", [])) or row.get("error", "")
+                sort_note = " +SORT" if row.get("in_memory_sort") else ""
+                print(f"{row['access']:<9}{sort_note:<6} {row['collection']:<21} {row['route']}  {detail}")
+            client.close()
+        asyncio.run(index_diagnostics())
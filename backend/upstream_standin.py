@@ -0,0 +1,570 @@
+"""Offline stand-in for the CoinGecko and Stripe APIs that server.py calls.
+
+Serves the CoinGecko routes the backend uses (/coins/markets,
+/coins/{id}/market_chart, /search/trending, /global) from a NumPy random-walk
+market of thousands of coins, a Coinbase-style ticker WebSocket, and a minimal
+Stripe checkout-session + webhook emulator, so the backend can be measured on
+a box with no network access.
+
+    python upstream_standin.py --port 9000 --coins 5000 --latency-ms 80 --rate-429 0.02
+
+and start the backend with
+
+    COINGECKO_API_URL=http://localhost:9000/api/v3
+    STRIPE_API_BASE=http://localhost:9000
+    PRICE_FEED_WS_URL=ws://localhost:9000/ws/feed
+
+Latency, 429s and outages can be changed while it runs with POST /_control;
+GET /_stats reports what was served.
+"""
+from fastapi import FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, RedirectResponse
+from pydantic import BaseModel
+from typing import List, Optional, Dict, Any
+from datetime import datetime, timezone
+import numpy as np
+import argparse
+import asyncio
+import hashlib
+import hmac
+import json
+import logging
+import os
+import random
+import secrets
+import time
+from urllib.parse import parse_qsl
+import httpx
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger("upstream_standin")
+
+STANDIN_COINS = int(os.environ.get('STANDIN_COINS', '5000'))
+STANDIN_SEED = int(os.environ.get('STANDIN_SEED', '42'))
+# Simulated seconds per wall-clock second (3600 = an hour of market per second)
+STANDIN_SPEED = float(os.environ.get('STANDIN_SPEED', '1'))
+STANDIN_PUBLIC_URL = os.environ.get('STANDIN_PUBLIC_URL', 'http://localhost:9000')
+STANDIN_WEBHOOK_URL = os.environ.get('STANDIN_WEBHOOK_URL', 'http://localhost:8001/api/webhook/stripe')
+STANDIN_WEBHOOK_SECRET = os.environ.get('STANDIN_WEBHOOK_SECRET', 'whsec_offline')
+STANDIN_FEED_INTERVAL = float(os.environ.get('STANDIN_FEED_INTERVAL', '1'))
+
+HISTORY_HOURS = 168  # 7 days of hourly closes, enough for the 24h/7d changes
+HOURS_PER_YEAR = 24 * 365
+MAX_PER_PAGE = 250
+TRENDING_SIZE = 7
+
+# The first ranks use the ids the frontend and fallbacks know about
+SEED_COINS = [
+    ("bitcoin", "btc", "Bitcoin", 97000.0, 19.8e6, 0.50),
+    ("ethereum", "eth", "Ethereum", 3400.0, 120.4e6, 0.65),
+    ("tether", "usdt", "Tether", 1.0, 140e9, 0.01),
+    ("binancecoin", "bnb", "BNB", 690.0, 144e6, 0.60),
+    ("solana", "sol", "Solana", 190.0, 480e6, 0.90),
+    ("ripple", "xrp", "XRP", 2.3, 57e9, 0.85),
+    ("usd-coin", "usdc", "USDC", 1.0, 44e9, 0.01),
+    ("cardano", "ada", "Cardano", 0.95, 35e9, 0.90),
+    ("dogecoin", "doge", "Dogecoin", 0.32, 147e9, 1.00),
+    ("tron", "trx", "TRON", 0.25, 86e9, 0.70),
+]
+
+
+class MarketSimulator:
+    """Geometric random walk over n coins, advanced lazily and fully vectorized.
+
+    Log prices move by one normal draw per coin per step; a step may cover
+    any amount of simulated time because the sum of k normal increments is a
+    single normal with sqrt(k) scale. Hourly closes are kept in a ring buffer
+    for the 24h/7d change, high and low fields.
+    """
+
+    def __init__(self, n_coins: int, seed: int, speed: float):
+        n_coins = max(n_coins, len(SEED_COINS))
+        self.n = n_coins
+        self.seed = seed
+        self.speed = speed
+        self.rng = np.random.default_rng(seed)
+
+        extra = n_coins - len(SEED_COINS)
+        self.ids = [c[0] for c in SEED_COINS] + [f"simcoin-{i:05d}" for i in range(extra)]
+        self.symbols = [c[1] for c in SEED_COINS] + [f"s{i:05d}" for i in range(extra)]
+        self.names = [c[2] for c in SEED_COINS] + [f"Simcoin {i}" for i in range(extra)]
+        self.index = {coin_id: i for i, coin_id in enumerate(self.ids)}
+
+        # Market caps of the long tail follow a power law below the seeded coins
+        ranks = np.arange(len(SEED_COINS) + 1, n_coins + 1, dtype=np.float64)
+        tail_caps = 8e9 * (ranks / ranks[0]) ** -1.4 if extra else np.empty(0)
+        tail_prices = np.exp(self.rng.normal(-1.0, 2.5, extra))
+        prices = np.concatenate([[c[3] for c in SEED_COINS], tail_prices])
+        self.supply = np.concatenate([[c[4] for c in SEED_COINS], tail_caps / tail_prices])
+        self.vol = np.concatenate([[c[5] for c in SEED_COINS], self.rng.uniform(0.6, 1.6, extra)])
+        self.volume_ratio = self.rng.uniform(0.01, 0.15, n_coins)
+        self.log_price = np.log(prices)
+
+        # Backfill a week of hourly closes that ends at today's prices
+        steps = self.rng.standard_normal((HISTORY_HOURS, n_coins)) * (self.vol * np.sqrt(1 / HOURS_PER_YEAR))
+        backfill = self.log_price - np.vstack([np.zeros(n_coins), np.cumsum(steps, axis=0)])
+        self.history = backfill[::-1].copy()  # row k = close k hours into the buffer
+        self.hour = HISTORY_HOURS              # hour number of the newest close
+        self.sim_hours = float(self.hour)
+        self.wall = time.time()
+
+    def _slot(self, hour: int) -> int:
+        return hour % (HISTORY_HOURS + 1)
+
+    def _step(self, hours: float):
+        if hours <= 0:
+            return
+        years = hours / HOURS_PER_YEAR
+        z = self.rng.standard_normal(self.n)
+        self.log_price += -0.5 * self.vol ** 2 * years + self.vol * np.sqrt(years) * z
+
+    def advance(self):
+        """Bring the market up to the current wall-clock time"""
+        now = time.time()
+        target = self.sim_hours + (now - self.wall) * self.speed / 3600
+        self.wall = now
+        boundaries = int(target) - self.hour
+        if boundaries > HISTORY_HOURS + 1:
+            # Far behind: the skipped hours would all fall out of the buffer anyway
+            skip = boundaries - HISTORY_HOURS - 1
+            self._step(self.hour + skip - self.sim_hours)
+            self.hour += skip
+            self.sim_hours = float(self.hour)
+        while int(target) > self.hour:
+            self._step(self.hour + 1 - self.sim_hours)
+            self.hour += 1
+            self.sim_hours = float(self.hour)
+            self.history[self._slot(self.hour)] = self.log_price
+        self._step(target - self.sim_hours)
+        self.sim_hours = target
+
+    def close(self, hours_ago: int, idx: np.ndarray) -> np.ndarray:
+        return np.exp(self.history[self._slot(self.hour - hours_ago), idx])
+
+    def prices(self) -> np.ndarray:
+        return np.exp(self.log_price)
+
+    def market_caps(self) -> np.ndarray:
+        return self.prices() * self.supply
+
+    def ranking(self) -> np.ndarray:
+        """Coin indices ordered by market cap, largest first"""
+        return np.argsort(-self.market_caps(), kind="stable")
+
+    def market_rows(self, idx: np.ndarray, ranks: np.ndarray, changes: List[str]) -> List[Dict]:
+        """coins/markets rows for the given coin indices"""
+        price = self.prices()[idx]
+        cap = price * self.supply[idx]
+        p24 = self.close(24, idx)
+        window = self._slot(self.hour - np.arange(24))
+        recent = np.exp(self.history[np.ix_(window, idx)])
+        high = np.maximum(recent.max(axis=0), price)
+        low = np.minimum(recent.min(axis=0), price)
+        extra_changes = {}
+        for period, hours in (("1h", 1), ("24h", 24), ("7d", HISTORY_HOURS)):
+            if period in changes:
+                base = self.close(hours, idx)
+                extra_changes[f"price_change_percentage_{period}_in_currency"] = ((price - base) / base * 100).tolist()
+        now = datetime.now(timezone.utc).isoformat()
+
+        columns = {
+            "current_price": price.tolist(),
+            "market_cap": cap.round().tolist(),
+            "total_volume": (cap * self.volume_ratio[idx]).round().tolist(),
+            "high_24h": high.tolist(),
+            "low_24h": low.tolist(),
+            "price_change_24h": (price - p24).tolist(),
+            "price_change_percentage_24h": ((price - p24) / p24 * 100).tolist(),
+            "circulating_supply": self.supply[idx].tolist(),
+            **extra_changes
+        }
+        rows = []
+        for j, (i, rank) in enumerate(zip(idx.tolist(), ranks.tolist())):
+            row = {
+                "id": self.ids[i],
+                "symbol": self.symbols[i],
+                "name": self.names[i],
+                "image": f"{STANDIN_PUBLIC_URL}/images/{self.ids[i]}.png",
+                "market_cap_rank": rank,
+                "last_updated": now
+            }
+            for name, values in columns.items():
+                row[name] = values[j]
+            rows.append(row)
+        return rows
+
+    def market_chart(self, coin_id: str, days: float, interval: Optional[str]) -> Dict:
+        """A price path of `days` ending at the coin's current price.
+
+        Older points are a synthetic walk seeded by coin, window and hour, so
+        repeated requests within a simulated hour return the same series.
+        """
+        i = self.index[coin_id]
+        if interval == "daily":
+            granularity = 86400
+        elif interval == "hourly" or 1 < days <= 90:
+            granularity = 3600
+        elif days <= 1:
+            granularity = 300
+        else:
+            granularity = 86400
+        count = max(int(days * 86400 // granularity), 1)
+        rng = np.random.default_rng([self.seed, i, count, granularity, self.hour])
+        step_years = granularity / (3600 * HOURS_PER_YEAR)
+        steps = rng.standard_normal(count) * self.vol[i] * np.sqrt(step_years)
+        log_path = self.log_price[i] - np.concatenate([[0.0], np.cumsum(steps)])[::-1]
+        prices = np.exp(log_path)
+        # Closed points sit on interval boundaries (UTC midnight for daily
+        # data, like CoinGecko); only the trailing point is the live price at now
+        now_ms = int(time.time() * 1000)
+        step_ms = granularity * 1000
+        last_close = (now_ms - 1) // step_ms * step_ms
+        closes = last_close - np.arange(count - 1, -1, -1, dtype=np.int64) * step_ms
+        timestamps = np.append(closes, now_ms)
+        caps = prices * self.supply[i]
+        volumes = caps * self.volume_ratio[i] * rng.uniform(0.7, 1.3, count + 1)
+        ts = timestamps.tolist()
+        return {
+            "prices": [list(p) for p in zip(ts, prices.tolist())],
+            "market_caps": [list(p) for p in zip(ts, caps.tolist())],
+            "total_volumes": [list(p) for p in zip(ts, volumes.tolist())]
+        }
+
+
+class Faults:
+    """Injected upstream misbehaviour, adjustable at runtime via /_control"""
+
+    def __init__(self):
+        self.latency_ms = float(os.environ.get('STANDIN_LATENCY_MS', '0'))
+        self.jitter_ms = float(os.environ.get('STANDIN_JITTER_MS', '0'))
+        self.rate_429 = float(os.environ.get('STANDIN_RATE_429', '0'))
+        self.calls_per_minute = float(os.environ.get('STANDIN_CALLS_PER_MINUTE', '0'))  # 0 = unlimited
+        self.error_rate = float(os.environ.get('STANDIN_ERROR_RATE', '0'))
+        self.outage = False
+        self.outage_every = float(os.environ.get('STANDIN_OUTAGE_EVERY', '0'))  # seconds, 0 = never
+        self.outage_for = float(os.environ.get('STANDIN_OUTAGE_FOR', '30'))
+        self.started = time.time()
+        self.window: List[float] = []
+
+    def in_outage(self) -> bool:
+        if self.outage:
+            return True
+        if self.outage_every > 0:
+            return (time.time() - self.started) % self.outage_every >= self.outage_every - self.outage_for
+        return False
+
+    def over_rate_limit(self) -> bool:
+        """Sliding one-minute window like CoinGecko's public tier"""
+        if self.calls_per_minute <= 0:
+            return False
+        now = time.time()
+        self.window = [t for t in self.window if t > now - 60]
+        if len(self.window) >= self.calls_per_minute:
+            return True
+        self.window.append(now)
+        return False
+
+    def settings(self) -> Dict:
+        return {
+            "latency_ms": self.latency_ms,
+            "jitter_ms": self.jitter_ms,
+            "rate_429": self.rate_429,
+            "calls_per_minute": self.calls_per_minute,
+            "error_rate": self.error_rate,
+            "outage": self.outage,
+            "outage_every": self.outage_every,
+            "outage_for": self.outage_for,
+            "in_outage": self.in_outage()
+        }
+
+
+class ControlRequest(BaseModel):
+    latency_ms: Optional[float] = None
+    jitter_ms: Optional[float] = None
+    rate_429: Optional[float] = None
+    calls_per_minute: Optional[float] = None
+    error_rate: Optional[float] = None
+    outage: Optional[bool] = None
+    outage_every: Optional[float] = None
+    outage_for: Optional[float] = None
+    speed: Optional[float] = None
+
+
+app = FastAPI(title="CryptoTrack upstream stand-in")
+market = MarketSimulator(STANDIN_COINS, STANDIN_SEED, STANDIN_SPEED)
+faults = Faults()
+stats: Dict[str, Any] = {"requests": {}, "injected": {"429": 0, "503": 0, "500": 0}, "webhooks": {"sent": 0, "failed": 0}}
+sessions: Dict[str, Dict] = {}
+
+
+@app.middleware("http")
+async def inject_faults(request: Request, call_next):
+    """Latency, rate limiting and outages for the CoinGecko routes"""
+    path = request.url.path
+    if not path.startswith("/api/v3"):
+        return await call_next(request)
+    route = path.split("/")[3] if path.count("/") >= 3 else path
+    stats["requests"][route] = stats["requests"].get(route, 0) + 1
+    delay = faults.latency_ms + random.uniform(-faults.jitter_ms, faults.jitter_ms)
+    if delay > 0:
+        await asyncio.sleep(delay / 1000)
+    if faults.in_outage():
+        stats["injected"]["503"] += 1
+        return JSONResponse(status_code=503, content={"error": "Service Unavailable"})
+    if faults.over_rate_limit() or random.random() < faults.rate_429:
+        stats["injected"]["429"] += 1
+        return JSONResponse(
+            status_code=429,
+            content={"status": {"error_code": 429, "error_message": "You've exceeded the Rate Limit."}},
+            headers={"Retry-After": "60"}
+        )
+    if random.random() < faults.error_rate:
+        stats["injected"]["500"] += 1
+        return JSONResponse(status_code=500, content={"error": "Internal Server Error"})
+    market.advance()
+    return await call_next(request)
+
+
+# ============ COINGECKO ============
+
+@app.get("/api/v3/coins/markets")
+async def coins_markets(vs_currency: str = "usd", ids: Optional[str] = None, order: str = "market_cap_desc",
+                        per_page: int = 100, page: int = 1, sparkline: bool = False,
+                        price_change_percentage: Optional[str] = None):
+    if vs_currency.lower() != "usd":
+        raise HTTPException(status_code=400, detail="Only usd is simulated")
+    per_page = min(max(per_page, 1), MAX_PER_PAGE)
+    ranking = market.ranking()
+    ranks = np.empty(market.n, dtype=np.int64)
+    ranks[ranking] = np.arange(1, market.n + 1)
+    if ids:
+        wanted = [market.index[c] for c in dict.fromkeys(i.strip().lower() for i in ids.split(",")) if c in market.index]
+        idx = np.array(sorted(wanted, key=lambda i: ranks[i]), dtype=np.int64)
+    else:
+        idx = ranking
+    if order == "market_cap_asc":
+        idx = idx[::-1]
+    idx = idx[(page - 1) * per_page:page * per_page]
+    changes = [c.strip() for c in (price_change_percentage or "").split(",") if c.strip()]
+    return market.market_rows(idx, ranks[idx], changes)
+
+
+@app.get("/api/v3/coins/{coin_id}/market_chart")
+async def coins_market_chart(coin_id: str, vs_currency: str = "usd", days: str = "7", interval: Optional[str] = None):
+    if coin_id not in market.index:
+        raise HTTPException(status_code=404, detail="coin not found")
+    span = 3650 if days == "max" else float(days)
+    return market.market_chart(coin_id, span, interval)
+
+
+@app.get("/api/v3/search/trending")
+async def search_trending():
+    top = market.ranking()[:500]
+    price = market.prices()[top]
+    p24 = market.close(24, top)
+    movers = top[np.argsort(-np.abs(price / p24 - 1))[:TRENDING_SIZE]]
+    ranks = {int(i): r + 1 for r, i in enumerate(top.tolist())}
+    btc = market.prices()[market.index["bitcoin"]]
+    return {
+        "coins": [
+            {
+                "item": {
+                    "id": market.ids[i],
+                    "coin_id": i,
+                    "name": market.names[i],
+                    "symbol": market.symbols[i].upper(),
+                    "market_cap_rank": ranks[i],
+                    "thumb": f"{STANDIN_PUBLIC_URL}/images/{market.ids[i]}.png",
+                    "slug": market.ids[i],
+                    "price_btc": float(market.prices()[i] / btc),
+                    "score": score
+                }
+            }
+            for score, i in enumerate(movers.tolist())
+        ],
+        "nfts": [],
+        "categories": []
+    }
+
+
+@app.get("/api/v3/global")
+async def global_data():
+    caps = market.market_caps()
+    total_cap = float(caps.sum())
+    all_idx = np.arange(market.n)
+    cap_24h = float((market.close(24, all_idx) * market.supply).sum())
+    top = market.ranking()[:10]
+    return {
+        "data": {
+            "active_cryptocurrencies": market.n,
+            "markets": 1120,
+            "total_market_cap": {"usd": total_cap},
+            "total_volume": {"usd": float((caps * market.volume_ratio).sum())},
+            "market_cap_percentage": {market.symbols[i]: float(caps[i] / total_cap * 100) for i in top.tolist()},
+            "market_cap_change_percentage_24h_usd": (total_cap - cap_24h) / cap_24h * 100,
+            "updated_at": int(time.time())
+        }
+    }
+
+
+@app.websocket("/ws/feed")
+async def ticker_feed(websocket: WebSocket):
+    """Coinbase-style BTC-USD ticker messages from the simulated market"""
+    await websocket.accept()
+    btc = market.index["bitcoin"]
+    try:
+        while True:
+            market.advance()
+            await websocket.send_text(json.dumps({
+                "type": "ticker",
+                "product_id": "BTC-USD",
+                "price": f"{market.prices()[btc]:.2f}",
+                "time": datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
+            }))
+            await asyncio.sleep(STANDIN_FEED_INTERVAL)
+    except WebSocketDisconnect:
+        pass
+
+
+# ============ STRIPE ============
+
+def stripe_error(status_code: int, message: str) -> JSONResponse:
+    return JSONResponse(status_code=status_code, content={"error": {"type": "invalid_request_error", "message": message}})
+
+
+def sign_webhook(payload: str, secret: str) -> str:
+    """Stripe-Signature header value for a payload"""
+    timestamp = int(time.time())
+    digest = hmac.new(secret.encode(), f"{timestamp}.{payload}".encode(), hashlib.sha256).hexdigest()
+    return f"t={timestamp},v1={digest}"
+
+
+async def send_webhook(session: Dict, event_type: str):
+    """Deliver a checkout.session event to the backend's webhook endpoint"""
+    payload = json.dumps({
+        "id": f"evt_{secrets.token_hex(12)}",
+        "object": "event",
+        "type": event_type,
+        "created": int(time.time()),
+        "data": {"object": session}
+    })
+    try:
+        async with httpx.AsyncClient(timeout=10) as http:
+            response = await http.post(
+                STANDIN_WEBHOOK_URL,
+                content=payload,
+                headers={"Content-Type": "application/json", "Stripe-Signature": sign_webhook(payload, STANDIN_WEBHOOK_SECRET)}
+            )
+        response.raise_for_status()
+        stats["webhooks"]["sent"] += 1
+    except httpx.HTTPError as e:
+        stats["webhooks"]["failed"] += 1
+        logger.warning(f"Webhook delivery for {session['id']} failed: {e}")
+
+
+@app.post("/v1/checkout/sessions")
+async def create_checkout_session(request: Request):
+    """Accepts the form-encoded body the Stripe client library sends"""
+    form = dict(parse_qsl((await request.body()).decode()))
+    amount_total = 0
+    currency = form.get("currency", "usd")
+    item = 0
+    while f"line_items[{item}][quantity]" in form or f"line_items[{item}][price_data][unit_amount]" in form:
+        prefix = f"line_items[{item}]"
+        quantity = int(form.get(f"{prefix}[quantity]", 1))
+        amount_total += int(form.get(f"{prefix}[price_data][unit_amount]", 0)) * quantity
+        currency = form.get(f"{prefix}[price_data][currency]", currency)
+        item += 1
+    metadata = {key[9:-1]: value for key, value in form.items() if key.startswith("metadata[")}
+    session_id = f"cs_test_{secrets.token_hex(16)}"
+    session = {
+        "id": session_id,
+        "object": "checkout.session",
+        "mode": form.get("mode", "payment"),
+        "url": f"{STANDIN_PUBLIC_URL}/checkout/{session_id}",
+        "status": "open",
+        "payment_status": "unpaid",
+        "amount_total": amount_total,
+        "currency": currency,
+        "metadata": metadata,
+        "success_url": form.get("success_url"),
+        "cancel_url": form.get("cancel_url"),
+        "created": int(time.time())
+    }
+    sessions[session_id] = session
+    return session
+
+
+@app.get("/v1/checkout/sessions/{session_id}")
+async def retrieve_checkout_session(session_id: str):
+    session = sessions.get(session_id)
+    if session is None:
+        return stripe_error(404, f"No such checkout.session: '{session_id}'")
+    return session
+
+
+@app.get("/checkout/{session_id}")
+async def hosted_checkout(session_id: str, outcome: str = "pay"):
+    """Stands in for the hosted payment page: following the session URL pays
+    (or with outcome=cancel, expires) the session and redirects back"""
+    session = sessions.get(session_id)
+    if session is None:
+        return stripe_error(404, f"No such checkout.session: '{session_id}'")
+    if session["status"] == "open":
+        if outcome == "cancel":
+            session.update(status="expired")
+            await send_webhook(session, "checkout.session.expired")
+        else:
+            session.update(status="complete", payment_status="paid")
+            await send_webhook(session, "checkout.session.completed")
+    target = session["success_url"] if session["payment_status"] == "paid" else session["cancel_url"]
+    return RedirectResponse((target or "/").replace("{CHECKOUT_SESSION_ID}", session_id), status_code=303)
+
+
+# ============ CONTROL ============
+
+@app.get("/_stats")
+async def get_stats():
+    return {
+        **stats,
+        "faults": faults.settings(),
+        "market": {"coins": market.n, "speed": market.speed, "sim_hours": round(market.sim_hours, 3)},
+        "checkout_sessions": len(sessions)
+    }
+
+
+@app.post("/_control")
+async def control(req: ControlRequest):
+    """Change fault injection (and market speed) without restarting"""
+    changes = req.model_dump(exclude_none=True)
+    if "speed" in changes:
+        market.advance()
+        market.speed = changes.pop("speed")
+    for name, value in changes.items():
+        setattr(faults, name, value)
+    return await get_stats()
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--coins", type=int, default=STANDIN_COINS)
+    parser.add_argument("--seed", type=int, default=STANDIN_SEED)
+    parser.add_argument("--speed", type=float, default=STANDIN_SPEED)
+    parser.add_argument("--latency-ms", type=float, default=faults.latency_ms)
+    parser.add_argument("--jitter-ms", type=float, default=faults.jitter_ms)
+    parser.add_argument("--rate-429", type=float, default=faults.rate_429)
+    parser.add_argument("--calls-per-minute", type=float, default=faults.calls_per_minute)
+    parser.add_argument("--error-rate", type=float, default=faults.error_rate)
+    parser.add_argument("--outage-every", type=float, default=faults.outage_every)
+    parser.add_argument("--outage-for", type=float, default=faults.outage_for)
+    args = parser.parse_args()
+
+    if (args.coins, args.seed, args.speed) != (STANDIN_COINS, STANDIN_SEED, STANDIN_SPEED):
+        market = MarketSimulator(args.coins, args.seed, args.speed)
+    for name in ("latency_ms", "jitter_ms", "rate_429", "calls_per_minute", "error_rate", "outage_every", "outage_for"):
+        setattr(faults, name, getattr(args, name))
+    uvicorn.run(app, host=args.host, port=args.port)
@@ -469,7 +469,8 @@ class CryptoAPITester:
         return self.tests_passed == self.tests_run
 
 def main():
-    tester = CryptoAPITester()
+    # Optional base URL, e.g. a local backend running against upstream_standin.py
+    tester = CryptoAPITester(sys.argv[1]) if len(sys.argv) > 1 else CryptoAPITester()
     success = tester.run_all_tests()
     
     # Save detailed results
@@ -12,15 +12,25 @@ export const BitcoinHero = () => {
 
   const fetchData = async () => {
     try {
-      const [priceRes, historicalRes] = await Promise.all([
-        cryptoApi.getPrice('bitcoin'),
-        cryptoApi.getHistoricalData('bitcoin', timeframe)
-      ]);
+      let price, historical;
+      if (timeframe === cryptoApi.dashboardDays) {
+        [price, historical] = await Promise.all([
+          cryptoApi.getDashboardSection('price'),
+          cryptoApi.getDashboardSection('historical')
+        ]);
+      } else {
+        const [priceRes, historicalRes] = await Promise.all([
+          cryptoApi.getPrice('bitcoin'),
+          cryptoApi.getHistoricalData('bitcoin', timeframe)
+        ]);
+        price = priceRes.data;
+        historical = historicalRes.data;
+      }
       
-      setBitcoinData(priceRes.data);
+      setBitcoinData(price);
       
       // Format chart data
-      const formattedChart = historicalRes.data.prices.map(([timestamp, price]) => ({
+      const formattedChart = historical.prices.map(([timestamp, price]) => ({
         date: new Date(timestamp).toLocaleDateString('en-US', { month: 'short', day: 'numeric' }),
         price: price,
         timestamp
@@ -36,11 +46,13 @@ export const BitcoinHero = () => {
 
   useEffect(() => {
     fetchData();
-    // Refresh every 60 seconds
-    const interval = setInterval(fetchData, 60000);
+    // The price is pushed; the chart only changes as often as the historical cache
+    const interval = setInterval(fetchData, 600000);
     return () => clearInterval(interval);
   }, [timeframe]);
 
+  useEffect(() => cryptoApi.subscribeMarket('price:bitcoin', (data) => setBitcoinData(data)), []);
+
   const handleRefresh = () => {
     setRefreshing(true);
     fetchData();
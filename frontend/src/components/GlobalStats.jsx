@@ -9,8 +9,7 @@ export const GlobalStats = () => {
   useEffect(() => {
     const fetchStats = async () => {
       try {
-        const response = await cryptoApi.getGlobalStats();
-        setStats(response.data);
+        setStats(await cryptoApi.getDashboardSection('global'));
       } catch (error) {
         console.error('Error fetching global stats:', error);
       } finally {
@@ -19,8 +18,8 @@ export const GlobalStats = () => {
     };
 
     fetchStats();
-    const interval = setInterval(fetchStats, 120000);
-    return () => clearInterval(interval);
+    // Updates are pushed when the server sees the stats change
+    return cryptoApi.subscribeMarket('global', (data) => setStats(data));
   }, []);
 
   const formatLargeNumber = (num) => {
@@ -10,8 +10,8 @@ export const TopCoins = () => {
   useEffect(() => {
     const fetchCoins = async () => {
       try {
-        const response = await cryptoApi.getTopCoins(10);
-        setCoins(response.data.coins);
+        const topCoins = await cryptoApi.getDashboardSection('top_coins');
+        setCoins(topCoins.coins);
       } catch (error) {
         console.error('Error fetching top coins:', error);
       } finally {
@@ -20,8 +20,8 @@ export const TopCoins = () => {
     };
 
     fetchCoins();
-    const interval = setInterval(fetchCoins, 60000);
-    return () => clearInterval(interval);
+    // Updates are pushed when the server sees the table change
+    return cryptoApi.subscribeMarket('top-coins', (data) => setCoins(data.coins));
   }, []);
 
   const formatPrice = (price) => {
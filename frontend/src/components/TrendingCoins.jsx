@@ -9,8 +9,8 @@ export const TrendingCoins = () => {
   useEffect(() => {
     const fetchTrending = async () => {
       try {
-        const response = await cryptoApi.getTrendingCoins();
-        setTrending(response.data.trending_coins);
+        const trending = await cryptoApi.getDashboardSection('trending');
+        setTrending(trending.trending_coins);
       } catch (error) {
         console.error('Error fetching trending coins:', error);
       } finally {
@@ -19,8 +19,8 @@ export const TrendingCoins = () => {
     };
 
     fetchTrending();
-    const interval = setInterval(fetchTrending, 300000);
-    return () => clearInterval(interval);
+    // Updates are pushed when the server sees the list change
+    return cryptoApi.subscribeMarket('trending', (data) => setTrending(data.trending_coins));
   }, []);
 
   if (loading) {
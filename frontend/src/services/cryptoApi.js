@@ -18,6 +18,86 @@ api.interceptors.response.use(
   }
 );
 
+// One shared Server-Sent Events connection for the landing page widgets
+const MARKET_TOPICS = ['price:bitcoin', 'top-coins', 'global', 'trending'];
+// Used instead of the stream for a topic the server has stopped pushing
+const MARKET_POLL_MS = 60000;
+let marketStream = null;
+let marketListeners = 0;
+
+const marketTopicRoute = (topic) => {
+  if (topic.startsWith('price:')) return api.get(`/crypto/price/${topic.slice(6)}`);
+  if (topic === 'top-coins') return api.get('/crypto/top-coins?limit=10');
+  return api.get(`/crypto/${topic}`);
+};
+
+const subscribeMarket = (topic, onData) => {
+  if (typeof EventSource === 'undefined') return () => {};
+  if (!marketStream) {
+    marketStream = new EventSource(
+      `${API_BASE_URL}/api/stream/market?topics=${MARKET_TOPICS.join(',')}`
+    );
+  }
+  const stream = marketStream;
+  const handler = (event) => onData(JSON.parse(event.data));
+  let poll = null;
+  // Connection errors carry no data; a server error event names the dropped topic
+  const onError = (event) => {
+    if (!event.data || poll || JSON.parse(event.data).topic !== topic) return;
+    const load = () => marketTopicRoute(topic).then(({ data }) => onData(data)).catch(() => {});
+    load();
+    poll = setInterval(load, MARKET_POLL_MS);
+  };
+  stream.addEventListener(topic, handler);
+  stream.addEventListener('error', onError);
+  marketListeners += 1;
+  return () => {
+    stream.removeEventListener(topic, handler);
+    stream.removeEventListener('error', onError);
+    if (poll) clearInterval(poll);
+    marketListeners -= 1;
+    if (marketListeners === 0 && marketStream === stream) {
+      stream.close();
+      marketStream = null;
+    }
+  };
+};
+
+// First paint: every widget reads the same bundled request instead of one each
+const DASHBOARD_DAYS = 7;
+const DASHBOARD_REUSE_MS = 5000;
+let dashboardRequest = null;
+
+const getDashboard = () => {
+  if (!dashboardRequest) {
+    dashboardRequest = api.get('/crypto/dashboard');
+    dashboardRequest
+      .catch(() => {})
+      .finally(() => setTimeout(() => { dashboardRequest = null; }, DASHBOARD_REUSE_MS));
+  }
+  return dashboardRequest;
+};
+
+// A failed section comes back as null; its own route still has fallback data
+const DASHBOARD_SECTION_ROUTES = {
+  price: () => api.get('/crypto/price/bitcoin'),
+  historical: () => api.get(`/crypto/historical/bitcoin?days=${DASHBOARD_DAYS}`),
+  top_coins: () => api.get('/crypto/top-coins?limit=10'),
+  trending: () => api.get('/crypto/trending'),
+  global: () => api.get('/crypto/global'),
+};
+
+const getDashboardSection = async (section) => {
+  try {
+    const { data } = await getDashboard();
+    if (data[section]) return data[section];
+  } catch (error) {
+    console.warn('Dashboard unavailable, using individual route:', error);
+  }
+  const { data } = await DASHBOARD_SECTION_ROUTES[section]();
+  return data;
+};
+
 export const cryptoApi = {
   // Get single coin price
   getPrice: (coinId) => api.get(`/crypto/price/${coinId}`),
@@ -35,6 +115,14 @@ export const cryptoApi = {
   
   // Get global market stats
   getGlobalStats: () => api.get('/crypto/global'),
+
+  // Price, historical, top coins, trending and global stats in one response
+  getDashboard,
+  getDashboardSection,
+  dashboardDays: DASHBOARD_DAYS,
+
+  // Push updates for a market topic; returns an unsubscribe function
+  subscribeMarket,
 };
 
 export default cryptoApi;
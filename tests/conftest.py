@@ -0,0 +1,48 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+from starlette.requests import Request
+
+# The backend is a single module, not an installed package
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+# server.py reads these at import; the unit tests never reach MongoDB
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "satoshi_test")
+
+import server  # noqa: E402 - needs the path and settings above
+
+
+@pytest.fixture
+def make_request():
+    """Build a bare GET request with the given headers (underscores become dashes)"""
+    def build(**headers):
+        return Request({
+            "type": "http",
+            "method": "GET",
+            "path": "/api/crypto/global",
+            "headers": [(name.replace("_", "-").encode(), value.encode()) for name, value in headers.items()],
+        })
+    return build
+
+
+@pytest.fixture
+def global_entry():
+    """A cached /crypto/global payload large enough to be compressed"""
+    entry = server.cache.set("global", {"total_market_cap": 1, "coins": ["x" * 40] * 100})
+    yield entry
+    server.cache.delete("global")
+
+
+@pytest.fixture
+def mock_db(monkeypatch):
+    """Point the server at an in-memory MongoDB with fresh auth caches and cheap hashes"""
+    from mongomock_motor import AsyncMongoMockClient
+
+    database = AsyncMongoMockClient()["satoshi_test"]
+    monkeypatch.setattr(server, "db", database)
+    monkeypatch.setattr(server, "principal_cache", server.PrincipalCache(server.AUTH_PRINCIPAL_TTL, 100))
+    monkeypatch.setattr(server.hash_policy, "cost", 4)
+    return database
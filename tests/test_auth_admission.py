@@ -0,0 +1,67 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi import HTTPException
+
+import server
+from server import AuthAdmission, MemoryWindowCounter
+
+
+def admission(ip_limit=100, email_limit=100, max_hashes=10):
+    return AuthAdmission(MemoryWindowCounter(60, 1000), 60, ip_limit, email_limit, max_hashes)
+
+
+def logins(*emails):
+    async def send():
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return [await client.post("/api/auth/login", json={"email": email, "password": "wrong-password"})
+                    for email in emails]
+    return asyncio.run(send())
+
+
+def test_per_ip_limit_returns_429(mock_db, monkeypatch):
+    gate = admission(ip_limit=2)
+    monkeypatch.setattr(server, "auth_admission", gate)
+    responses = logins("a@example.com", "b@example.com", "c@example.com")
+    assert [r.status_code for r in responses] == [401, 401, 429]
+    assert int(responses[2].headers["retry-after"]) > 0
+    assert gate.counters["rejected_ip"] == 1 and gate.counters["admitted"] == 2
+    assert gate.hashing == 0
+
+
+def test_per_email_limit_ignores_case(mock_db, monkeypatch):
+    gate = admission(email_limit=1)
+    monkeypatch.setattr(server, "auth_admission", gate)
+    responses = logins("a@example.com", "A@Example.com", "b@example.com")
+    assert [r.status_code for r in responses] == [401, 429, 401]
+    assert gate.counters["rejected_email"] == 1
+
+
+def test_hash_slots_are_reserved_before_admission(make_request):
+    gate = admission(max_hashes=1)
+
+    async def scenario():
+        async with gate.admit(make_request(), "a@example.com"):
+            with pytest.raises(HTTPException) as rejected:
+                async with gate.admit(make_request(), "b@example.com"):
+                    pass
+            return rejected.value
+
+    rejected = asyncio.run(scenario())
+    assert rejected.status_code == 429
+    assert rejected.headers["Retry-After"] == str(server.PASSWORD_HASH_RETRY_AFTER)
+    assert gate.counters["rejected_busy"] == 1
+    assert gate.hashing == 0
+
+
+def test_non_hashing_admission_takes_no_slot(make_request):
+    gate = admission(max_hashes=0)
+
+    async def scenario():
+        async with gate.admit(make_request(), "a@example.com", hashes=False):
+            return gate.hashing
+
+    assert asyncio.run(scenario()) == 0
+    assert gate.counters["admitted"] == 1
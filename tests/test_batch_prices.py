@@ -0,0 +1,59 @@
+import asyncio
+
+import httpx
+import pytest
+
+import server
+
+
+def market_row(coin_id, price):
+    return {"id": coin_id, "name": coin_id.title(), "symbol": coin_id[:3], "current_price": price}
+
+
+def get(path):
+    async def request():
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.get(path)
+    return asyncio.run(request())
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    """Record coins/markets calls and answer them from a fixed table"""
+    table = {"ethereum": 3000.0, "solana": 150.0}
+    calls = []
+
+    async def fake_fetch(url, params=None, **kwargs):
+        ids = params["ids"].split(",")
+        calls.append(ids)
+        return [market_row(coin_id, table[coin_id]) for coin_id in ids if coin_id in table]
+
+    monkeypatch.setattr(server, "fetch_with_retry", fake_fetch)
+    yield calls
+    for coin_id in ("bitcoin", "ethereum", "solana", "nope"):
+        server.cache.delete(f"price:{coin_id}")
+
+
+def test_misses_are_fetched_in_one_upstream_call(upstream):
+    server.cache.set("price:bitcoin", server.coin_to_price(market_row("bitcoin", 64000.0)).model_dump())
+    response = get("/api/crypto/prices?ids=bitcoin,Ethereum,solana,nope,ethereum")
+    assert response.status_code == 200
+    body = response.json()
+    assert [price["coin_id"] for price in body["prices"]] == ["bitcoin", "ethereum", "solana"]
+    assert body["not_found"] == ["nope"]
+    assert upstream == [["ethereum", "solana", "nope"]]
+
+
+def test_fetched_prices_are_cached_individually(upstream):
+    get("/api/crypto/prices?ids=ethereum,solana")
+    assert server.get_cached("price:solana", 60)["current_price"] == 150.0
+    assert get("/api/crypto/price/ethereum").json()["current_price"] == 3000.0
+    assert len(upstream) == 1
+
+
+def test_bad_id_lists_are_rejected(upstream):
+    assert get("/api/crypto/prices?ids=,,").status_code == 400
+    too_many = ",".join(f"coin-{i}" for i in range(server.MAX_BATCH_PRICE_IDS + 1))
+    assert get(f"/api/crypto/prices?ids={too_many}").status_code == 400
+    assert upstream == []
@@ -0,0 +1,79 @@
+import pytest
+
+from server import CircuitBreaker, CircuitOpenError
+
+
+def make_breaker(**overrides):
+    config = dict(window=4, min_calls=4, failure_rate=0.5, slow_call_seconds=1.0,
+                  open_seconds=30.0, half_open_calls=1)
+    config.update(overrides)
+    return CircuitBreaker("test", **config)
+
+
+def call(breaker, ok=True, duration=0.01):
+    breaker.before_call()
+    breaker.record(ok, duration, None if ok else "boom")
+
+
+def test_breaker_stays_closed_below_min_calls():
+    breaker = make_breaker()
+    for _ in range(3):
+        call(breaker, ok=False)
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_breaker_opens_on_failure_rate_and_rejects():
+    breaker = make_breaker()
+    call(breaker)
+    call(breaker)
+    call(breaker, ok=False)
+    call(breaker, ok=False)
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    assert breaker.rejected == 1
+
+
+def test_slow_calls_count_as_failures():
+    breaker = make_breaker()
+    for _ in range(4):
+        call(breaker, duration=2.0)
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_breaker_half_opens_after_timeout_and_closes_on_success():
+    breaker = make_breaker()
+    for _ in range(4):
+        call(breaker, ok=False)
+    breaker.opened_at -= breaker.open_seconds
+
+    breaker.before_call()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    # Only half_open_calls trials may be in flight
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    breaker.record(True, 0.01)
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert len(breaker.window) == 0
+
+
+def test_failed_trial_reopens():
+    breaker = make_breaker()
+    for _ in range(4):
+        call(breaker, ok=False)
+    breaker.opened_at -= breaker.open_seconds
+    call(breaker, ok=False)
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.times_opened == 2
+
+
+def test_abandoned_trial_frees_its_slot():
+    breaker = make_breaker()
+    for _ in range(4):
+        call(breaker, ok=False)
+    breaker.opened_at -= breaker.open_seconds
+    breaker.before_call()
+    breaker.abandon()
+    breaker.before_call()
+    assert breaker.trials_in_flight == 1
@@ -0,0 +1,85 @@
+import asyncio
+import time
+
+import numpy as np
+import pytest
+
+import server
+from server import COLUMNAR_MAGIC, decode_columnar, encode_columnar
+
+DAY_MS = 86_400_000
+
+
+def make_result(count=5, start=1_700_000_000_000, step=DAY_MS):
+    timestamps = [start + i * step for i in range(count)]
+    return {
+        "coin_id": "bitcoin",
+        "days": count,
+        "prices": [[ts, 60_000.5 + i] for i, ts in enumerate(timestamps)],
+        "market_caps": [[ts, 1.2e12 + i] for i, ts in enumerate(timestamps)],
+        "total_volumes": [[ts, 3.4e10 + i] for i, ts in enumerate(timestamps)],
+    }
+
+
+def test_float64_round_trip_is_exact():
+    result = make_result()
+    assert decode_columnar(encode_columnar(result, value_width=8)) == result
+
+
+def test_float32_round_trip_keeps_timestamps_and_rounds_values():
+    result = make_result()
+    decoded = decode_columnar(encode_columnar(result, value_width=4))
+    for name in ("prices", "market_caps", "total_volumes"):
+        assert [ts for ts, _ in decoded[name]] == [ts for ts, _ in result[name]]
+        expected = np.asarray([value for _, value in result[name]], dtype=np.float32)
+        assert [value for _, value in decoded[name]] == expected.astype(np.float64).tolist()
+
+
+@pytest.mark.parametrize("value_width", [4, 8])
+def test_empty_series_round_trip(value_width):
+    result = {"coin_id": "bitcoin", "days": 1, "prices": [], "market_caps": [], "total_volumes": []}
+    assert decode_columnar(encode_columnar(result, value_width)) == result
+
+
+def test_single_point_series():
+    result = make_result(count=1)
+    assert decode_columnar(encode_columnar(result)) == result
+
+
+def test_wide_deltas_use_64_bit_encoding():
+    # A gap over 2**31 ms (~25 days) does not fit the 32-bit delta column
+    result = make_result(count=3, step=2 ** 31 + 1)
+    body = encode_columnar(result)
+    assert decode_columnar(body) == result
+    assert len(body) > len(encode_columnar(make_result(count=3)))
+
+
+def test_missing_series_decode_as_empty_and_meta_is_kept():
+    result = {"coin_id": "bitcoin", "days": 7, "points": 50, "is_fallback": True,
+              "prices": [[1_700_000_000_000, 1.0]]}
+    decoded = decode_columnar(encode_columnar(result))
+    assert decoded["points"] == 50 and decoded["is_fallback"] is True
+    assert decoded["market_caps"] == [] and decoded["total_volumes"] == []
+
+
+def test_rejects_foreign_payload():
+    body = encode_columnar(make_result())
+    with pytest.raises(ValueError):
+        decode_columnar(b"XXXX" + body[len(COLUMNAR_MAGIC):])
+
+
+def test_columnar_response_inherits_series_age(monkeypatch, make_request):
+    monkeypatch.setattr(server, "schedule_refresh", lambda key, loader: None)
+    age = server.CACHE_TTLS["historical"] + 60
+    source = server.cache.set("historical:bitcoin:30", make_result(count=30), stored_at=time.time() - age)
+    try:
+        response = asyncio.run(server.get_historical_data(
+            make_request(), "bitcoin", days=30, points=None, fmt="columnar", precision=64))
+        assert response.media_type == server.COLUMNAR_MEDIA_TYPE
+        assert decode_columnar(response.body)["prices"] == make_result(count=30)["prices"]
+        cached = server.cache.peek("historical:bitcoin:30:all:columnar64")
+        assert cached.stored_at == source.stored_at
+        assert "max-age=0" in response.headers["cache-control"]
+    finally:
+        server.cache.delete("historical:bitcoin:30")
+        server.cache.delete("historical:bitcoin:30:all:columnar64")
@@ -0,0 +1,35 @@
+import pytest
+
+import server
+from server import cached_response, choose_encoding
+
+
+@pytest.mark.parametrize("header, expected", [
+    (None, None),
+    ("identity", None),
+    ("gzip", "gzip"),
+    ("gzip;q=0", None),
+    ("br;q=0.2, gzip;q=0.8", "gzip"),
+    ("gzip;q=0.5, br", "br" if server.BROTLI_AVAILABLE else "gzip"),
+    ("*;q=0.5, gzip;q=0", "br" if server.BROTLI_AVAILABLE else None),
+    ("GZIP ; q=1", "gzip"),
+    ("gzip;q=oops", None),
+])
+def test_choose_encoding_honours_q_values(header, expected):
+    assert choose_encoding(header) == expected
+
+
+def test_compressed_etag_revalidates_without_compressing(make_request, global_entry):
+    first = cached_response(make_request(accept_encoding="gzip"), global_entry.value, global_entry)
+    assert first.headers["content-encoding"] == "gzip"
+    etag = first.headers["etag"]
+    assert etag.endswith('-gz"')
+
+    global_entry.compressed.clear()
+    builds = dict(server.compression_stats["builds"])
+    response = cached_response(make_request(accept_encoding="gzip", if_none_match=etag),
+                               global_entry.value, global_entry)
+    assert response.status_code == 304
+    assert response.headers["etag"] == etag
+    assert global_entry.compressed == {}
+    assert server.compression_stats["builds"] == builds
@@ -0,0 +1,45 @@
+from email.utils import formatdate
+
+import pytest
+
+import server
+from server import cached_response
+
+
+def test_full_response_carries_validators(make_request, global_entry):
+    response = cached_response(make_request(), global_entry.value, global_entry)
+    assert response.status_code == 200
+    assert response.body == global_entry.body
+    assert response.headers["etag"] == f'"{global_entry.etag}"'
+    assert "max-age=" in response.headers["cache-control"]
+
+
+def test_matching_etag_returns_304_without_body(make_request, global_entry):
+    response = cached_response(make_request(if_none_match=f'W/"{global_entry.etag}"'), global_entry.value, global_entry)
+    assert response.status_code == 304
+    assert response.body == b""
+
+
+def test_stale_etag_returns_full_body(make_request, global_entry):
+    response = cached_response(make_request(if_none_match='"something-else"'), global_entry.value, global_entry)
+    assert response.status_code == 200
+
+
+def test_if_modified_since_returns_304(make_request, global_entry):
+    since = formatdate(global_entry.stored_at + 1, usegmt=True)
+    response = cached_response(make_request(if_modified_since=since), global_entry.value, global_entry)
+    assert response.status_code == 304
+
+
+def test_views_are_not_encoded_for_304(make_request, global_entry):
+    payload = {"coins": global_entry.value["coins"][:5]}
+    first = cached_response(make_request(), payload, global_entry, view="top-5")
+    global_entry.views.clear()
+    response = cached_response(make_request(if_none_match=first.headers["etag"]), payload, global_entry, view="top-5")
+    assert response.status_code == 304
+    assert global_entry.views == {}
+
+
+def test_uncached_payload_passes_through(make_request):
+    payload = {"is_fallback": True}
+    assert cached_response(make_request(), payload, None) is payload
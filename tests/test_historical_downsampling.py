@@ -0,0 +1,60 @@
+import asyncio
+import time
+
+import numpy as np
+import pytest
+
+import server
+
+DAY_MS = 86_400_000
+
+
+def make_series(count=500):
+    timestamps = 1_700_000_000_000 + np.arange(count) * DAY_MS // 24
+    prices = 60_000 + np.cumsum(np.random.default_rng(7).standard_normal(count))
+    rows = [[int(ts), float(price)] for ts, price in zip(timestamps, prices)]
+    return {"coin_id": "bitcoin", "days": 30, "prices": rows, "market_caps": rows, "total_volumes": rows}
+
+
+@pytest.fixture
+def series_cache(monkeypatch):
+    refreshes = []
+    monkeypatch.setattr(server, "schedule_refresh", lambda key, loader: refreshes.append(key))
+    yield refreshes
+    for key in [key for key in server.cache.entries if key.startswith("historical:bitcoin:30")]:
+        server.cache.delete(key)
+
+
+def test_downsampling_keeps_endpoints_and_point_count():
+    result = server.downsample_historical(make_series(), 50)
+    assert len(result["prices"]) == 50
+    assert result["prices"][0] == make_series()["prices"][0]
+    assert result["prices"][-1] == make_series()["prices"][-1]
+
+
+def test_fresh_series_gives_fresh_view(series_cache):
+    source = server.cache.set("historical:bitcoin:30", make_series())
+    payload, entry, _ = asyncio.run(server.get_historical_view("bitcoin", 30, 50))
+    assert len(payload["prices"]) == 50
+    assert entry.stored_at == source.stored_at
+
+
+def test_stale_series_is_not_cached_as_fresh_view(series_cache):
+    age = server.CACHE_TTLS["historical"] + 60
+    source = server.cache.set("historical:bitcoin:30", make_series(), stored_at=time.time() - age)
+
+    payload, entry, _ = asyncio.run(server.get_historical_view("bitcoin", 30, 50))
+
+    assert series_cache == ["historical:bitcoin:30"]
+    assert entry.stored_at == source.stored_at
+    headers = server.cache_headers(entry)
+    assert "max-age=0" in headers["Cache-Control"]
+    # Still stale on the next read, so it is rebuilt once the series refreshes
+    assert server.get_cached("historical:bitcoin:30:50", server.CACHE_TTLS["historical"]) is None
+
+
+def test_short_series_is_served_without_downsampling(series_cache):
+    source = server.cache.set("historical:bitcoin:30", make_series(count=20))
+    payload, entry, _ = asyncio.run(server.get_historical_view("bitcoin", 30, 50))
+    assert entry is source
+    assert len(payload["prices"]) == 20
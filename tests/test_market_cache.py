@@ -0,0 +1,47 @@
+from server import MarketCache
+
+
+def test_lru_evicts_least_recently_used():
+    cache = MarketCache(max_entries=2, max_bytes=10**6, quotas={})
+    cache.set("global", {"a": 1})
+    cache.set("trending", {"b": 2})
+    cache.get("global")
+    cache.set("price:bitcoin", {"c": 3})
+    assert "trending" not in cache
+    assert "global" in cache and "price:bitcoin" in cache
+    assert cache.evictions["lru"] == 1
+
+
+def test_namespace_quota_evicts_within_namespace_only():
+    cache = MarketCache(max_entries=100, max_bytes=10**6, quotas={"price": 2})
+    cache.set("global", {"a": 1})
+    for coin in ("bitcoin", "ethereum", "solana"):
+        cache.set(f"price:{coin}", {"coin": coin})
+    assert "price:bitcoin" not in cache
+    assert "price:ethereum" in cache and "price:solana" in cache
+    assert "global" in cache
+    assert cache.evictions["quota"] == 1
+
+
+def test_byte_budget_evicts_oldest_entries():
+    cache = MarketCache(max_entries=100, max_bytes=500, quotas={})
+    for coin in ("bitcoin", "ethereum", "solana"):
+        cache.set(f"price:{coin}", {"padding": "x" * 100})
+    assert cache.bytes <= 500
+    assert "price:bitcoin" not in cache
+    assert cache.evictions["bytes"] >= 1
+
+
+def test_overwrite_replaces_size_accounting():
+    cache = MarketCache(max_entries=10, max_bytes=10**6, quotas={})
+    cache.set("global", {"padding": "x" * 100})
+    cache.set("global", {"a": 1})
+    assert len(cache) == 1
+    assert cache.bytes == cache.peek("global").size
+
+
+def test_expired_entries_are_not_returned():
+    cache = MarketCache(max_entries=10, max_bytes=10**6, quotas={})
+    cache.set("global", {"a": 1}, stored_at=1.0)
+    assert cache.get("global") is None
+    assert cache.evictions["expired"] == 1
@@ -0,0 +1,69 @@
+import asyncio
+
+import httpx
+import pytest
+
+import server
+from server import MARKET_SNAPSHOT_KEY, MarketSnapshot
+
+
+def market_rows(count):
+    return [{"id": f"coin-{rank}", "name": f"Coin {rank}", "symbol": f"c{rank}",
+             "current_price": float(rank), "market_cap": 1000 - rank, "market_cap_rank": rank}
+            for rank in range(1, count + 1)]
+
+
+@pytest.fixture
+def cached_snapshot():
+    snapshot = MarketSnapshot(market_rows(20))
+    server.cache.set(MARKET_SNAPSHOT_KEY, snapshot)
+    yield snapshot
+    server.cache.delete(MARKET_SNAPSHOT_KEY)
+
+
+def get(path):
+    async def request():
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.get(path)
+    return asyncio.run(request())
+
+
+def test_top_coins_is_a_prefix_slice():
+    snapshot = MarketSnapshot(market_rows(20))
+    top = snapshot.top_coins(5)
+    assert [coin["id"] for coin in top["coins"]] == [f"coin-{rank}" for rank in range(1, 6)]
+    assert top["last_updated"] == snapshot.last_updated
+    assert len(snapshot.top_coins(50)["coins"]) == 20
+
+
+def test_price_is_built_once_per_coin():
+    snapshot = MarketSnapshot(market_rows(3))
+    price = snapshot.price("coin-2")
+    assert price["coin_id"] == "coin-2" and price["current_price"] == 2.0
+    assert price["last_updated"] == snapshot.last_updated
+    assert snapshot.price("coin-2") is price
+    assert snapshot.price("missing") is None
+    assert "coin-3" in snapshot and "missing" not in snapshot
+
+
+def test_etag_follows_rows_and_timestamp():
+    rows = market_rows(3)
+    assert MarketSnapshot(rows, "t1").etag == MarketSnapshot(rows, "t1").etag
+    assert MarketSnapshot(rows, "t1").etag != MarketSnapshot(rows, "t2").etag
+
+
+def test_every_limit_is_served_from_the_cached_snapshot(cached_snapshot):
+    for limit in (1, 10, 20):
+        response = get(f"/api/crypto/top-coins?limit={limit}")
+        assert response.status_code == 200
+        assert [coin["id"] for coin in response.json()["coins"]] == [f"coin-{rank}" for rank in range(1, limit + 1)]
+    # Each slice is a distinct representation of the same snapshot
+    assert get("/api/crypto/top-coins?limit=1").headers["etag"] != get("/api/crypto/top-coins?limit=2").headers["etag"]
+
+
+def test_price_for_coin_inside_snapshot_is_served_from_it(cached_snapshot):
+    response = get("/api/crypto/price/coin-7")
+    assert response.status_code == 200
+    assert response.json()["current_price"] == 7.0
+    assert response.json()["last_updated"] == cached_snapshot.last_updated
@@ -0,0 +1,102 @@
+import asyncio
+import json
+
+import pytest
+from fastapi import HTTPException
+
+import server
+from server import MarketHub
+
+
+@pytest.fixture
+def hub(monkeypatch):
+    """A hub whose price:bad topic always fails to read"""
+    hub = MarketHub()
+    monkeypatch.setattr(server, "MARKET_STREAM_MAX_FAILURES", 3)
+
+    async def read_topic(topic):
+        if topic.endswith("bad"):
+            raise HTTPException(status_code=500, detail="Failed to fetch price data")
+        return {"topic": topic}
+
+    monkeypatch.setattr(hub, "read_topic", read_topic)
+    return hub
+
+
+def frames_of(subscriber):
+    return asyncio.run(subscriber.next_frames(0))
+
+
+def error_event(frame):
+    lines = frame.strip().split("\n")
+    assert lines[0] == "event: error"
+    return json.loads(lines[1][len("data: "):])
+
+
+def test_failed_topic_is_kept_and_backed_off(hub):
+    async def scenario():
+        subscriber = await hub.subscribe(["price:bad", "global"])
+        await hub.stop()
+        return subscriber
+
+    subscriber = asyncio.run(scenario())
+    assert "price:bad" in subscriber.topics and "price:bad" in hub.subscribers
+    assert hub.failures == {"price:bad": 1}
+    assert hub.backing_off("price:bad") and not hub.backing_off("global")
+    assert len(frames_of(subscriber)) == 1
+
+
+def test_backoff_doubles_per_failure(hub, monkeypatch):
+    monkeypatch.setattr(server, "MARKET_STREAM_REFRESH_SECONDS", 10)
+    before = server.time.monotonic()
+    asyncio.run(hub.refresh(["price:bad"]))
+    asyncio.run(hub.refresh(["price:bad"]))
+    assert 20 <= hub.retry_at["price:bad"] - before < 21
+
+
+def test_success_resets_failures(hub):
+    hub.failures["price:ok"] = 2
+    hub.retry_at["price:ok"] = 0
+    asyncio.run(hub.refresh(["price:ok"]))
+    assert "price:ok" not in hub.failures and "price:ok" not in hub.retry_at
+
+
+def test_price_topic_is_dropped_with_an_error_event(hub):
+    async def scenario():
+        subscriber = await hub.subscribe(["price:bad"])
+        await hub.stop()
+        dropped = {}
+        for _ in range(2):
+            dropped = await hub.refresh(["price:bad"])
+        return subscriber, dropped
+
+    subscriber, dropped = asyncio.run(scenario())
+    assert list(dropped) == ["price:bad"]
+    assert "price:bad" not in hub.subscribers and "price:bad" not in hub.failures
+    [frame] = frames_of(subscriber)
+    assert error_event(frame) == {"topic": "price:bad", "detail": "Failed to fetch price data"}
+    assert hub.counters["dropped_topics"] == 1
+
+
+def test_new_subscriber_is_told_about_a_topic_dropped_on_subscribe(hub, monkeypatch):
+    monkeypatch.setattr(server, "MARKET_STREAM_MAX_FAILURES", 1)
+
+    async def scenario():
+        subscriber = await hub.subscribe(["price:bad", "global"])
+        await hub.stop()
+        return subscriber
+
+    subscriber = asyncio.run(scenario())
+    assert subscriber.topics == ["global"]
+    events = [error_event(frame) for frame in frames_of(subscriber) if frame.startswith("event: error")]
+    assert events == [{"topic": "price:bad", "detail": "Failed to fetch price data"}]
+
+
+def test_fixed_topics_are_never_dropped(hub, monkeypatch):
+    async def read_topic(topic):
+        raise RuntimeError("upstream down")
+
+    monkeypatch.setattr(hub, "read_topic", read_topic)
+    for _ in range(5):
+        assert asyncio.run(hub.refresh(["global"])) == {}
+    assert hub.failures["global"] == 5
@@ -0,0 +1,88 @@
+import asyncio
+import json
+
+import pytest
+from starlette.testclient import TestClient
+from websockets.asyncio.server import serve
+
+import server
+from server import PriceStream, parse_price_message
+
+
+@pytest.mark.parametrize("message", [
+    "not json",
+    json.dumps(["price", 1]),
+    json.dumps({"type": "heartbeat", "price": "1"}),
+    json.dumps({"price": "abc"}),
+    json.dumps({"price": "1", "ts": "soon"}),
+    json.dumps({"price": "1", "time": "yesterday"}),
+    json.dumps({"price": "1", "time": 1700000000}),
+])
+def test_malformed_messages_are_ignored(message):
+    assert parse_price_message(message) is None
+
+
+def test_coinbase_ticker_is_parsed():
+    tick = parse_price_message(json.dumps({
+        "type": "ticker", "product_id": "BTC-USD", "price": "64000.50", "time": "2024-01-01T00:00:00.000Z"
+    }))
+    assert tick == {"type": "tick", "coin_id": "bitcoin", "symbol": "BTC-USD",
+                    "price": 64000.5, "ts": 1704067200000}
+
+
+def test_plain_tick_is_parsed():
+    assert parse_price_message(json.dumps({"price": 1.5, "ts": 5}))["ts"] == 5
+
+
+def test_feed_fans_out_newest_tick_and_survives_bad_frames():
+    frames = [
+        json.dumps({"type": "ticker", "price": "1", "ts": "garbage"}),
+        json.dumps({"type": "ticker", "price": "1", "time": "garbage"}),
+        json.dumps({"type": "ticker", "price": "100", "ts": 1}),
+        json.dumps({"type": "ticker", "price": "101", "ts": 2}),
+    ]
+
+    async def feed(websocket):
+        for frame in frames:
+            await websocket.send(frame)
+        await websocket.wait_closed()
+
+    async def scenario():
+        async with serve(feed, "127.0.0.1", 0) as ws_server:
+            port = ws_server.sockets[0].getsockname()[1]
+            stream = PriceStream(f"ws://127.0.0.1:{port}", None)
+            first, second = stream.subscribe(), stream.subscribe()
+            stream.start()
+            try:
+                for _ in range(200):
+                    if stream.ticks == 2:
+                        break
+                    await asyncio.sleep(0.01)
+                received = [json.loads(await sub.slot.get()) for sub in (first, second)]
+                return stream, received, (first, second)
+            finally:
+                await stream.stop()
+
+    stream, received, subscribers = asyncio.run(scenario())
+    assert stream.connects == 1
+    assert stream.ticks == 2
+    assert [tick["price"] for tick in received] == [101.0, 101.0]
+    # Subscribers hold only the newest tick
+    assert all(sub.dropped == 1 for sub in subscribers)
+
+
+def test_late_subscriber_gets_latest_tick():
+    async def scenario():
+        stream = PriceStream("ws://unused", None)
+        stream.publish({"type": "tick", "price": 1.0})
+        return json.loads(await stream.subscribe().slot.get())
+
+    assert asyncio.run(scenario())["price"] == 1.0
+
+
+def test_standin_feed_frames_parse_as_ticks():
+    import upstream_standin
+
+    with TestClient(upstream_standin.app).websocket_connect("/ws/feed") as websocket:
+        tick = parse_price_message(websocket.receive_text())
+    assert tick is not None and tick["price"] > 0 and tick["symbol"] == "BTC-USD"
@@ -0,0 +1,59 @@
+import asyncio
+
+import httpx
+
+import server
+
+
+def run_requests(*calls):
+    """Send (method, path, token, json) calls in order through one client"""
+    async def send():
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            responses = []
+            for method, path, token, body in calls:
+                headers = {"Authorization": f"Bearer {token}"} if token else {}
+                responses.append(await client.request(method, path, headers=headers, json=body))
+            return responses
+    return asyncio.run(send())
+
+
+def add_user(db, user_id="user-1", password="hunter22"):
+    asyncio.run(db.users.insert_one({
+        "id": user_id, "email": f"{user_id}@example.com", "name": "Before",
+        "password": server.bcrypt_hash(password), "balances": {}, "wallets": {}
+    }))
+    return server.create_token(user_id, f"{user_id}@example.com")
+
+
+def test_principal_is_cached_between_requests(mock_db):
+    token = add_user(mock_db)
+    first, second = run_requests(("GET", "/api/auth/me", token, None), ("GET", "/api/auth/me", token, None))
+    assert first.status_code == second.status_code == 200
+    counters = server.principal_cache.counters
+    assert counters["misses"] == 1 and counters["hits"] == 1
+
+
+def test_password_change_invalidates_principal(mock_db):
+    token = add_user(mock_db)
+    run_requests(("GET", "/api/auth/me", token, None))
+    # A direct write is not seen while the principal is cached...
+    asyncio.run(mock_db.users.update_one({"id": "user-1"}, {"$set": {"name": "After"}}))
+    stale, changed, fresh = run_requests(
+        ("GET", "/api/auth/me", token, None),
+        ("POST", "/api/auth/change-password", token, {"current_password": "hunter22", "new_password": "hunter33"}),
+        ("GET", "/api/auth/me", token, None),
+    )
+    assert stale.json()["name"] == "Before"
+    assert changed.status_code == 200
+    # ...but a password change drops it, so the next request reloads the document
+    assert fresh.json()["name"] == "After"
+    assert server.principal_cache.counters["invalidations"] == 1
+
+
+def test_principal_never_includes_password(mock_db):
+    token = add_user(mock_db)
+    run_requests(("GET", "/api/auth/me", token, None))
+    principal = asyncio.run(server.principal_cache.get("user-1"))
+    assert "password" not in principal
+
@@ -0,0 +1,74 @@
+import asyncio
+
+import bcrypt
+import httpx
+import pytest
+
+import server
+
+PASSWORD = "hunter22"
+
+
+@pytest.fixture
+def policy(mock_db, monkeypatch):
+    """The shared hash policy at cost 4, with fresh rehash counters"""
+    monkeypatch.setattr(server, "PASSWORD_REHASH_ON_LOGIN", True)
+    monkeypatch.setattr(server.hash_policy, "rehash", dict.fromkeys(server.hash_policy.rehash, 0))
+    return server.hash_policy
+
+
+def add_user(db, cost):
+    hashed = bcrypt.hashpw(PASSWORD.encode(), bcrypt.gensalt(rounds=cost)).decode()
+    asyncio.run(db.users.insert_one({"id": "user-1", "email": "user@example.com", "name": "User", "password": hashed}))
+    return hashed
+
+
+def login_and_settle():
+    """Log in and wait for any background rehash it scheduled"""
+    async def scenario():
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            response = await client.post("/api/auth/login", json={"email": "user@example.com", "password": PASSWORD})
+        await asyncio.gather(*server.hash_policy.rehash_tasks)
+        return response
+    return asyncio.run(scenario())
+
+
+def stored_hash(db):
+    return asyncio.run(db.users.find_one({"id": "user-1"}))["password"]
+
+
+def test_outdated_hash_is_upgraded_after_login(mock_db, policy):
+    old_hash = add_user(mock_db, cost=5)
+    assert login_and_settle().status_code == 200
+    new_hash = stored_hash(mock_db)
+    assert new_hash != old_hash
+    assert server.bcrypt_cost(new_hash) == 4
+    assert bcrypt.checkpw(PASSWORD.encode(), new_hash.encode())
+    assert policy.rehash["scheduled"] == policy.rehash["completed"] == 1
+
+
+def test_current_hash_is_left_alone(mock_db, policy):
+    old_hash = add_user(mock_db, cost=4)
+    assert login_and_settle().status_code == 200
+    assert stored_hash(mock_db) == old_hash
+    assert policy.rehash["scheduled"] == 0
+
+
+def test_concurrent_password_change_wins(mock_db, policy):
+    old_hash = add_user(mock_db, cost=5)
+
+    async def scenario():
+        await mock_db.users.update_one({"id": "user-1"}, {"$set": {"password": "changed"}})
+        await policy._rehash("user-1", PASSWORD, old_hash)
+
+    asyncio.run(scenario())
+    assert stored_hash(mock_db) == "changed"
+
+
+def test_rehash_is_skipped_while_the_pool_is_busy(mock_db, policy, monkeypatch):
+    old_hash = add_user(mock_db, cost=5)
+    monkeypatch.setattr(server.password_hasher, "workers", 0)
+    assert login_and_settle().status_code == 200
+    assert stored_hash(mock_db) == old_hash
+    assert policy.rehash["skipped_busy"] == 1
@@ -0,0 +1,136 @@
+import asyncio
+
+import pytest
+
+import server
+from server import SingleFlight
+
+
+def test_concurrent_misses_share_one_fetch():
+    flight = SingleFlight()
+    calls = []
+
+    async def loader():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {"price": 1}
+
+    async def scenario():
+        return await asyncio.gather(*(flight.do("price:bitcoin", loader) for _ in range(5)))
+
+    results = asyncio.run(scenario())
+    assert len(calls) == 1
+    assert results == [{"price": 1}] * 5
+    stats = flight.stats()
+    assert stats["fetches"] == 1
+    assert stats["coalesced_callers"] == 4
+    assert stats["max_callers_per_fetch"] == 5
+    assert stats["in_flight"] == {}
+
+
+def test_failure_reaches_every_caller_and_is_not_remembered():
+    flight = SingleFlight()
+    attempts = []
+
+    async def loader():
+        attempts.append(1)
+        await asyncio.sleep(0.01)
+        if len(attempts) == 1:
+            raise RuntimeError("upstream down")
+        return "ok"
+
+    async def scenario():
+        failed = await asyncio.gather(*(flight.do("global", loader) for _ in range(3)), return_exceptions=True)
+        return failed, await flight.do("global", loader)
+
+    failed, retried = asyncio.run(scenario())
+    assert all(isinstance(result, RuntimeError) for result in failed)
+    assert retried == "ok"
+    assert flight.fetches == 2
+    assert flight.history[0]["ok"] is False and flight.history[1]["ok"] is True
+
+
+def test_cancelled_caller_does_not_cancel_shared_fetch():
+    flight = SingleFlight()
+
+    async def loader():
+        await asyncio.sleep(0.02)
+        return "done"
+
+    async def scenario():
+        impatient = asyncio.ensure_future(flight.do("trending", loader))
+        patient = asyncio.ensure_future(flight.do("trending", loader))
+        await asyncio.sleep(0)
+        impatient.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await impatient
+        return await patient
+
+    assert asyncio.run(scenario()) == "done"
+    assert flight.fetches == 1
+
+
+def in_background(coro):
+    """Run a coroutine the way prefetch and refresh tasks do"""
+    async def wrapper():
+        server.upstream_priority_floor.set(server.UPSTREAM_PRIORITY_BACKGROUND)
+        return await coro
+    return asyncio.ensure_future(wrapper())
+
+
+def test_foreground_caller_does_not_join_a_background_flight():
+    flight = SingleFlight()
+    floors = []
+
+    async def loader():
+        floor = server.upstream_priority_floor.get()
+        floors.append(floor)
+        await asyncio.sleep(0.01)
+        return floor
+
+    async def scenario():
+        refresh = in_background(flight.do("global", loader))
+        await asyncio.sleep(0)
+        user = await flight.do("global", loader)
+        return await refresh, user
+
+    assert asyncio.run(scenario()) == (server.UPSTREAM_PRIORITY_BACKGROUND, server.UPSTREAM_PRIORITY_INTERACTIVE)
+    assert len(floors) == 2
+    assert flight.stats()["foreground_fetches_beside_background"] == 1
+    assert flight.stats()["background_in_flight"] == {}
+
+
+def test_background_caller_joins_a_foreground_flight():
+    flight = SingleFlight()
+    calls = []
+
+    async def loader():
+        calls.append(server.upstream_priority_floor.get())
+        await asyncio.sleep(0.01)
+        return "value"
+
+    async def scenario():
+        user = asyncio.ensure_future(flight.do("global", loader))
+        await asyncio.sleep(0)
+        assert flight.running("global")
+        return await asyncio.gather(user, in_background(flight.do("global", loader)))
+
+    assert asyncio.run(scenario()) == ["value", "value"]
+    assert calls == [server.UPSTREAM_PRIORITY_INTERACTIVE]
+    assert flight.coalesced == 1
+
+
+def test_market_stream_refreshes_run_at_background_priority(monkeypatch):
+    hub = server.MarketHub()
+    floors = []
+
+    async def refresh(topics):
+        floors.append(server.upstream_priority_floor.get())
+        hub.subscribers.clear()
+        return []
+
+    monkeypatch.setattr(server, "MARKET_STREAM_REFRESH_SECONDS", 0)
+    monkeypatch.setattr(hub, "refresh", refresh)
+    hub.subscribers["global"] = {object()}
+    asyncio.run(hub.run())
+    assert floors == [server.UPSTREAM_PRIORITY_BACKGROUND]
@@ -0,0 +1,74 @@
+import asyncio
+import time
+
+import pytest
+
+import server
+from server import get_cached, set_cached
+
+KEY = "price:swr-test"
+
+
+@pytest.fixture(autouse=True)
+def clean_key():
+    yield
+    server.cache.delete(KEY)
+
+
+def refresh_loader(calls):
+    async def loader():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        set_cached(KEY, {"price": 2})
+        return {"price": 2}
+    return loader
+
+
+def test_stale_entry_is_served_and_refreshed_once():
+    calls = []
+    loader = refresh_loader(calls)
+    server.cache.set(KEY, {"price": 1}, stored_at=time.time() - 120)
+    scheduled = server.swr_stats["refreshes_scheduled"]
+
+    async def scenario():
+        served = [get_cached(KEY, 60, refresh=loader) for _ in range(3)]
+        await asyncio.gather(*server.background_refreshes.values())
+        return served
+
+    assert asyncio.run(scenario()) == [{"price": 1}] * 3
+    assert calls == [1]
+    assert server.swr_stats["refreshes_scheduled"] == scheduled + 1
+    assert get_cached(KEY, 60) == {"price": 2}
+
+
+def test_entry_past_stale_window_is_a_miss():
+    calls = []
+    stale_ttl = server.CACHE_STALE_TTLS["price"]
+    server.cache.set(KEY, {"price": 1}, stored_at=time.time() - 60 - stale_ttl - 1)
+
+    async def scenario():
+        return get_cached(KEY, 60, refresh=refresh_loader(calls))
+
+    assert asyncio.run(scenario()) is None
+    assert calls == []
+
+
+def test_stale_entry_without_loader_is_a_miss():
+    server.cache.set(KEY, {"price": 1}, stored_at=time.time() - 120)
+    assert get_cached(KEY, 60) is None
+
+
+def test_failed_refresh_keeps_serving_stale_value():
+    server.cache.set(KEY, {"price": 1}, stored_at=time.time() - 120)
+    failures = server.swr_stats["refresh_failures"]
+
+    async def loader():
+        raise RuntimeError("upstream down")
+
+    async def scenario():
+        get_cached(KEY, 60, refresh=loader)
+        await asyncio.gather(*server.background_refreshes.values())
+        return get_cached(KEY, 60, refresh=loader)
+
+    assert asyncio.run(scenario()) == {"price": 1}
+    assert server.swr_stats["refresh_failures"] == failures + 1
@@ -0,0 +1,45 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import httpx
+import jwt
+import pytest
+
+import server
+
+SYSTEM_PATHS = sorted(route.path for route in server.app.routes if route.path.startswith("/api/system/"))
+
+
+def admin_token():
+    payload = {"user_id": "admin", "email": server.ADMIN_EMAIL, "is_admin": True,
+               "exp": datetime.now(timezone.utc) + timedelta(hours=1)}
+    return jwt.encode(payload, server.JWT_SECRET, algorithm=server.JWT_ALGORITHM)
+
+
+def get(path, token=None):
+    async def request():
+        headers = {"Authorization": f"Bearer {token}"} if token else {}
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.get(path, headers=headers)
+    return asyncio.run(request())
+
+
+def test_system_routes_exist():
+    assert "/api/system/cache" in SYSTEM_PATHS and "/api/system/auth-admission" in SYSTEM_PATHS
+
+
+@pytest.mark.parametrize("path", SYSTEM_PATHS)
+def test_system_routes_require_a_token(path):
+    assert get(path).status_code in (401, 403)
+
+
+@pytest.mark.parametrize("path", SYSTEM_PATHS)
+def test_system_routes_reject_user_tokens(path):
+    assert get(path, server.create_token("user-1", "user@example.com")).status_code == 403
+
+
+def test_admin_token_is_accepted():
+    response = get("/api/system/circuit-breaker", admin_token())
+    assert response.status_code == 200
+    assert response.json()["name"] == "coingecko"
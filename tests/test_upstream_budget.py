@@ -0,0 +1,72 @@
+import asyncio
+
+import pytest
+
+import server
+from server import UpstreamBudget, UpstreamBudgetExceeded
+
+
+def test_budget_grants_burst_immediately():
+    async def scenario():
+        budget = UpstreamBudget(calls_per_minute=60, burst=3, reserve=0)
+        for _ in range(3):
+            await budget.acquire(server.UPSTREAM_PRIORITY_STANDARD)
+        return budget
+
+    budget = asyncio.run(scenario())
+    assert budget.metrics["standard"]["granted"] == 3
+    assert budget.metrics["standard"]["queued"] == 0
+
+
+def test_budget_serves_queued_calls_in_priority_order():
+    async def scenario():
+        budget = UpstreamBudget(calls_per_minute=1200, burst=1, reserve=0)
+        await budget.acquire(server.UPSTREAM_PRIORITY_INTERACTIVE)
+        order = []
+
+        async def caller(priority):
+            await budget.acquire(priority)
+            order.append(server.UPSTREAM_PRIORITY_NAMES[priority])
+
+        await asyncio.gather(
+            caller(server.UPSTREAM_PRIORITY_BACKGROUND),
+            caller(server.UPSTREAM_PRIORITY_STANDARD),
+            caller(server.UPSTREAM_PRIORITY_INTERACTIVE),
+        )
+        return order
+
+    assert asyncio.run(scenario()) == ["interactive", "standard", "background"]
+
+
+def test_budget_sheds_calls_that_would_wait_too_long():
+    async def scenario():
+        budget = UpstreamBudget(calls_per_minute=0.6, burst=1, reserve=0)
+        await budget.acquire(server.UPSTREAM_PRIORITY_INTERACTIVE)
+        with pytest.raises(UpstreamBudgetExceeded):
+            await budget.acquire(server.UPSTREAM_PRIORITY_INTERACTIVE)
+        return budget
+
+    budget = asyncio.run(scenario())
+    assert budget.metrics["interactive"]["shed"] == 1
+
+
+def test_budget_keeps_reserve_for_interactive_calls():
+    async def scenario():
+        budget = UpstreamBudget(calls_per_minute=0.6, burst=2, reserve=1)
+        await budget.acquire(server.UPSTREAM_PRIORITY_INTERACTIVE)
+        # One token left, and it is held back from background work
+        with pytest.raises(UpstreamBudgetExceeded):
+            await budget.acquire(server.UPSTREAM_PRIORITY_BACKGROUND)
+        await budget.acquire(server.UPSTREAM_PRIORITY_INTERACTIVE)
+        return budget
+
+    budget = asyncio.run(scenario())
+    assert budget.metrics["background"]["shed"] == 1
+    assert budget.metrics["interactive"]["granted"] == 2
+
+
+def test_penalize_drains_the_bucket():
+    budget = UpstreamBudget(calls_per_minute=60, burst=5, reserve=0)
+    budget.penalize()
+    assert budget.tokens <= 0
+    assert budget.rate_limited == 1
@@ -0,0 +1,37 @@
+import asyncio
+
+import server
+from server import UpstreamClient
+
+POOL_KEYS = ("connections", "idle_connections", "active_connections")
+
+
+def started_stats(client):
+    async def scenario():
+        await client.start()
+        try:
+            return client.stats()
+        finally:
+            await client.close()
+    return asyncio.run(scenario())
+
+
+def test_pool_counts_are_read_from_httpcore():
+    stats = started_stats(UpstreamClient())
+    assert [stats[key] for key in POOL_KEYS] == [0, 0, 0]
+
+
+def test_unstarted_client_has_an_empty_pool():
+    assert [UpstreamClient().stats()[key] for key in POOL_KEYS] == [0, 0, 0]
+
+
+def test_unsupported_httpcore_reports_unavailable(monkeypatch):
+    monkeypatch.setattr(server, "POOL_STATS_AVAILABLE", False)
+    stats = started_stats(UpstreamClient())
+    assert all(stats[key] == "unavailable" for key in POOL_KEYS)
+
+
+def test_missing_pool_internals_report_unavailable(monkeypatch):
+    client = UpstreamClient()
+    monkeypatch.setattr(client, "pool_connections", lambda: [object()])
+    assert all(client.pool_stats()[key] == "unavailable" for key in POOL_KEYS)